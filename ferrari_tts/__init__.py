@@ -0,0 +1,40 @@
+"""
+Ferrari TTS - Python Runtime
+============================
+The shared building blocks behind the PC test benches and the voice bridge.
+The scripts in `scripts/` import from here instead of carrying their own copies.
+
+Exports resolve on first use, so `import ferrari_tts` loads neither numpy
+nor onnxruntime (see ferrari_tts.runtime for the cold start path).
+"""
+
+import importlib
+
+_EXPORTS = {
+    "AudioCache": "ferrari_tts.audio_cache",
+    "FerrariEngine": "ferrari_tts.engine",
+    "StreamStats": "ferrari_tts.engine",
+    "FerrariG2P": "ferrari_tts.g2p",
+    "PhonemeCache": "ferrari_tts.phoneme_cache",
+    "StartupReport": "ferrari_tts.runtime",
+    "start_engine": "ferrari_tts.runtime",
+    "SessionProfile": "ferrari_tts.session",
+    "create_session": "ferrari_tts.session",
+    "SplitEngine": "ferrari_tts.split_engine",
+    "PhonemeTokenizer": "ferrari_tts.tokenizer",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'ferrari_tts' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
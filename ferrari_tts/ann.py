@@ -0,0 +1,225 @@
+"""
+Ferrari TTS - Approximate Nearest Neighbours (IVF)
+==================================================
+Exact search (VectorIndex.search) scores every passage: fine for the demo
+manual, a full matrix product per question once whole product manuals are
+loaded as domains. IVFIndex is the pluggable approximate backend, pure NumPy:
+
+- build(): spherical k-means splits the passages into `nlist` cells; the
+  rows are copied cell by cell into one contiguous file next to the index.
+  Every build writes its files under a new `ivf<build>_` prefix and only
+  replacing ivf.json switches to them, so a crashed build leaves the last
+  one usable
+- search(): rank the centroids, scan only the best `nprobe` cells; a query
+  whose cells hold fewer than k live rows gets id -1 / score -inf padding
+- rows appended to the VectorIndex after build() are scanned exhaustively
+  until the next build(), so appends never need an immediate rebuild;
+  deleted rows are skipped, a compacted index needs a new build()
+
+Knobs: `nlist` (build time) and `nprobe` (query time). More probes = higher
+recall, proportionally more rows scanned. scripts/test_ferrari_ann.py
+measures recall@k / QPS / memory against exact search.
+
+    ivf = IVFIndex(index)          # loads a previous build if there is one
+    if ivf.stale:
+        ivf.build()
+    ids, scores = ivf.search(query_vectors, k=5, nprobe=8)
+"""
+
+import json
+import os
+
+import numpy as np
+
+from ferrari_tts.vector_index import BLOCK_ROWS, normalize, score_rows, top_k
+
+# k-means sees at most this many rows per cell while training
+TRAIN_ROWS_PER_LIST = 64
+
+
+def default_nlist(count):
+    return max(1, int(np.sqrt(count)))
+
+
+def spherical_kmeans(vectors, nlist, iterations=10, seed=0):
+    """Unit-length centroids that maximise the cosine to their members"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.flatnonzero(np.bincount(assign, minlength=nlist) == 0)
+        # Empty cells restart on random rows instead of staying dead
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids, scales=None):
+    """Nearest centroid per row, in blocks so the score matrix stays small"""
+    assign = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        end = min(len(vectors), start + BLOCK_ROWS)
+        block = vectors[start:end]
+        if block.dtype != np.float32:
+            block = block.astype(np.float32) * scales[start:end, np.newaxis]
+        assign[start:end] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+class IVFIndex:
+    def __init__(self, index, nprobe=8):
+        self.index = index
+        self.nprobe = nprobe
+        self.directory = index.directory
+        self.meta_path = self.directory / "ivf.json"
+        self.nlist = 0
+        self.trained_count = 0
+        self.generation = 0
+        self.build_id = 0
+        self._rows = self._scales = None
+        if self.meta_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.nlist = meta["nlist"]
+            self.trained_count = meta["trained_count"]
+            self.generation = meta.get("generation", 0)
+            self.build_id = meta.get("build", 0)
+            if self.generation == index.generation and self.trained_count <= len(index):
+                self._map()
+            else:
+                self.nlist = 0  # the ids were renumbered under us
+
+    @property
+    def stale(self):
+        """True when more than a tenth of the passages bypass the cells (or the index was compacted)"""
+        if not self.nlist or self.generation != self.index.generation:
+            return True
+        return len(self.index) - self.trained_count > 0.1 * max(self.trained_count, 1)
+
+    def _file(self, name, build_id=None):
+        build_id = self.build_id if build_id is None else build_id
+        return self.directory / (f"ivf{build_id}_{name}" if build_id else f"ivf_{name}")
+
+    def _map(self):
+        dim, count = self.index.dim, self.trained_count
+        dtype = np.float32 if self.index.dtype == "float32" else np.int8
+        self.centroids = np.fromfile(self._file("centroids.f32"), dtype=np.float32).reshape(self.nlist, dim)
+        self.offsets = np.fromfile(self._file("offsets.i64"), dtype=np.int64)
+        self.order = np.memmap(self._file("order.i64"), dtype=np.int64, mode="r", shape=(count,))
+        self._rows = np.memmap(self._file("rows.bin"), dtype=dtype, mode="r", shape=(count, dim))
+        if self.index.dtype == "int8":
+            self._scales = np.memmap(self._file("scales.f32"), dtype=np.float32, mode="r", shape=(count,))
+
+    def build(self, nlist=None, iterations=10, seed=0):
+        """(Re)trains the cells on everything currently in the index"""
+        count = len(self.index)
+        if not count:
+            raise ValueError("cannot build an IVF index over an empty VectorIndex")
+        nlist = min(nlist or default_nlist(count), count)
+        rows, scales = self.index.rows()
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(count, min(count, nlist * TRAIN_ROWS_PER_LIST), replace=False))
+        train = rows[sample].astype(np.float32)
+        if scales is not None:
+            train *= scales[sample, np.newaxis]
+        centroids = spherical_kmeans(normalize(train), nlist, iterations, seed)
+
+        assign = assign_lists(rows, centroids, scales)
+        order = np.argsort(assign, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist)))).astype(np.int64)
+
+        # New files next to the current build's: searches keep using those until ivf.json moves on
+        build_id = self.build_id + 1
+        centroids.astype(np.float32).tofile(self._file("centroids.f32", build_id))
+        offsets.tofile(self._file("offsets.i64", build_id))
+        order.astype(np.int64).tofile(self._file("order.i64", build_id))
+        # Cell-contiguous copy: a probe is one slice, never a gather
+        with open(self._file("rows.bin", build_id), "wb") as f:
+            for start in range(0, count, BLOCK_ROWS):
+                f.write(np.ascontiguousarray(rows[order[start:start + BLOCK_ROWS]]).tobytes())
+        if scales is not None:
+            np.asarray(scales[order], dtype=np.float32).tofile(self._file("scales.f32", build_id))
+
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"nlist": nlist, "trained_count": count, "generation": self.index.generation,
+                       "build": build_id}, f, indent=2)
+        os.replace(tmp, self.meta_path)
+        self._rows = self._scales = None
+        self.nlist = nlist
+        self.trained_count = count
+        self.generation = self.index.generation
+        self.build_id = build_id
+        self._sweep()
+        self._map()
+        return self
+
+    def _sweep(self):
+        """Deletes the files of earlier builds (and of builds that died before ivf.json)"""
+        current = self._file("").name
+        for path in self.directory.glob("ivf*_*"):
+            if not path.name.startswith(current):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass  # still mapped somewhere (Windows): the next build retries
+
+    def search(self, queries, k=5, nprobe=None):
+        """Top-k per query like VectorIndex.search, scanning only `nprobe` cells"""
+        if not self.nlist or self.generation != self.index.generation:
+            return self.index.search(queries, k)
+        queries = normalize(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        tail_rows, tail_scales = self.index.rows(self.trained_count)
+        tail_ids = np.arange(self.trained_count, len(self.index))
+
+        probes = top_k(queries @ self.centroids.T, nprobe)[0]
+        all_ids, all_scores = [], []
+        for query, cells in zip(queries, probes):
+            ids, scores = [tail_ids], [score_rows(query[np.newaxis], tail_rows, tail_scales)[0]]
+            for cell in cells:
+                start, end = self.offsets[cell], self.offsets[cell + 1]
+                if start == end:
+                    continue
+                scales = None if self._scales is None else self._scales[start:end]
+                scores.append(score_rows(query[np.newaxis], self._rows[start:end], scales)[0])
+                ids.append(self.order[start:end])
+            ids = np.concatenate(ids)
+            scores = np.concatenate(scores)
+            if self.index.deleted_mask is not None:
+                live = ~self.index.deleted_mask[ids]
+                ids, scores = ids[live], scores[live]
+            best, top = top_k(scores[np.newaxis], k, ids)
+            all_ids.append(best[0])
+            all_scores.append(top[0])
+        # Same width as exact search; few candidates (tiny cells) leave -1 / -inf at the end of a row
+        width = min(k, self.index.live)
+        out_ids = np.full((len(queries), width), -1, dtype=np.int64)
+        out_scores = np.full((len(queries), width), -np.inf, dtype=np.float32)
+        for row, (ids, scores) in enumerate(zip(all_ids, all_scores)):
+            out_ids[row, :len(ids)] = ids
+            out_scores[row, :len(scores)] = scores
+        return out_ids, out_scores
+
+    def nbytes(self):
+        """On-disk / mapped footprint of the IVF structures (excluding the source index)"""
+        names = ("centroids.f32", "offsets.i64", "order.i64", "rows.bin", "scales.f32")
+        return sum(self._file(n).stat().st_size for n in names if self._file(n).exists())
+
+
+BACKENDS = ("exact", "ivf")
+
+
+def open_backend(index, backend="exact", nprobe=8, nlist=None):
+    """Search backend for a VectorIndex: the index itself, or an IVFIndex built on demand"""
+    if backend == "exact":
+        return index
+    if backend != "ivf":
+        raise ValueError(f"backend must be one of {BACKENDS}")
+    ivf = IVFIndex(index, nprobe=nprobe)
+    if ivf.stale and len(index):
+        ivf.build(nlist)
+    return ivf
@@ -0,0 +1,88 @@
+"""
+Ferrari TTS - Output Assembly
+=============================
+One float32 buffer per utterance instead of `list.append` + np.concatenate.
+
+The old benches built silence with np.zeros(n) (float64), so the first
+pause upcast the whole utterance to float64 and doubled its memory, and
+`audio * volume` made yet another copy of every segment. AudioBuffer is
+sized up front from the compiled render plan (silences are exact, speech
+is estimated from the text) and grows geometrically if the estimate was
+short. Model output and silence are written straight into it, and gain is
+applied during that one copy.
+"""
+
+import numpy as np
+
+from ferrari_tts.markup import SAMPLE_RATE, Silence, events
+
+# ~15 characters of English per second at speed 1.0; generous on purpose,
+# an early growth costs more than a few unused kilobytes
+SAMPLES_PER_CHAR = SAMPLE_RATE // 14
+
+GROWTH = 1.5
+
+
+def estimate_samples(plan):
+    """Upper-end guess of the rendered length of a compiled markup plan"""
+    total = 0
+    for event in events(plan):
+        if isinstance(event, Silence):
+            total += event.samples
+        else:
+            total += int(len(event.text) * SAMPLES_PER_CHAR / event.speed)
+    return total
+
+
+class AudioBuffer:
+    def __init__(self, capacity=0):
+        self._data = np.empty(max(int(capacity), 0), dtype=np.float32)
+        self.length = 0
+        self.grows = 0
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def reserve(self, samples):
+        """Makes room for `samples` more without another reallocation"""
+        needed = self.length + samples
+        if needed <= len(self._data):
+            return
+        grown = np.empty(max(needed, int(len(self._data) * GROWTH)), dtype=np.float32)
+        grown[:self.length] = self._data[:self.length]
+        self._data = grown
+        self.grows += 1
+
+    def append(self, audio, gain=1.0):
+        """Copies `audio` in (scaled by `gain`) and returns the written region for in-place DSP"""
+        audio = np.asarray(audio).reshape(-1)
+        self.reserve(len(audio))
+        region = self._data[self.length:self.length + len(audio)]
+        if gain == 1.0:
+            region[:] = audio
+        else:
+            np.multiply(audio, gain, out=region, casting="same_kind")
+        self.length += len(audio)
+        return region
+
+    def append_silence(self, samples):
+        self.reserve(samples)
+        region = self._data[self.length:self.length + samples]
+        region.fill(0.0)
+        self.length += samples
+        return region
+
+    def view(self):
+        """The assembled audio so far (a view: later appends may reallocate)"""
+        return self._data[:self.length]
+
+    def finish(self):
+        """Final float32 PCM; only copies when the estimate overshot by a lot"""
+        if self.length < len(self._data) * 3 // 4:
+            return self._data[:self.length].copy()
+        return self._data[:self.length]
+
@@ -0,0 +1,195 @@
+"""
+Ferrari TTS - Audio Cache
+=========================
+Rendered PCM for segments we have already said.
+
+A lot of what Ferrari says is byte-identical every time: fallback lines,
+confirmations, CortexReasoner's "[soft] I found something, but I don't trust
+the source..." - and each of them used to cost a full session.run.
+
+Tier 1: in-process LRU with a byte budget.
+Tier 2: one raw float32 file per segment under CACHE_DIR/audio, written
+        atomically and memory-mapped read-only on a hit, so every worker
+        process shares the same pages. The tier has its own byte budget;
+        the files touched least recently are pruned first.
+
+Keys hash everything that changes the samples: model fingerprint, token
+IDs, the `ref_s` row (or voice name), speed and gain. Cached arrays are
+read-only; copy before mutating.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from ferrari_tts.paths import CACHE_DIR
+from ferrari_tts.phoneme_cache import CacheStats
+
+# Rough per-entry bookkeeping cost (dict slot, array header)
+_ENTRY_OVERHEAD = 128
+
+
+def open_default_audio_cache(max_bytes=32 * 1024 * 1024, disk_max_bytes=512 * 1024 * 1024):
+    """The machine-wide audio cache every server and worker shares"""
+    return AudioCache(CACHE_DIR / "audio", max_bytes=max_bytes, disk_max_bytes=disk_max_bytes)
+
+
+def model_fingerprint(*model_paths, session=None):
+    """Cheap blueprint identity: file name/size/mtime plus the session's graph signature
+
+    Hashing a 300 MB graph on every start would cost more than the cache saves;
+    a re-export changes size or mtime, a different graph changes the signature.
+    """
+    digest = hashlib.sha1()
+    for path in model_paths:
+        path = Path(path)
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{path.name}|{stat.st_size}|{stat.st_mtime_ns}\0".encode("utf-8"))
+    if session is not None:
+        for arg in list(session.get_inputs()) + list(session.get_outputs()):
+            digest.update(f"{arg.name}|{arg.type}|{arg.shape}\0".encode("utf-8"))
+        meta = session.get_modelmeta()
+        digest.update(f"{meta.producer_name}|{meta.graph_name}|{meta.version}\0".encode("utf-8"))
+        digest.update(repr(sorted(meta.custom_metadata_map.items())).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class AudioCache:
+    def __init__(self, directory=None, max_bytes=32 * 1024 * 1024, disk_max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.stats = CacheStats()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.directory = None if directory is None else Path(directory)
+        self._disk_bytes = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    @staticmethod
+    def key(model_id, input_ids, style=None, speed=1.0, gain=1.0):
+        """Content address of one rendered segment"""
+        digest = hashlib.sha1(f"{model_id}|{float(speed)!r}|{float(gain)!r}\0".encode("utf-8"))
+        digest.update(np.ascontiguousarray(input_ids, dtype=np.int64).tobytes())
+        if isinstance(style, str):
+            digest.update(style.encode("utf-8"))
+        elif style is not None:
+            digest.update(np.ascontiguousarray(style, dtype=np.float32).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.directory / key[:2] / f"{key}.f32"
+
+    def get(self, key):
+        """Read-only float32 PCM or None"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return audio
+        audio = self._load(key) if self.directory is not None else None
+        with self._lock:
+            if audio is None:
+                self.stats.misses += 1
+                return None
+            self._remember(key, audio)
+            self.stats.disk_hits += 1
+            return audio
+
+    def put(self, key, audio):
+        audio = np.array(audio, dtype=np.float32).reshape(-1)
+        if not len(audio):
+            return
+        audio.setflags(write=False)
+        with self._lock:
+            self._remember(key, audio)
+        if self.directory is not None:
+            self._store(key, audio)
+
+    def _remember(self, key, audio):
+        if key in self._memory:
+            self._memory_bytes -= _ENTRY_OVERHEAD + self._memory.pop(key).nbytes
+        self._memory[key] = audio
+        self._memory_bytes += _ENTRY_OVERHEAD + audio.nbytes
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= _ENTRY_OVERHEAD + evicted.nbytes
+            self.stats.evictions += 1
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            audio = np.memmap(path, dtype=np.float32, mode="r")
+            # mtime doubles as the shared LRU clock for pruning
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return audio
+
+    def _store(self, key, audio):
+        path = self._path(key)
+        if path.exists():
+            return
+        path.parent.mkdir(exist_ok=True)
+        # Written under a private name and renamed, so readers never map a half file
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        audio.tofile(tmp)
+        os.replace(tmp, path)
+        with self._lock:
+            self._disk_bytes += audio.nbytes
+            over = self._disk_bytes > self.disk_max_bytes
+        if over:
+            self.prune()
+
+    def _disk_entries(self):
+        for path in self.directory.glob("*/*.f32"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # another worker pruned it
+            yield path, stat.st_size, stat.st_mtime
+
+    def prune(self, target_bytes=None):
+        """Drops least recently used files until the disk tier is under budget"""
+        if self.directory is None:
+            return
+        if target_bytes is None:
+            # Leave some headroom so every put does not trigger a directory scan
+            target_bytes = int(self.disk_max_bytes * 0.9)
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= target_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # still mapped by a reader (Windows refuses to unlink those)
+            total -= size
+            self.stats.evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        self.prune(target_bytes=0)
+
+    @property
+    def memory_bytes(self):
+        return self._memory_bytes
+
+    @property
+    def disk_bytes(self):
+        return self._disk_bytes
@@ -0,0 +1,148 @@
+"""
+Ferrari TTS - Session Autotuner
+===============================
+Sweeps ONNX Runtime settings on THIS machine and saves the best profile.
+
+    python -m ferrari_tts.autotune                  # Kokoro blueprint
+    python -m ferrari_tts.autotune --model vad      # Silero Bouncer
+    python -m ferrari_tts.autotune --concurrency 4  # tune for 4 busy tenants
+
+Every candidate is loaded, warmed up and timed over a fixed input. With
+--concurrency N the same number of sessions run side by side, which is what
+exposes thread oversubscription on multi-tenant boxes. The winner (best
+throughput, p50 latency as tie-breaker) lands in the profile store that
+create_session() reads.
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from ferrari_tts.paths import ONNX_PATH, VAD_PATH
+from ferrari_tts.session import PROFILE_STORE, SessionProfile, create_session, save_profile
+
+MODELS = {"kokoro": ONNX_PATH, "vad": VAD_PATH}
+
+# "Hello world, this is the Ferrari engine." worth of token IDs, repeated to the target length
+SAMPLE_IDS = [50, 83, 54, 156, 31, 16, 65, 156, 87, 123, 54, 46, 3, 16, 102, 61, 16, 102, 55]
+
+_SYMBOLIC_SIZES = {"seq": 64, "batch": 1, "samples": 24000}
+
+
+def sample_feeds(session, seq=64):
+    """Builds a representative input for any of our graphs from its metadata"""
+    feeds = {}
+    for node in session.get_inputs():
+        if node.name == "input_ids":
+            ids = [0] + list(itertools.islice(itertools.cycle(SAMPLE_IDS), seq - 2)) + [0]
+            feeds[node.name] = np.array([ids], dtype=np.int64)
+        elif node.name == "input_lengths":
+            feeds[node.name] = np.array([seq], dtype=np.int64)
+        elif node.name == "speed":
+            feeds[node.name] = np.array([1.0], dtype=np.float32)
+        elif node.name == "sr":
+            feeds[node.name] = np.array(16000, dtype=np.int64)
+        else:
+            shape = [d if isinstance(d, int) else _SYMBOLIC_SIZES.get(d, 1) for d in node.shape]
+            dtype = np.int64 if "int64" in node.type else np.float32
+            if node.name == "input" and len(shape) == 2:
+                shape = [1, 512]  # one Silero frame @ 16 kHz
+            feeds[node.name] = np.zeros(shape, dtype=dtype)
+    return feeds
+
+
+def candidates(cores, concurrency):
+    """The sweep grid, trimmed to what makes sense for `concurrency` tenants"""
+    per_tenant = max(1, cores // concurrency)
+    threads = sorted({1, 2, max(1, per_tenant // 2), per_tenant, cores} & set(range(1, cores + 1)))
+    for intra, level, spin, arena in itertools.product(threads, ("extended", "all"), (False, True), (True, False)):
+        yield SessionProfile(intra_op_threads=intra, graph_optimization=level,
+                             allow_spinning=spin, enable_cpu_mem_arena=arena)
+    for intra in threads:
+        yield SessionProfile(intra_op_threads=intra, inter_op_threads=2, execution_mode="parallel")
+
+
+def measure(model_path, profile, concurrency=1, iterations=20, warmup=3, seq=64):
+    started = time.perf_counter()
+    sessions = [create_session(model_path, profile) for _ in range(concurrency)]
+    load_s = (time.perf_counter() - started) / concurrency
+    feeds = sample_feeds(sessions[0], seq)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(session):
+        for _ in range(warmup):
+            session.run(None, feeds)
+        local = []
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            session.run(None, feeds)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in sessions]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 3),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "load_ms": round(load_s * 1000, 1),
+    }
+
+
+def autotune(model_path, concurrency=1, iterations=20, seq=64, log=print):
+    cores = os.cpu_count() or 1
+    best, best_metrics = None, None
+    for profile in candidates(cores, concurrency):
+        try:
+            metrics = measure(model_path, profile, concurrency, iterations, seq=seq)
+        except Exception as exc:
+            log(f"  ⚠️ skipped {profile}: {exc}")
+            continue
+        log(f"  {metrics['throughput_rps']:>8} rps  p50 {metrics['p50_ms']:>8} ms  {profile}")
+        if best is None or (metrics["throughput_rps"], -metrics["p50_ms"]) > (
+            best_metrics["throughput_rps"], -best_metrics["p50_ms"]
+        ):
+            best, best_metrics = profile, metrics
+    return best, best_metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune ONNX Runtime session settings for this machine")
+    parser.add_argument("--model", default="kokoro", help="'kokoro', 'vad' or a path to an .onnx file")
+    parser.add_argument("--concurrency", type=int, default=1, help="sessions running side by side")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seq", type=int, default=64, help="token count for Kokoro inputs")
+    parser.add_argument("--store", default=str(PROFILE_STORE))
+    parser.add_argument("--dry-run", action="store_true", help="print the winner without saving it")
+    args = parser.parse_args(argv)
+
+    model_path = MODELS.get(args.model, args.model)
+    print(f"🔧 FERRARI AUTOTUNE: {model_path} (concurrency {args.concurrency}, {os.cpu_count()} cores)")
+    best, metrics = autotune(model_path, args.concurrency, args.iterations, args.seq)
+    if best is None:
+        print("❌ No candidate could run this model.")
+        return 1
+    print(f"\n🏁 Best: {best}\n   {metrics}")
+    if not args.dry_run:
+        save_profile(model_path, best, store=args.store, metrics=metrics)
+        print(f"✅ Saved to {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+"""
+Ferrari TTS - Batched Inference
+===============================
+Runs many segments per session.run on the batched blueprint
+(scripts/export_ferrari_batched.py: `input_ids`, `input_lengths`, `ref_s`,
+`speed` -> `audio`, `audio_lengths`).
+
+Segments are grouped by length bucket so a short "Okay." never gets padded to
+the size of a paragraph, padded into one (B, L) matrix, run once, and the
+audio rows are cropped back per segment with `audio_lengths`. Padding only
+happens on blueprints whose export proved padding parity: the decoder's
+InstanceNorm/AdaIN also sees the padded frames, so on any other blueprint a
+batch only ever holds segments of the same length. With
+`pad_to_bucket` (blueprints whose export proved padding parity) L is the
+bucket length itself, so ORT plans its memory once per bucket, not once per
+new sentence length; BucketStats shows how traffic spreads over the buckets.
+
+BatchScheduler adds the concurrent side: callers submit single segments from
+any thread, a worker drains whatever is pending every few milliseconds and
+turns it into bucketed batches.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from ferrari_tts.audio_metrics import log_spectral_distance, snr_db
+from ferrari_tts.tokenizer import PAD_ID
+
+# Kokoro's decoder emits 600 samples (25 ms @ 24 kHz) per duration frame
+SAMPLES_PER_FRAME = 600
+
+DEFAULT_BUCKETS = (32, 64, 128, 256, 512)
+BATCH_INPUTS = {"input_ids", "input_lengths"}
+# Set to "1" in the blueprint's metadata once the export proved padded == unpadded audio
+PARITY_KEY = "ferrari_padding_parity"
+# A padded render that matches the segment rendered alone this well is exact
+PARITY_SNR_DB = 40.0
+# Kokoro's SineGen draws fresh harmonic phase and noise every run, so two unpadded
+# renders already differ: padding may drift from the reference at most this much
+# further (log-spectral distance) than the worst of PARITY_REPEATS unpadded reruns
+PARITY_REPEATS = 3
+PARITY_LSD_MARGIN_DB = 0.5
+
+
+def supports_batching(session):
+    return BATCH_INPUTS <= {i.name for i in session.get_inputs()}
+
+
+def padding_proven(session):
+    """True when the export's parity check passed for this blueprint"""
+    return session.get_modelmeta().custom_metadata_map.get(PARITY_KEY) == "1"
+
+
+def padding_parity(session, id_arrays, styles=None, buckets=DEFAULT_BUCKETS, speed=1.0, repeats=PARITY_REPEATS):
+    """Worst row of padded renders (one batch, and each row alone in its bucket)
+    against every segment rendered alone without padding
+
+    A row passes when it is exact (PARITY_SNR_DB), or when its LSD to the
+    unpadded render is within PARITY_LSD_MARGIN_DB of the run-to-run floor.
+    """
+    id_arrays = [np.asarray(ids, dtype=np.int64).reshape(-1) for ids in id_arrays]
+    styles = None if styles is None else np.asarray(styles, dtype=np.float32).reshape(len(id_arrays), -1)
+    exact = BatchedSynthesizer(session, buckets=())
+    bucketed = BatchedSynthesizer(session, buckets=buckets, max_batch=len(id_arrays), pad_to_bucket=True,
+                                  mixed_lengths=True)
+
+    def row_style(row):
+        return None if styles is None else styles[row:row + 1]
+
+    alone = [exact.run_batch([ids], speed, row_style(row))[0] for row, ids in enumerate(id_arrays)]
+    floors = []
+    for row, ids in enumerate(id_arrays):
+        reruns = [exact.run_batch([ids], speed, row_style(row))[0] for _ in range(repeats)]
+        floors.append(max(log_spectral_distance(alone[row], audio) for audio in reruns))
+    batch = bucketed.run_batch(id_arrays, speed, styles)
+    padded = [bucketed.run_batch([ids], speed, row_style(row))[0] for row, ids in enumerate(id_arrays)]
+
+    worst_snr, worst_lsd, worst_delta, passed = float("inf"), 0.0, 0, True
+    for reference, floor, *renders in zip(alone, floors, batch, padded):
+        for audio in renders:
+            delta = abs(len(audio) - len(reference))
+            snr, lsd = snr_db(reference, audio), log_spectral_distance(reference, audio)
+            passed = passed and delta == 0 and (snr >= PARITY_SNR_DB or lsd <= floor + PARITY_LSD_MARGIN_DB)
+            worst_delta = max(worst_delta, delta)
+            worst_snr = min(worst_snr, snr)
+            worst_lsd = max(worst_lsd, lsd)
+    return {
+        "rows": len(id_arrays),
+        "deterministic": max(floors) == 0,
+        "noise_floor_lsd_db": round(max(floors), 3),
+        "worst_lsd_db": round(worst_lsd, 3),
+        "worst_snr_db": round(worst_snr, 2),
+        "max_length_delta": worst_delta,
+        "passed": passed,
+    }
+
+
+def bucket_for(length, buckets):
+    """Smallest bucket that fits `length`; longer segments keep their own length"""
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return length
+
+
+class BucketStats:
+    """Per-bucket session.run counts, padding overhead and latency (for tuning `buckets`)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = tuple(sorted(buckets))
+        self.window = window
+        self._lock = threading.Lock()
+        self._rows = {}
+
+    def reset(self):
+        with self._lock:
+            self._rows = {}
+
+    def record(self, width, seconds, lengths, bucket=None):
+        """One session.run of len(lengths) segments padded to `width` IDs (counted under `bucket`)"""
+        bucket = width if bucket is None else bucket
+        key = bucket if bucket in self.buckets else "overflow"
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = {"runs": 0, "segments": 0, "tokens": 0, "slots": 0,
+                                         "latencies": deque(maxlen=self.window)}
+            row["runs"] += 1
+            row["segments"] += len(lengths)
+            row["tokens"] += int(sum(lengths))
+            row["slots"] += width * len(lengths)
+            row["latencies"].append(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            rows = {key: dict(row, latencies=list(row["latencies"])) for key, row in self._rows.items()}
+        total = sum(row["segments"] for row in rows.values())
+        report = {}
+        for key in [b for b in self.buckets if b in rows] + (["overflow"] if "overflow" in rows else []):
+            row = rows[key]
+            report[str(key)] = {
+                "runs": row["runs"],
+                "segments": row["segments"],
+                "hit_rate": round(row["segments"] / total, 4),
+                "padding": round(1 - row["tokens"] / row["slots"], 4),
+                "p50_ms": round(float(np.percentile(row["latencies"], 50)) * 1000, 3),
+                "p95_ms": round(float(np.percentile(row["latencies"], 95)) * 1000, 3),
+            }
+        return report
+
+
+class BatchedSynthesizer:
+    def __init__(self, session, buckets=DEFAULT_BUCKETS, max_batch=8, stats=None, pad_to_bucket=False,
+                 mixed_lengths=None):
+        """`mixed_lengths`: pad different lengths into one batch (default: only if padding_proven)"""
+        if not supports_batching(session):
+            raise ValueError(
+                "Session has no `input_lengths` input - export it with scripts/export_ferrari_batched.py"
+            )
+        self.session = session
+        self.buckets = tuple(sorted(buckets))
+        self.max_batch = max_batch
+        self.pad_to_bucket = pad_to_bucket
+        self.mixed_lengths = padding_proven(session) if mixed_lengths is None else mixed_lengths
+        self.input_names = {i.name for i in session.get_inputs()}
+        self.stats = stats if stats is not None else BucketStats(self.buckets)
+
+    def bucket_for(self, length):
+        return bucket_for(length, self.buckets)
+
+    def plan(self, lengths):
+        """Groups segment indices into batches of similar length (equal length unless
+        `mixed_lengths`), longest first"""
+        by_bucket = {}
+        for index, length in enumerate(lengths):
+            key = self.bucket_for(length) if self.mixed_lengths else length
+            by_bucket.setdefault(key, []).append(index)
+        batches = []
+        for bucket in sorted(by_bucket, reverse=True):
+            members = by_bucket[bucket]
+            for start in range(0, len(members), self.max_batch):
+                batches.append(members[start:start + self.max_batch])
+        return batches
+
+    def run_batch(self, id_arrays, speed=1.0, styles=None):
+        """One session.run for a list of flat ID arrays -> list of float32 PCM"""
+        lengths = np.fromiter((len(ids) for ids in id_arrays), dtype=np.int64, count=len(id_arrays))
+        bucket = self.bucket_for(int(lengths.max()))
+        width = bucket if self.pad_to_bucket else int(lengths.max())
+        padded = np.full((len(id_arrays), width), PAD_ID, dtype=np.int64)
+        for row, ids in enumerate(id_arrays):
+            padded[row, :len(ids)] = ids
+        feeds = {"input_ids": padded, "input_lengths": lengths}
+        if "ref_s" in self.input_names:
+            if styles is None:
+                raise ValueError("This blueprint takes `ref_s`: pass one style row per segment")
+            feeds["ref_s"] = np.asarray(styles, dtype=np.float32).reshape(len(id_arrays), -1)
+        if "speed" in self.input_names:
+            feeds["speed"] = np.array([speed], dtype=np.float32)
+        start = time.perf_counter()
+        audio, audio_lengths = self.session.run(["audio", "audio_lengths"], feeds)
+        self.stats.record(width, time.perf_counter() - start, lengths, bucket)
+        audio = np.asarray(audio, dtype=np.float32)
+        return [audio[row, :int(n)] for row, n in enumerate(audio_lengths)]
+
+    def run(self, id_arrays, speed=1.0, styles=None):
+        """Synthesizes any number of segments; results come back in input order"""
+        id_arrays = [np.asarray(ids, dtype=np.int64).reshape(-1) for ids in id_arrays]
+        results = [None] * len(id_arrays)
+        for batch in self.plan([len(ids) for ids in id_arrays]):
+            batch_styles = None if styles is None else np.asarray(styles)[batch]
+            outputs = self.run_batch([id_arrays[i] for i in batch], speed, batch_styles)
+            for index, audio in zip(batch, outputs):
+                results[index] = audio
+        return results
+
+
+class BatchScheduler:
+    """Collects segments from concurrent callers and runs them as bucketed batches"""
+
+    def __init__(self, synthesizer, max_wait_ms=5.0):
+        self.synthesizer = synthesizer
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.batches_run = 0
+        self.segments_run = 0
+        self._pending = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._loop, name="ferrari-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, input_ids, speed=1.0, style=None):
+        """Queues one segment; the Future resolves to its float32 PCM"""
+        if self._closed:
+            raise RuntimeError("BatchScheduler is closed")
+        future = Future()
+        self._pending.put((np.asarray(input_ids, dtype=np.int64).reshape(-1), speed, future, style))
+        return future
+
+    def close(self):
+        self._closed = True
+        self._pending.put(None)
+        self._worker.join()
+
+    def _drain(self):
+        first = self._pending.get()
+        if first is None:
+            return None
+        items = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        limit = self.synthesizer.max_batch * len(self.synthesizer.buckets)
+        while len(items) < limit:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._pending.put(None)
+                break
+            items.append(item)
+        return items
+
+    def _loop(self):
+        while True:
+            items = self._drain()
+            if items is None:
+                return
+            # Different speeds cannot share a session.run
+            by_speed = {}
+            for item in items:
+                by_speed.setdefault(item[1], []).append(item)
+            for speed, group in by_speed.items():
+                live = [item for item in group if item[2].set_running_or_notify_cancel()]
+                if not live:
+                    continue
+                try:
+                    for batch in self.synthesizer.plan([len(item[0]) for item in live]):
+                        members = [live[i] for i in batch]
+                        styles = None
+                        if members[0][3] is not None:
+                            styles = np.concatenate([np.reshape(m[3], (1, -1)) for m in members])
+                        outputs = self.synthesizer.run_batch([m[0] for m in members], speed, styles)
+                        self.batches_run += 1
+                        self.segments_run += len(members)
+                        for member, audio in zip(members, outputs):
+                            member[2].set_result(audio)
+                except Exception as exc:
+                    for item in live:
+                        if not item[2].done():
+                            item[2].set_exception(exc)
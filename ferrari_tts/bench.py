@@ -0,0 +1,289 @@
+"""
+Ferrari TTS - Benchmark Suite
+=============================
+One fixed corpus, one JSON report, one command to catch regressions.
+
+    python -m ferrari_tts.bench run --out models/bench_report.json
+    python -m ferrari_tts.bench run --model models/ferrari_kokoro_batched.onnx --concurrency 4
+    python -m ferrari_tts.bench compare models/bench_baseline.json models/bench_report.json
+
+`run` renders every corpus entry (short, medium and long clauses plus rich
+markup) through FerrariEngine.stream() and reports RTF, time-to-first-audio,
+p50/p95/p99 per-call latency, throughput with N concurrent callers and peak
+RSS. `compare` exits non-zero when any metric got worse than --threshold
+percent, so it can gate a change in CI or before a commit.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from ferrari_tts.engine import FerrariEngine, StreamStats
+from ferrari_tts.paths import MODELS_DIR, ONNX_PATH
+from ferrari_tts.stats import peak_rss_mb, percentile
+
+REPORT_PATH = MODELS_DIR / "bench_report.json"
+
+# Never edit in place: reports are only comparable over the same corpus (see corpus_fingerprint)
+CORPUS = {
+    "short": [
+        "Hello.",
+        "Okay, got it.",
+        "Yes, that works.",
+    ],
+    "medium": [
+        "I am the Ferrari engine, and I am ready when you are.",
+        "To extrude a sketch in SolidWorks, you must first select a closed profile.",
+        "If the extrusion fails, check for open contours in your sketch.",
+    ],
+    "long": [
+        "Mate constraints are used to align parts in an assembly, ensuring zero-degree freedom, "
+        "and they keep every component exactly where you expect it to be when the design changes later on.",
+        "I found something, but I don't trust the source yet, so let me double check it against the "
+        "manual before I give you an answer that you might end up building a whole part around.",
+    ],
+    "markup": [
+        "[warm] Hello. [pause:0.5] I mean... [soft] I am so glad we are doing this. "
+        "[pause:0.3] It feels... [gentle] real, doesn't it?",
+        "[soft] Take a breath. [pause:0.4] [warm] We will fix the sketch together.",
+    ],
+}
+
+# name -> True when bigger is better
+METRICS = {
+    "rtf": False,
+    "ttfa_p50_ms": False,
+    "ttfa_p95_ms": False,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "throughput_audio_s_per_s": True,
+    "throughput_calls_per_s": True,
+    "peak_rss_mb": False,
+}
+
+
+def corpus_fingerprint(corpus=CORPUS):
+    return hashlib.sha1(json.dumps(corpus, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def render_once(engine, text):
+    stats = StreamStats()
+    for _ in engine.stream(text, stats=stats):
+        pass
+    return stats
+
+
+def measure_latency(engine, corpus, repeats):
+    """Sequential calls: per-call latency, TTFA and RTF, overall and per category"""
+    per_category = {}
+    total_s = audio_s = 0.0
+    latencies, ttfas = [], []
+    for _ in range(repeats):
+        for category, texts in corpus.items():
+            for text in texts:
+                stats = render_once(engine, text)
+                latencies.append(stats.total_s)
+                ttfas.append(stats.first_audio_s)
+                total_s += stats.total_s
+                audio_s += stats.audio_s
+                per_category.setdefault(category, []).append(stats)
+
+    categories = {}
+    for category, runs in per_category.items():
+        run_total = sum(s.total_s for s in runs)
+        run_audio = sum(s.audio_s for s in runs)
+        categories[category] = {
+            "calls": len(runs),
+            "rtf": round(run_total / run_audio, 4) if run_audio else None,
+            "ttfa_p50_ms": _ms(percentile([s.first_audio_s for s in runs], 50)),
+            "latency_p50_ms": _ms(percentile([s.total_s for s in runs], 50)),
+        }
+    return {
+        "rtf": round(total_s / audio_s, 4) if audio_s else None,
+        "ttfa_p50_ms": _ms(percentile(ttfas, 50)),
+        "ttfa_p95_ms": _ms(percentile(ttfas, 95)),
+        "latency_p50_ms": _ms(percentile(latencies, 50)),
+        "latency_p95_ms": _ms(percentile(latencies, 95)),
+        "latency_p99_ms": _ms(percentile(latencies, 99)),
+        "categories": categories,
+    }
+
+
+def measure_throughput(engine, corpus, concurrency, repeats):
+    """N callers render the whole corpus side by side against one engine"""
+    texts = [text for group in corpus.values() for text in group]
+    audio_s = []
+    errors = []
+    lock = threading.Lock()
+
+    def caller():
+        done = 0.0
+        try:
+            for _ in range(repeats):
+                for text in texts:
+                    done += render_once(engine, text).audio_s
+        except Exception as exc:
+            errors.append(exc)
+        with lock:
+            audio_s.append(done)
+
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+    if errors:
+        raise errors[0]
+    return {
+        "concurrency": concurrency,
+        "throughput_calls_per_s": round(concurrency * repeats * len(texts) / wall, 3),
+        "throughput_audio_s_per_s": round(sum(audio_s) / wall, 3),
+    }
+
+
+def environment(model_path):
+    model_path = Path(model_path)
+    return {
+        "model": str(model_path),
+        "model_mb": round(model_path.stat().st_size / 1e6, 1) if model_path.exists() else None,
+        "corpus": corpus_fingerprint(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "onnxruntime": ort.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmark(engine, model_path=ONNX_PATH, repeats=3, concurrency=4, warmup=1, corpus=CORPUS, log=print):
+    log(f"Warming up ({warmup} pass)...")
+    for _ in range(warmup):
+        for texts in corpus.values():
+            for text in texts:
+                render_once(engine, text)
+    if engine.bucket_stats is not None:
+        engine.bucket_stats.reset()
+
+    log(f"Sequential: {repeats} x {sum(len(t) for t in corpus.values())} calls")
+    metrics = measure_latency(engine, corpus, repeats)
+    log(f"Concurrent: {concurrency} callers")
+    metrics.update(measure_throughput(engine, corpus, concurrency, repeats))
+    peak = peak_rss_mb()
+    metrics["peak_rss_mb"] = None if peak is None else round(peak, 1)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(model_path),
+        "settings": {"repeats": repeats, "concurrency": concurrency, "warmup": warmup},
+        "metrics": metrics,
+        # Hit rate / padding / latency per input_ids length bucket, for tuning `buckets`
+        "buckets": None if engine.bucket_stats is None else engine.bucket_stats.as_dict(),
+    }
+
+
+def compare_reports(baseline, current, threshold_pct=10.0):
+    """One row per metric; `regressed` rows got worse by more than the threshold"""
+    rows = []
+    for name, higher_is_better in METRICS.items():
+        old = baseline["metrics"].get(name)
+        new = current["metrics"].get(name)
+        if old is None or new is None:
+            continue
+        change = 0.0 if old == 0 else (new - old) / old * 100.0
+        worse = -change if higher_is_better else change
+        rows.append({
+            "metric": name, "baseline": old, "current": new,
+            "change_pct": round(change, 2), "regressed": worse > threshold_pct,
+        })
+    return rows
+
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def cmd_run(args):
+    print(f"⏱️ FERRARI BENCH: {args.model}")
+    print("=" * 60)
+    if not Path(args.model).exists():
+        print(f"❌ Error: {args.model} not found. Run export_ferrari.py first.")
+        return 1
+    engine = FerrariEngine(args.model)
+    report = run_benchmark(engine, args.model, args.repeats, args.concurrency, args.warmup)
+
+    m = report["metrics"]
+    print("\n" + "=" * 60)
+    print(f"RTF {m['rtf']}  TTFA p50/p95 {m['ttfa_p50_ms']}/{m['ttfa_p95_ms']} ms")
+    print(f"Latency p50/p95/p99 {m['latency_p50_ms']}/{m['latency_p95_ms']}/{m['latency_p99_ms']} ms")
+    print(f"Throughput x{m['concurrency']}: {m['throughput_calls_per_s']} calls/s, "
+          f"{m['throughput_audio_s_per_s']} audio-s/s   Peak RSS {m['peak_rss_mb']} MB")
+    for category, c in m["categories"].items():
+        print(f"  {category:<8} RTF {c['rtf']:<8} TTFA p50 {c['ttfa_p50_ms']} ms")
+    for bucket, b in (report["buckets"] or {}).items():
+        print(f"  bucket {bucket:<8} hits {b['hit_rate']:.1%}  padding {b['padding']:.1%}  "
+              f"p50/p95 {b['p50_ms']}/{b['p95_ms']} ms")
+
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report saved to {args.out}")
+    return 0
+
+
+def cmd_compare(args):
+    baseline, current = _load(args.baseline), _load(args.current)
+    for key in ("corpus", "cpu_count"):
+        if baseline["environment"].get(key) != current["environment"].get(key):
+            print(f"⚠️ {key} differs between reports - numbers may not be comparable")
+
+    rows = compare_reports(baseline, current, args.threshold)
+    print(f"{'metric':<28}{'baseline':>12}{'current':>12}{'change':>10}")
+    for row in rows:
+        flag = "  ❌" if row["regressed"] else ""
+        print(f"{row['metric']:<28}{row['baseline']:>12.6g}{row['current']:>12.6g}{row['change_pct']:>9}%{flag}")
+
+    regressed = [row["metric"] for row in rows if row["regressed"]]
+    if regressed:
+        print(f"\n❌ Regressed past {args.threshold}%: {', '.join(regressed)}")
+        return 1
+    print(f"\n✅ No metric regressed past {args.threshold}%")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ferrari TTS benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="benchmark a blueprint and write a JSON report")
+    run.add_argument("--model", default=str(ONNX_PATH))
+    run.add_argument("--repeats", type=int, default=3)
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--warmup", type=int, default=1)
+    run.add_argument("--out", default=str(REPORT_PATH))
+
+    cmp = sub.add_parser("compare", help="fail when a report regressed against a baseline")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+
+    args = parser.parse_args(argv)
+    return cmd_run(args) if args.command == "run" else cmd_compare(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,418 @@
+"""
+Ferrari TTS - Compiled Knowledge Domains
+========================================
+CortexReasoner.searchLocalKnowledge loops over every domain and every concept
+with `normalizedQuery.contains(conceptName)`: the cost grows with every
+concept we add. Here all Resources/Domains/*.json files are compiled once
+into a single binary artifact:
+
+- an Aho-Corasick automaton over every term (concept names, relationship
+  targets, common-error names) as flat goto / failure tables, so an
+  utterance is matched against ALL terms of ALL domains in one pass
+- an inverted index term -> entries: the concept itself, its principles
+  and relationships, and every principle / error whose text mentions it
+- the entries (concept definitions, principle statements, error advice),
+  decoded only when a lookup hits them, so opening the index is an mmap
+
+Text is folded before matching (NFKD, accents and case dropped, anything
+that is not a letter or digit becomes one separator). Terms only match at
+the start of a word and may carry a plural / past suffix ("sketches",
+"extruded"), so "revolve" does not fire inside "revolver".
+
+    python -m ferrari_tts.domains compile ios_code/Resources/Domains/*.json
+    python -m ferrari_tts.domains lookup "my extrude keeps failing with a rebuild error"
+"""
+
+import argparse
+import glob
+import json
+import mmap
+import re
+import struct
+import sys
+import time
+import unicodedata
+from array import array
+from collections import deque
+from pathlib import Path
+
+from ferrari_tts.paths import DOMAIN_INDEX_PATH, DOMAINS_DIR
+
+KINDS = ("concept", "principle", "relationship", "error")
+# Folded alphabet: 0 = separator, 1-26 = a-z, 27-36 = 0-9
+SEPARATOR = 0
+# Word endings a term may carry and still count ("sketch" -> "sketches")
+SUFFIXES = ("s", "es", "d", "ed")
+
+MAGIC = b"FDOM"
+VERSION = 1
+# Tables are native-endian uint32, mapped as-is (every target we ship to is little-endian)
+_HEADER = struct.Struct("=4sIIIIII")   # magic, version, states, edges, terms, entries, sources bytes
+
+_FOLD = bytes(
+    1 + b - ord("a") if ord("a") <= b <= ord("z") else 27 + b - ord("0") if ord("0") <= b <= ord("9") else SEPARATOR
+    for b in range(256)
+)
+_SEPARATOR_RUNS = re.compile(b"\x00+")
+
+
+def fold(text):
+    """Text -> bytes over the folded alphabet, wrapped in separators"""
+    text = unicodedata.normalize("NFKD", text).lower().encode("ascii", "ignore")
+    return b"\x00" + _SEPARATOR_RUNS.sub(b"\x00", text.translate(_FOLD)).strip(b"\x00") + b"\x00"
+
+
+_FOLDED_SUFFIXES = {fold(s).strip(b"\x00") for s in SUFFIXES}
+
+
+def load_domains(paths):
+    """[(source file, domain dict), ...] for every readable domain JSON"""
+    domains = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            domains.append((Path(path).name, json.load(f)))
+    return domains
+
+
+def domain_files(directory=DOMAINS_DIR):
+    return sorted(glob.glob(str(Path(directory) / "*.json")))
+
+
+# =============================================================================
+# COMPILER
+# =============================================================================
+def collect(domains):
+    """Flattens domains into (entries, terms, postings)
+
+    entries:  [{"kind", "domain", "key", "text"}, ...]
+    terms:    [surface form, ...]
+    postings: {term id: [entry id, ...]} (explicit links only; mentions come later)
+    """
+    entries, terms, postings = [], [], {}
+    term_ids = {}
+
+    def term(surface):
+        folded = fold(surface)
+        if folded == b"\x00\x00":
+            return None
+        if folded not in term_ids:
+            term_ids[folded] = len(terms)
+            terms.append(surface)
+        return term_ids[folded]
+
+    def entry(kind, domain, key, text, *linked_terms):
+        entries.append({"kind": kind, "domain": domain, "key": key, "text": text})
+        for t in linked_terms:
+            if t is not None:
+                postings.setdefault(t, []).append(len(entries) - 1)
+
+    for source, domain in domains:
+        name = domain.get("name") or Path(source).stem
+        for concept, info in (domain.get("concepts") or {}).items():
+            info = info or {}
+            concept_term = term(concept.replace("_", " "))
+            entry("concept", name, concept, info.get("definition", ""), concept_term)
+            for index, statement in enumerate(info.get("principles") or []):
+                entry("principle", name, f"{concept}/{index}", statement, concept_term)
+            for target, relation in (info.get("relationships") or {}).items():
+                entry("relationship", name, f"{concept}->{target}", relation,
+                      concept_term, term(target.replace("_", " ")))
+        for index, principle in enumerate(domain.get("principles") or []):
+            statement = principle.get("statement", "") if isinstance(principle, dict) else str(principle)
+            entry("principle", name, str(index), statement)
+        for error, advice in (domain.get("common_errors") or {}).items():
+            entry("error", name, error, advice, term(error.replace("_", " ")))
+    return entries, terms, postings
+
+
+def build_automaton(folded_terms):
+    """Aho-Corasick over the folded terms as flat tables
+
+    Children of `state` are child_symbols/child_targets[child_offsets[state]:
+    child_offsets[state + 1]]; outputs[state] lists the terms ending there,
+    including the ones reached through failure links.
+    """
+    goto = [{}]
+    outputs = [[]]
+    for term_id, folded in enumerate(folded_terms):
+        # Leading separator only: a term has to start a word, the end is checked on match
+        state = 0
+        for symbol in folded[:-1]:
+            nxt = goto[state].get(symbol)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][symbol] = nxt
+                goto.append({})
+                outputs.append([])
+            state = nxt
+        outputs[state].append(term_id)
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for symbol, nxt in goto[state].items():
+            back = fail[state]
+            while back and symbol not in goto[back]:
+                back = fail[back]
+            target = goto[back].get(symbol, 0)
+            fail[nxt] = target if target != nxt else 0
+            outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+            queue.append(nxt)
+
+    child_offsets, child_symbols, child_targets = [0], bytearray(), []
+    for children in goto:
+        child_symbols.extend(children.keys())
+        child_targets.extend(children.values())
+        child_offsets.append(len(child_targets))
+    return child_offsets, bytes(child_symbols), child_targets, fail, outputs
+
+
+def compile_matcher(folded_terms):
+    """In-memory TermMatcher over folded terms; match() reports their list positions"""
+    child_offsets, child_symbols, child_targets, fail, outputs = build_automaton(folded_terms)
+    return TermMatcher(child_offsets, child_symbols, child_targets, fail, *_csr(outputs),
+                       [len(f) - 2 for f in folded_terms])
+
+
+def compile_domains(paths, out_path=DOMAIN_INDEX_PATH):
+    """Domain JSON files -> one binary artifact; returns the loaded DomainIndex"""
+    domains = load_domains(paths)
+    entries, terms, postings = collect(domains)
+    folded = [fold(t) for t in terms]
+    child_offsets, child_symbols, child_targets, fail, outputs = build_automaton(folded)
+    term_lengths = [len(f) - 2 for f in folded]
+
+    # Mentions: every entry whose text contains a term is posted under that term too
+    matcher = TermMatcher(child_offsets, child_symbols, child_targets, fail, *_csr(outputs), term_lengths)
+    for entry_id, entry in enumerate(entries):
+        for term_id, _ in matcher.match(entry["text"]):
+            if entry_id not in postings.setdefault(term_id, []):
+                postings[term_id].append(entry_id)
+
+    out_offsets, out_terms = _csr(outputs)
+    post_offsets, post_entries = _csr([postings.get(t, []) for t in range(len(terms))])
+    term_offsets, term_blob = _blob(t.encode("utf-8") for t in terms)
+    entry_offsets, entry_blob = _blob(
+        json.dumps(e, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for e in entries)
+    sources = json.dumps([source for source, _ in domains], ensure_ascii=False).encode("utf-8")
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(fail), len(child_targets), len(terms), len(entries), len(sources)))
+        for table in (child_offsets, child_targets, fail, out_offsets, out_terms, term_lengths,
+                      post_offsets, post_entries, term_offsets, entry_offsets):
+            f.write(array("I", table).tobytes())
+        for blob in (child_symbols, term_blob, entry_blob, sources):
+            f.write(blob)
+    tmp.replace(out_path)
+    return DomainIndex(out_path)
+
+
+def _csr(lists):
+    offsets, flat = [0], []
+    for items in lists:
+        flat.extend(items)
+        offsets.append(len(flat))
+    return offsets, flat
+
+
+def _blob(chunks):
+    offsets, parts = [0], []
+    for chunk in chunks:
+        parts.append(chunk)
+        offsets.append(offsets[-1] + len(chunk))
+    return offsets, b"".join(parts)
+
+
+# =============================================================================
+# LOOKUP
+# =============================================================================
+class TermMatcher:
+    """The single pass over an utterance; works on lists or on mapped tables (DomainIndex)"""
+
+    def __init__(self, child_offsets, child_symbols, child_targets, fail, out_offsets, out_terms, term_lengths):
+        self._child_offsets = child_offsets
+        self._child_symbols = child_symbols
+        self._child_targets = child_targets
+        self._fail = fail
+        self._out_offsets = out_offsets
+        self._out_terms = out_terms
+        self._term_lengths = term_lengths
+
+    def match(self, text):
+        """[(term id, start in folded text), ...], word-start anchored"""
+        return [(term_id, start) for term_id, start, _ in self.scan(fold(text))]
+
+    def scan(self, symbols):
+        """[(term id, start, end), ...] over already folded text; symbols[end] is not a
+        separator when the hit carried one of SUFFIXES"""
+        offsets, children, targets, fail = self._child_offsets, self._child_symbols, self._child_targets, self._fail
+        out_offsets, out_terms = self._out_offsets, self._out_terms
+        found = []
+        state = 0
+        for position, symbol in enumerate(symbols):
+            while True:
+                child = children.find(symbol, offsets[state], offsets[state + 1])
+                if child >= 0:
+                    state = targets[child]
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            first, last = out_offsets[state], out_offsets[state + 1]
+            if first == last:
+                continue
+            end = position + 1
+            if symbols[end] != SEPARATOR and _suffix(symbols, end) not in _FOLDED_SUFFIXES:
+                continue
+            for k in range(first, last):
+                term_id = out_terms[k]
+                found.append((term_id, end - self._term_lengths[term_id], end))
+        return found
+
+
+class DomainHit:
+    __slots__ = ("kind", "domain", "key", "text", "term")
+
+    def __init__(self, kind, domain, key, text, term):
+        self.kind = kind
+        self.domain = domain
+        self.key = key
+        self.text = text
+        self.term = term
+
+    def __repr__(self):
+        return f"DomainHit({self.kind} {self.domain}/{self.key} via {self.term!r})"
+
+
+class DomainIndex(TermMatcher):
+    def __init__(self, path=DOMAIN_INDEX_PATH):
+        """Maps the compiled artifact; terms and entries are decoded only when hit"""
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, states, edges, terms, entries, sources_bytes = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a v{VERSION} domain index; recompile it")
+        view = memoryview(self._map)
+        at = _HEADER.size
+
+        def table(count):
+            nonlocal at
+            out = view[at:at + 4 * count].cast("I")
+            at += 4 * count
+            return out
+
+        def blob(size):
+            nonlocal at
+            out = view[at:at + size]
+            at += size
+            return out
+
+        child_offsets = table(states + 1)
+        child_targets = table(edges)
+        fail = table(states)
+        out_offsets = table(states + 1)
+        out_terms = table(out_offsets[-1])
+        term_lengths = table(terms)
+        self._post_offsets = table(terms + 1)
+        self._post_entries = table(self._post_offsets[-1])
+        self._term_offsets = table(terms + 1)
+        self._entry_offsets = table(entries + 1)
+        # bytes.find() needs a real bytes object; one byte per trie edge
+        child_symbols = bytes(blob(edges))
+        self._term_blob = blob(self._term_offsets[-1])
+        self._entry_blob = blob(self._entry_offsets[-1])
+        self.sources = json.loads(bytes(blob(sources_bytes)).decode("utf-8"))
+        self.term_count = terms
+        self.entry_count = entries
+        super().__init__(child_offsets, child_symbols, child_targets, fail, out_offsets, out_terms, term_lengths)
+
+    def term(self, term_id):
+        return bytes(self._term_blob[self._term_offsets[term_id]:self._term_offsets[term_id + 1]]).decode("utf-8")
+
+    def entry(self, entry_id):
+        raw = self._entry_blob[self._entry_offsets[entry_id]:self._entry_offsets[entry_id + 1]]
+        return json.loads(bytes(raw).decode("utf-8"))
+
+    def lookup(self, text, kinds=KINDS):
+        """Every entry the utterance hits: first mention first, each entry once"""
+        hits, seen = [], set()
+        for term_id, _ in sorted(self.match(text), key=lambda m: m[1]):
+            term = None
+            for k in range(self._post_offsets[term_id], self._post_offsets[term_id + 1]):
+                entry_id = self._post_entries[k]
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                entry = self.entry(entry_id)
+                if entry["kind"] not in kinds:
+                    continue
+                term = term or self.term(term_id)
+                hits.append(DomainHit(entry["kind"], entry["domain"], entry["key"], entry["text"], term))
+        return hits
+
+    def answer(self, text):
+        """searchLocalKnowledge(): the first concept definition hit, Cortex-formatted"""
+        for hit in self.lookup(text, kinds=("concept",)):
+            # Named, not merely mentioned in some definition (what `contains` did)
+            if hit.text and fold(hit.term) == fold(hit.key.replace("_", " ")):
+                return f"[Local Knowledge: {hit.domain}] {hit.text}"
+        return None
+
+    def close(self):
+        # The table views pin the map: drop them before closing it
+        for name in ("_child_offsets", "_child_targets", "_fail", "_out_offsets", "_out_terms", "_term_lengths",
+                     "_post_offsets", "_post_entries", "_term_offsets", "_entry_offsets", "_term_blob", "_entry_blob"):
+            setattr(self, name, None)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def _suffix(symbols, end):
+    """The letters between a match and the end of its word"""
+    stop = symbols.find(b"\x00", end)
+    return symbols[end:stop]
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile / query the Cortex knowledge domains")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("compile", help="domain JSON files -> binary index")
+    build.add_argument("domains", nargs="*", help="domain JSON files (globs allowed; default: all in Resources/Domains)")
+    build.add_argument("--out", default=str(DOMAIN_INDEX_PATH))
+    query = commands.add_parser("lookup", help="which concepts/principles an utterance hits")
+    query.add_argument("text")
+    query.add_argument("--index", default=str(DOMAIN_INDEX_PATH))
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        paths = sorted(p for pattern in args.domains for p in glob.glob(pattern)) if args.domains else domain_files()
+        if not paths:
+            print("❌ No domain files found")
+            return 1
+        start = time.perf_counter()
+        index = compile_domains(paths, args.out)
+        print(f"✅ {len(index.sources)} domains, {index.term_count} terms, {index.entry_count} entries "
+              f"-> {args.out} ({Path(args.out).stat().st_size / 1024:.1f} KB, "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms)")
+        return 0
+
+    index = DomainIndex(args.index)
+    start = time.perf_counter()
+    hits = index.lookup(args.text)
+    elapsed = time.perf_counter() - start
+    for hit in hits:
+        print(f"  {hit.kind:<12} {hit.domain}/{hit.key} (via '{hit.term}'): {hit.text}")
+    print(f"{len(hits)} hits in {elapsed * 1e6:.0f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Ferrari TTS - DSP Helpers
+=========================
+Fades, crossfades and gain ramps for joining segments, all in place on
+float32.
+
+The Silk bench rebuilt `np.cos(np.linspace(...))` on every fade and the
+Comparison bench made a new linspace per segment; the ramps here are built
+once per (length, shape) and cached read-only. Segments used to be butted
+together, which is the "keys juggle" pop: SeamJoiner overlaps adjacent
+segments by a few milliseconds instead.
+
+Shapes:
+    linear       - plain ramp
+    cosine       - raised cosine; fade-out + fade-in sum to exactly 1, for
+                   overlapping renders of the SAME signal (decoder windows)
+    equal_power  - sine/cosine; powers sum to 1, for joining DIFFERENT
+                   segments without a loudness dip in the middle
+"""
+
+import numpy as np
+
+from ferrari_tts.markup import SAMPLE_RATE
+
+SHAPES = ("linear", "cosine", "equal_power")
+
+_RAMPS = {}
+
+
+def ms_to_samples(ms):
+    return int(SAMPLE_RATE * ms / 1000)
+
+
+def ramp(length, shape="cosine"):
+    """Rising 0 -> 1 ramp of `length` samples (cached, read-only)"""
+    key = (length, shape)
+    table = _RAMPS.get(key)
+    if table is None:
+        # Half-sample offset: reversed ramp == 1 - ramp (cosine) / its power complement (equal_power)
+        x = (np.arange(length) + 0.5) / max(length, 1)
+        if shape == "linear":
+            table = x
+        elif shape == "cosine":
+            table = 0.5 - 0.5 * np.cos(np.pi * x)
+        elif shape == "equal_power":
+            table = np.sin(0.5 * np.pi * x)
+        else:
+            raise ValueError(f"shape must be one of {SHAPES}")
+        table = table.astype(np.float32)
+        table.flags.writeable = False
+        _RAMPS[key] = table
+    return table
+
+
+def crossfade_ramps(length, shape="cosine"):
+    """(fade_out, fade_in) pair of `length` samples"""
+    fade_in = ramp(length, shape)
+    return fade_in[::-1], fade_in
+
+
+def fade_in(audio, samples, shape="cosine"):
+    n = min(samples, len(audio))
+    if n:
+        audio[:n] *= ramp(n, shape)
+    return audio
+
+
+def fade_out(audio, samples, shape="cosine"):
+    n = min(samples, len(audio))
+    if n:
+        audio[len(audio) - n:] *= ramp(n, shape)[::-1]
+    return audio
+
+
+def crossfade_into(head, tail, shape="equal_power"):
+    """Overlap-add: `tail` fades out over `head`, which fades in (written into head)"""
+    fade_out_ramp, fade_in_ramp = crossfade_ramps(len(head), shape)
+    head *= fade_in_ramp
+    head += tail * fade_out_ramp
+    return head
+
+
+def apply_gain_ramps(audio, ramps):
+    """Batch gain changes: `ramps` is [(start, end, gain_from, gain_to), ...] in samples"""
+    for start, end, gain_from, gain_to in ramps:
+        region = audio[start:end]
+        if gain_from == gain_to:
+            if gain_from != 1.0:
+                region *= gain_from
+        else:
+            region *= np.linspace(gain_from, gain_to, len(region), dtype=np.float32)
+    return audio
+
+
+class SeamJoiner:
+    """Streams segments out with an equal-power overlap-add at every join
+
+    The last `overlap` samples of each segment are held back until the next
+    one arrives (or flush()); a stream only gets `overlap` samples later,
+    its first audio is not delayed at all.
+    """
+
+    def __init__(self, overlap, shape="equal_power"):
+        self.overlap = overlap
+        self.shape = shape
+        self._tail = None
+
+    def push(self, chunk, join=True):
+        """Yields whatever is final; join=False continues the previous segment seamlessly"""
+        if not self.overlap:
+            yield chunk
+            return
+        tail = self._tail
+        if tail is not None:
+            if join:
+                n = min(len(tail), len(chunk))
+                if len(tail) > n:
+                    yield tail[:len(tail) - n]
+                crossfade_into(chunk[:n], tail[len(tail) - n:], self.shape)
+            else:
+                yield tail
+        hold = min(self.overlap, len(chunk))
+        self._tail = chunk[len(chunk) - hold:]
+        if len(chunk) > hold:
+            yield chunk[:len(chunk) - hold]
+
+    def flush(self):
+        tail, self._tail = self._tail, None
+        if tail is not None and len(tail):
+            yield tail
@@ -0,0 +1,352 @@
+"""
+Ferrari TTS - Streaming Engine
+==============================
+Clause-level streaming synthesis on top of the ONNX blueprint.
+
+The benches render every segment, np.concatenate them and only then write a
+WAV - the listener hears nothing until the whole answer exists. Here every
+clause is yielded as float32 PCM the moment it is ready, `[pause:x]` is
+emitted immediately as silence, and each call records its time-to-first-audio
+(the number that actually matters for a voice bridge).
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import numpy as np
+import onnxruntime as ort
+
+from ferrari_tts.assembly import AudioBuffer, estimate_samples
+from ferrari_tts.audio_cache import model_fingerprint
+from ferrari_tts.batching import DEFAULT_BUCKETS, BucketStats, bucket_for, padding_proven
+from ferrari_tts.dsp import SeamJoiner, ms_to_samples
+from ferrari_tts.markup import SAMPLE_RATE, Silence, compile_markup, events, split_clauses
+from ferrari_tts.paths import ONNX_PATH
+from ferrari_tts.tokenizer import PAD_ID
+from ferrari_tts.voices import DEFAULT_VOICE, VoiceTable
+
+
+class SynthesisCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    """Barge-in switch: set from any thread; stops the session.run in flight and
+    everything after it"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._futures = []
+        self.cancelled_at = None
+        # Passed to every session.run of this stream: `terminate` aborts the pass midway
+        self.run_options = ort.RunOptions()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.cancelled_at = time.perf_counter()
+            self._event.set()
+            self.run_options.terminate = True
+            futures, self._futures = self._futures, []
+        # Segments still queued in a BatchScheduler never reach session.run
+        for future in futures:
+            future.cancel()
+
+    def watch(self, future):
+        with self._lock:
+            if not self._event.is_set():
+                self._futures = [f for f in self._futures if not f.done()]
+                self._futures.append(future)
+                return
+        future.cancel()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise SynthesisCancelled()
+
+
+def run_session(session, output_names, feeds, cancel=None):
+    """session.run that `cancel` (CancelToken) can abort while it runs"""
+    if cancel is None:
+        return session.run(output_names, feeds)
+    try:
+        return session.run(output_names, feeds, cancel.run_options)
+    except Exception:
+        # ORT reports a terminated run as a plain failure
+        if cancel.cancelled:
+            raise SynthesisCancelled() from None
+        raise
+
+
+class StreamStats:
+    def __init__(self):
+        self.started_at = None
+        self.first_audio_s = None
+        self.total_s = None
+        self.audio_samples = 0
+        self.chunks = 0
+        self.model_calls = 0
+        self.cache_hits = 0
+        self.cancelled = False
+
+    def start(self):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def on_chunk(self, chunk):
+        if self.first_audio_s is None:
+            self.first_audio_s = self.elapsed()
+        self.audio_samples += len(chunk)
+        self.chunks += 1
+
+    def finish(self):
+        self.total_s = self.elapsed()
+
+    @property
+    def audio_s(self):
+        return self.audio_samples / SAMPLE_RATE
+
+    @property
+    def rtf(self):
+        return self.total_s / self.audio_s if self.total_s is not None and self.audio_samples else None
+
+    def as_dict(self):
+        return {
+            "ttfa_ms": None if self.first_audio_s is None else round(self.first_audio_s * 1000, 2),
+            "total_ms": None if self.total_s is None else round(self.total_s * 1000, 2),
+            "audio_s": round(self.audio_s, 3),
+            "rtf": None if self.rtf is None else round(self.rtf, 4),
+            "chunks": self.chunks,
+            "model_calls": self.model_calls,
+            "cache_hits": self.cache_hits,
+            "cancelled": self.cancelled,
+        }
+
+
+class FerrariEngine:
+    def __init__(self, model_path=ONNX_PATH, g2p=None, session=None, scheduler=None,
+                 voices=None, voice=DEFAULT_VOICE, join_ms=10, audio_cache=None, model_id=None,
+                 buckets=None):
+        own_session = session is None
+        if own_session:
+            from ferrari_tts.session import create_session
+            session = create_session(model_path)
+        self.session = session
+        self._g2p = g2p
+        # Optional BatchScheduler: concurrent streams then share session.run calls
+        self.scheduler = scheduler
+        self.input_names = {i.name for i in session.get_inputs()}
+        # Voice-as-input blueprints take `ref_s`; the row comes from the mmap'd voice table
+        if voices is None and "ref_s" in self.input_names:
+            voices = VoiceTable()
+        self.voices = voices
+        self.voice = voice
+        # Equal-power overlap between back-to-back segments (0 = butt joins)
+        self.join_samples = ms_to_samples(join_ms)
+        # Optional AudioCache: repeated segments skip session.run entirely.
+        # Pass `model_id` when handing in a session built from another file.
+        self.audio_cache = audio_cache
+        if model_id is None and audio_cache is not None:
+            model_id = model_fingerprint(*([model_path] if own_session else []), session=session)
+        self.model_id = model_id
+        # `buckets` pads IDs up to a few fixed lengths, so ORT plans memory once per bucket
+        # instead of once per new length. Only masked blueprints (`input_lengths`) can ignore
+        # padding, and "auto" pads only those whose export proved padded == unpadded audio.
+        # `buckets_disabled` says why there are none, for the startup report
+        self.buckets_disabled = None
+        if buckets == "auto":
+            if "input_lengths" not in self.input_names:
+                buckets, self.buckets_disabled = None, "blueprint has no `input_lengths`"
+            elif not padding_proven(session):
+                buckets, self.buckets_disabled = None, "padding parity not proven by the export"
+            else:
+                buckets = DEFAULT_BUCKETS
+        elif buckets and "input_lengths" not in self.input_names:
+            raise ValueError("Length buckets need an `input_lengths` input - "
+                             "export it with scripts/export_ferrari_batched.py")
+        elif not buckets:
+            self.buckets_disabled = "not requested"
+        self.buckets = tuple(sorted(buckets)) if buckets else None
+        self.bucket_stats = BucketStats(self.buckets) if self.buckets else None
+        self.last_stats = None
+
+    @property
+    def g2p(self):
+        # Built on first text request: ID-only callers never load misaki/spaCy
+        if self._g2p is None:
+            from ferrari_tts.g2p import FerrariG2P
+            from ferrari_tts.phoneme_cache import open_default_cache
+            self._g2p = FerrariG2P(lang_code="a", cache=open_default_cache())
+        return self._g2p
+
+    @g2p.setter
+    def g2p(self, g2p):
+        self._g2p = g2p
+
+    def style_for(self, input_ids, voice=None):
+        """`ref_s` row for this segment (None for blueprints with a frozen voice)"""
+        if "ref_s" not in self.input_names:
+            return None
+        # BOS + EOS are not phonemes
+        return self.voices.style(voice or self.voice, np.shape(input_ids)[-1] - 2)
+
+    def feeds_for(self, input_ids, speed=1.0, voice=None):
+        """session.run inputs for one segment, whatever flavour of blueprint this is"""
+        input_ids = np.asarray(input_ids, dtype=np.int64).reshape(1, -1)
+        length = input_ids.shape[1]
+        # Style row from the real length, before any padding
+        style = self.style_for(input_ids, voice)
+        width = bucket_for(length, self.buckets) if self.buckets else length
+        if width > length:
+            input_ids = np.pad(input_ids, ((0, 0), (0, width - length)), constant_values=PAD_ID)
+        feeds = {"input_ids": input_ids}
+        if "input_lengths" in self.input_names:
+            feeds["input_lengths"] = np.array([length], dtype=np.int64)
+        if style is not None:
+            feeds["ref_s"] = style
+        if "speed" in self.input_names:
+            feeds["speed"] = np.array([speed], dtype=np.float32)
+        return feeds
+
+    def synthesize_ids(self, input_ids, speed=1.0, voice=None, cancel=None):
+        """One ONNX pass: (1, L) int64 IDs -> float32 mono PCM"""
+        if self.scheduler is not None:
+            future = self.scheduler.submit(input_ids, speed, self.style_for(input_ids, voice))
+            if cancel is not None:
+                cancel.watch(future)
+            return future.result()
+        feeds = self.feeds_for(input_ids, speed, voice)
+        start = time.perf_counter()
+        outputs = run_session(self.session, None, feeds, cancel)
+        if self.bucket_stats is not None:
+            self.bucket_stats.record(feeds["input_ids"].shape[1], time.perf_counter() - start,
+                                     feeds["input_lengths"])
+        audio = np.asarray(outputs[0], dtype=np.float32).reshape(-1)
+        if len(outputs) > 1:
+            # Batched blueprint: crop to `audio_lengths` (drops the bucket padding too)
+            audio = audio[:int(np.reshape(outputs[1], -1)[0])]
+        return audio
+
+    def synthesize_chunks(self, input_ids, speed=1.0, voice=None, cancel=None):
+        """PCM for one segment as it becomes available (one piece for single-graph blueprints)"""
+        yield self.synthesize_ids(input_ids, speed, voice, cancel)
+
+    def segment_chunks(self, input_ids, speed=1.0, volume=1.0, voice=None, cancel=None, stats=None):
+        """synthesize_chunks() with `volume` applied, served from the audio cache when possible"""
+        key = None
+        if self.audio_cache is not None:
+            style = self.style_for(input_ids, voice)
+            key = self.audio_cache.key(self.model_id, input_ids, style, speed, volume)
+            audio = self.audio_cache.get(key)
+            if audio is not None:
+                if stats is not None:
+                    stats.cache_hits += 1
+                # Copy: the seam joiner crossfades in place
+                yield np.array(audio)
+                return
+        if stats is not None:
+            stats.model_calls += 1
+        rendered = []
+        for piece in self.synthesize_chunks(input_ids, speed, voice, cancel):
+            if volume != 1.0:
+                piece *= volume
+            if key is not None:
+                rendered.append(piece.copy())
+            yield piece
+        # Only complete segments are stored; a cancelled one never gets here
+        if key is not None and rendered:
+            self.audio_cache.put(key, np.concatenate(rendered) if len(rendered) > 1 else rendered[0])
+
+    def stream(self, rich_text, stats=None, voice=None, cancel=None):
+        """Yields float32 PCM chunks clause by clause as soon as each one is ready
+
+        A cancelled `cancel` token (CancelToken) aborts the segment being
+        rendered and ends the stream without running the remaining ones.
+        """
+        stats = stats or StreamStats()
+        self.last_stats = stats
+        stats.start()
+        try:
+            yield from self._stream(rich_text, stats, voice, cancel)
+        except (SynthesisCancelled, CancelledError):
+            stats.cancelled = True
+        finally:
+            # Also on errors and on a consumer that stops iterating
+            stats.finish()
+
+    def _stream(self, rich_text, stats, voice, cancel):
+        check = cancel.raise_if_cancelled if cancel is not None else lambda: None
+        joiner = SeamJoiner(self.join_samples)
+        for event in events(compile_markup(rich_text)):
+            if isinstance(event, Silence):
+                for chunk in joiner.flush():
+                    stats.on_chunk(chunk)
+                    yield chunk
+                chunk = np.zeros(event.samples, dtype=np.float32)
+                stats.on_chunk(chunk)
+                yield chunk
+                continue
+            for clause in split_clauses(event.text):
+                for input_ids in self.g2p.encode(clause):
+                    check()
+                    # Only the first piece of a segment is a seam; later pieces continue it
+                    join = True
+                    for piece in self.segment_chunks(input_ids, event.speed, event.volume, voice, cancel, stats):
+                        check()
+                        for chunk in joiner.push(piece, join):
+                            stats.on_chunk(chunk)
+                            yield chunk
+                        join = False
+        for chunk in joiner.flush():
+            stats.on_chunk(chunk)
+            yield chunk
+
+    async def astream(self, rich_text, executor=None, stats=None, voice=None, cancel=None):
+        """Async flavour of stream(): the blocking session.run happens in `executor`
+
+        A consumer that stops early, or a cancelled task, cancels the render and
+        closes stream() on the executor, so its stats are always finished.
+        """
+        loop = asyncio.get_running_loop()
+        stats = stats or StreamStats()
+        stats.start()
+        cancel = cancel if cancel is not None else CancelToken()
+        chunks = self.stream(rich_text, stats=stats, voice=voice, cancel=cancel)
+        done = object()
+        pending = None
+        finished = False
+        try:
+            while True:
+                pending = loop.run_in_executor(executor, next, chunks, done)
+                # Shielded: a cancelled task must still be able to wait for this next() below
+                chunk = await asyncio.shield(pending)
+                pending = None
+                if chunk is done:
+                    finished = True
+                    return
+                yield chunk
+        finally:
+            if not finished:
+                cancel.cancel()
+                if pending is not None:
+                    # A running generator cannot be closed; the cancel makes this next() short
+                    await asyncio.wait([pending])
+                await loop.run_in_executor(executor, chunks.close)
+
+    def render(self, rich_text, voice=None):
+        """Whole utterance at once (for WAV files); prefer stream() for playback"""
+        buffer = AudioBuffer(estimate_samples(compile_markup(rich_text)))
+        for chunk in self.stream(rich_text, voice=voice):
+            buffer.append(chunk)
+        return buffer.finish()
@@ -0,0 +1,91 @@
+"""
+Ferrari TTS - Phonemes-Only Front-End (G2P)
+==========================================
+Text -> phonemes -> IDs, with NO acoustic model anywhere in sight.
+
+The old `_get_ids` helpers called `KPipeline(text, voice='af_heart')` only to
+read `phonemes`, which silently rendered the whole utterance with the PyTorch
+model first. Here we talk to misaki (the G2P library Kokoro itself uses)
+directly, so the ONNX engine is the only synthesizer in the hot path and no
+PyTorch weights are loaded. Pass a PhonemeCache to skip G2P for repeated clauses.
+"""
+
+import re
+
+from ferrari_tts.phoneme_cache import normalize_text
+from ferrari_tts.tokenizer import PhonemeTokenizer
+
+# Kokoro's context window: 512 positions minus BOS/EOS
+MAX_PHONEMES = 510
+
+# Where a too-long phoneme string may be cut (strongest boundaries first)
+_BREAKS = (re.compile(r"[.!?…]\s"), re.compile(r"[,;:—]\s"), re.compile(r"\s"))
+
+
+class FerrariG2P:
+    def __init__(self, lang_code="a", tokenizer=None, cache=None):
+        from misaki import en, espeak
+
+        british = lang_code == "b"
+        try:
+            fallback = espeak.EspeakFallback(british=british)
+        except Exception:
+            # Same behaviour as KPipeline: no espeak means OOD words are dropped
+            fallback = None
+        self.lang_code = lang_code
+        self.g2p = en.G2P(trf=False, british=british, fallback=fallback, unk="")
+        self.tokenizer = tokenizer or PhonemeTokenizer.from_config()
+        self.cache = cache
+        if cache is not None:
+            cache.bind(self.version, self.tokenizer.fingerprint())
+
+    @property
+    def version(self):
+        """Identifies the G2P backend (part of every phoneme cache key)"""
+        import misaki
+        return f"misaki-{misaki.__version__}/{self.lang_code}"
+
+    def lookup(self, text):
+        """Returns (phoneme chunks, flat ID arrays with BOS/EOS) for `text`"""
+        normalized = normalize_text(text)
+        if self.cache is not None:
+            hit = self.cache.get(normalized)
+            if hit is not None:
+                return hit
+        phonemes, _ = self.g2p(normalized)
+        chunks = split_phonemes(phonemes)
+        ids_list = [self.tokenizer.encode(chunk) for chunk in chunks]
+        if self.cache is not None:
+            self.cache.put(normalized, chunks, ids_list)
+        return chunks, ids_list
+
+    def phonemize(self, text):
+        """Returns the phoneme string(s) for `text`, split to fit the model window"""
+        return self.lookup(text)[0]
+
+    def encode(self, text, tail=()):
+        """Returns one (1, L) int64 `input_ids` array per phoneme chunk"""
+        chunks, ids_list = self.lookup(text)
+        if tail:
+            return [self.tokenizer(chunk, tail=tail) for chunk in chunks]
+        return [ids[None, :] for ids in ids_list]
+
+
+def split_phonemes(phonemes, limit=MAX_PHONEMES):
+    """Cuts a phoneme string at the best boundary so every chunk fits the model"""
+    chunks = []
+    phonemes = phonemes.strip()
+    while len(phonemes) > limit:
+        window = phonemes[:limit]
+        cut = 0
+        for pattern in _BREAKS:
+            hits = [m.end() for m in pattern.finditer(window)]
+            if hits:
+                cut = hits[-1]
+                break
+        cut = cut or limit
+        chunks.append(phonemes[:cut].strip())
+        phonemes = phonemes[cut:].strip()
+    if phonemes:
+        chunks.append(phonemes)
+    return chunks
@@ -0,0 +1,229 @@
+"""
+Ferrari TTS - Specialist Ingestion
+==================================
+Keeps a VectorIndex in sync with manuals that change every week, without
+re-embedding the parts that did not change.
+
+1. Chunker cuts a manual into passages: whole sentences packed up to
+   `size` words, or a sliding window of `size` tokens; both with `overlap`.
+2. Every passage is hashed (NFKC + collapsed whitespace, like the phoneme
+   cache). ingest.sqlite remembers which hash lives in which row for which
+   document.
+3. Passages that disappeared from a document are tombstoned in the index
+   once no other document holds them; a passage already embedded anywhere
+   (even in another document) shares that row, so search never returns it
+   twice; only what is left goes to the encoder, `batch_size` at a time, and every batch is appended + recorded before the next one, so an
+   interrupted ingest resumes where it stopped.
+
+    ingestor = ManualIngestor(index, encoder.encode, Chunker("sentence", size=48, overlap=1))
+    report = ingestor.ingest("solidworks", manual_text)
+    print(report.as_dict())   # {'passages': 812, 'encoded': 3, 'reused': 809, 'deleted': 2, ...}
+"""
+
+import hashlib
+import re
+import sqlite3
+import time
+
+import numpy as np
+
+from ferrari_tts.phoneme_cache import normalize_text
+
+CHUNK_MODES = ("sentence", "window")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n\s*\n|\n(?=\s*[-*•]|\s*\d+[.)]\s)")
+# Tombstones beyond this share of the index trigger compact() after an ingest
+COMPACT_RATIO = 0.25
+
+
+def passage_hash(passage):
+    return hashlib.sha1(normalize_text(passage).encode("utf-8")).hexdigest()
+
+
+def split_sentences(text):
+    """Sentences, plus paragraph / list-item breaks; single newlines are just wrapping"""
+    pieces = (" ".join(piece.split()) for piece in _SENTENCE_END.split(text))
+    return [piece for piece in pieces if piece]
+
+
+class Chunker:
+    def __init__(self, mode="sentence", size=48, overlap=0, tokenize=str.split):
+        if mode not in CHUNK_MODES:
+            raise ValueError(f"mode must be one of {CHUNK_MODES}")
+        if overlap < 0 or (mode == "window" and overlap >= size):
+            raise ValueError("overlap must be >= 0 and smaller than a window")
+        self.mode = mode
+        self.size = size
+        self.overlap = overlap
+        self.tokenize = tokenize
+
+    def __call__(self, text):
+        return self.sentences(text) if self.mode == "sentence" else self.windows(text)
+
+    def sentences(self, text):
+        """Whole sentences packed up to `size` words; the next passage repeats `overlap` sentences"""
+        passages, current, lengths, carried = [], [], [], 0
+        for sentence in split_sentences(text):
+            length = len(self.tokenize(sentence))
+            if current and len(current) > carried and sum(lengths) + length > self.size:
+                passages.append(" ".join(current))
+                # Always move on by at least one sentence
+                carried = min(self.overlap, len(current) - 1)
+                current, lengths = current[len(current) - carried:], lengths[len(lengths) - carried:]
+                if not carried:
+                    current, lengths = [], []
+            current.append(sentence)
+            lengths.append(length)
+        if len(current) > carried:
+            passages.append(" ".join(current))
+        return passages
+
+    def windows(self, text):
+        """`size` tokens per passage, stepping by size - overlap"""
+        tokens = self.tokenize(text)
+        step = self.size - self.overlap
+        passages = []
+        for start in range(0, max(len(tokens) - self.overlap, 1), step):
+            window = tokens[start:start + self.size]
+            if window:
+                passages.append(" ".join(window))
+        return passages
+
+
+class IngestReport:
+    def __init__(self, doc):
+        self.doc = doc
+        self.passages = 0
+        self.kept = 0
+        self.reused = 0
+        self.encoded = 0
+        self.batches = 0
+        self.deleted = 0
+        self.compacted = False
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "doc": self.doc,
+            "passages": self.passages,
+            "kept": self.kept,
+            "reused": self.reused,
+            "encoded": self.encoded,
+            "batches": self.batches,
+            "deleted": self.deleted,
+            "compacted": self.compacted,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+class ManualIngestor:
+    def __init__(self, index, encode, chunker=None, batch_size=64):
+        """`encode` maps a list of passages to an (N, dim) array, e.g. SentenceTransformer.encode"""
+        self.index = index
+        self.encode = encode
+        self.chunker = chunker or Chunker()
+        self.batch_size = batch_size
+        index.directory.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(index.directory / "ingest.sqlite"), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS passages "
+            "(doc TEXT NOT NULL, hash TEXT NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (doc, hash))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS passages_hash ON passages (hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS passages_row ON passages (row)")
+        self._db.commit()
+
+    def docs(self):
+        return [doc for (doc,) in self._db.execute("SELECT DISTINCT doc FROM passages ORDER BY doc")]
+
+    def _rows(self, doc):
+        return dict(self._db.execute("SELECT hash, row FROM passages WHERE doc = ?", (doc,)))
+
+    def ingest(self, doc, text):
+        """Brings `doc` in the index up to date with `text`"""
+        report = IngestReport(doc)
+        start = time.perf_counter()
+
+        wanted = {}
+        for passage in self.chunker(text):
+            wanted.setdefault(passage_hash(passage), passage)
+        report.passages = len(wanted)
+
+        existing = self._rows(doc)
+        stale = [h for h in existing if h not in wanted]
+        report.deleted = self._forget(doc, stale, existing)
+        report.kept = len(existing) - len(stale)
+
+        fresh, reused = [], []
+        for h, passage in wanted.items():
+            if h in existing:
+                continue
+            row = self._db.execute("SELECT row FROM passages WHERE hash = ? LIMIT 1", (h,)).fetchone()
+            if row is None:
+                fresh.append((h, passage))
+            else:
+                reused.append((h, passage, row[0]))
+        if reused:
+            # Same passage in another document: point at its row, one vector per passage
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO passages VALUES (?, ?, ?)",
+                                     [(doc, h, row) for h, _, row in reused])
+            report.reused = len(reused)
+
+        for at in range(0, len(fresh), self.batch_size):
+            batch = fresh[at:at + self.batch_size]
+            passages = [p for _, p in batch]
+            self._add(doc, [h for h, _ in batch], passages, np.asarray(self.encode(passages), dtype=np.float32))
+            report.encoded += len(batch)
+            report.batches += 1
+
+        report.compacted = self.maybe_compact()
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def remove(self, doc):
+        """Drops a whole document; returns how many rows were tombstoned"""
+        existing = self._rows(doc)
+        removed = self._forget(doc, list(existing), existing)
+        self.maybe_compact()
+        return removed
+
+    def _add(self, doc, hashes, passages, vectors):
+        rows = self.index.append(vectors, passages)
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO passages VALUES (?, ?, ?)",
+                                 [(doc, h, row) for h, row in zip(hashes, rows)])
+
+    def _forget(self, doc, hashes, existing):
+        if not hashes:
+            return 0
+        with self._db:
+            self._db.executemany("DELETE FROM passages WHERE doc = ? AND hash = ?", [(doc, h) for h in hashes])
+        # A row another document still points at stays live
+        rows = [existing[h] for h in hashes]
+        return self.index.delete(row for row in rows if self._db.execute(
+            "SELECT 1 FROM passages WHERE row = ? LIMIT 1", (row,)).fetchone() is None)
+
+    def maybe_compact(self, ratio=COMPACT_RATIO):
+        if self.index.count and self.index.deleted / self.index.count > ratio:
+            self.compact()
+            return True
+        return False
+
+    def compact(self):
+        """Removes tombstoned (and orphaned) rows from the index and renumbers the records"""
+        referenced = np.zeros(self.index.count, dtype=bool)
+        rows = [row for (row,) in self._db.execute("SELECT row FROM passages")]
+        referenced[rows] = True
+        # Rows appended by an ingest that died before recording them
+        self.index.delete(np.flatnonzero(~referenced))
+        keep = self.index.compact()
+        renumber = np.full(len(referenced), -1, dtype=np.int64)
+        renumber[keep] = np.arange(len(keep))
+        with self._db:
+            self._db.executemany("UPDATE passages SET row = ? WHERE row = ?",
+                                 [(int(renumber[old]), old) for old in sorted(set(rows)) if renumber[old] != old])
+        return len(keep)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,177 @@
+"""
+Ferrari TTS - Rich-Text Markup
+==============================
+Compiles the Thalamus markers Gemini sends us:
+
+    [pause:0.5]  -> hard silence of 0.5 s
+    ...          -> Thalamus long pause (0.8 s)
+    [soft]       -> volume 0.5
+    [warm]       -> volume 0.8
+    [gentle]     -> speed 0.8
+    [anything]   -> ignored for now
+
+Semantics follow FerrariCortex.process_logic (the Logic bench): styles stick
+until the next style marker, tags never reach the phonemizer.
+
+compile_markup() turns rich text into a flat, immutable instruction list:
+
+    (SPEAK, text)  (SILENCE, seconds)  (GAIN, volume)  (RATE, speed)
+
+Plans are cached per input string. Text that only an ignored tag separates
+is merged back into one SPEAK, back-to-back silences add up and style
+markers that change nothing are dropped, so the engine makes as few,
+as long session.run calls as the markup allows.
+"""
+
+import re
+from functools import lru_cache
+
+SAMPLE_RATE = 24000
+LONG_PAUSE_S = 0.8
+
+SPEAK, SILENCE, GAIN, RATE = "speak", "silence", "gain", "rate"
+
+_TOKENS = re.compile(r"\[pause:(?P<pause>\d+\.?\d*|\.\d+)\]|(?P<ellipsis>\.\.\.)|(?P<tag>\[[^\]]*\])")
+_TAGS_ONLY = re.compile(r"\[pause:(?P<pause>\d+\.?\d*|\.\d+)\]|(?P<tag>\[[^\]]*\])")
+_SPACES = re.compile(r"\s+")
+_CLAUSE_END = re.compile(r"(?<=[.!?;:])\s+")
+# A period after these (or after an initial, "J. R. R.", or "e.g.") does not end a clause
+ABBREVIATIONS = frozenset(("mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "approx", "fig",
+                           "dept", "min", "max"))
+
+STYLE_VOLUME = {"[soft]": 0.5, "[warm]": 0.8}
+STYLE_SPEED = {"[gentle]": 0.8}
+
+
+class Speak:
+    __slots__ = ("text", "volume", "speed")
+
+    def __init__(self, text, volume=1.0, speed=1.0):
+        self.text = text
+        self.volume = volume
+        self.speed = speed
+
+    def __repr__(self):
+        return f"Speak({self.text!r}, volume={self.volume}, speed={self.speed})"
+
+
+class Silence:
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    @property
+    def samples(self):
+        return int(SAMPLE_RATE * self.seconds)
+
+    def __repr__(self):
+        return f"Silence({self.seconds})"
+
+
+def _tokenize(rich_text, ellipsis_pause):
+    """Raw instructions in source order, before any merging"""
+    position = 0
+    for match in (_TOKENS if ellipsis_pause else _TAGS_ONLY).finditer(rich_text):
+        yield SPEAK, rich_text[position:match.start()]
+        position = match.end()
+        kind, value = match.lastgroup, match.group(match.lastgroup)
+        if kind == "pause":
+            yield SILENCE, float(value)
+        elif kind == "ellipsis":
+            yield SILENCE, LONG_PAUSE_S
+        elif value in STYLE_VOLUME:
+            yield GAIN, STYLE_VOLUME[value]
+        elif value in STYLE_SPEED:
+            yield RATE, STYLE_SPEED[value]
+    yield SPEAK, rich_text[position:]
+
+
+@lru_cache(maxsize=1024)
+def compile_markup(rich_text, ellipsis_pause=True):
+    """Rich text -> tuple of (op, arg) instructions (cached, do not mutate)
+
+    ellipsis_pause=False keeps "..." in the spoken text for the model's own
+    flow instead of turning it into a hard pause (the Comparison bench).
+    """
+    plan = []
+    text = []           # SPEAK fragments still waiting to be merged
+    volume, speed = 1.0, 1.0
+    pending = {}        # style changes not emitted yet: only the last one before speech counts
+
+    def flush():
+        joined = _SPACES.sub(" ", " ".join(text)).strip()
+        text.clear()
+        if joined:
+            plan.append((SPEAK, joined))
+
+    for op, arg in _tokenize(rich_text, ellipsis_pause):
+        if op == SPEAK:
+            if not arg.strip():
+                continue
+            emitted = False
+            for style_op, value in pending.items():
+                current = volume if style_op == GAIN else speed
+                if value != current:
+                    if not emitted:
+                        flush()
+                        emitted = True
+                    plan.append((style_op, value))
+                    if style_op == GAIN:
+                        volume = value
+                    else:
+                        speed = value
+            pending.clear()
+            text.append(arg)
+        elif op == SILENCE:
+            if arg <= 0:
+                continue
+            flush()
+            if plan and plan[-1][0] == SILENCE:
+                plan[-1] = (SILENCE, plan[-1][1] + arg)
+            else:
+                plan.append((SILENCE, arg))
+        else:
+            pending[op] = arg
+    flush()
+    return tuple(plan)
+
+
+def events(plan):
+    """Runs a compiled plan: Speak events carry the gain/rate in effect"""
+    volume, speed = 1.0, 1.0
+    for op, arg in plan:
+        if op == SPEAK:
+            yield Speak(arg, volume, speed)
+        elif op == SILENCE:
+            yield Silence(arg)
+        elif op == GAIN:
+            volume = arg
+        elif op == RATE:
+            speed = arg
+
+
+def parse_markup(rich_text, ellipsis_pause=True):
+    """Turns rich text into a flat list of Speak / Silence events"""
+    return list(events(compile_markup(rich_text, ellipsis_pause)))
+
+
+def split_clauses(text):
+    """Sentence-level cut points: the first clause can play while the rest renders"""
+    clauses, start = [], 0
+    for match in _CLAUSE_END.finditer(text):
+        if _abbreviated(text[start:match.start()]):
+            continue
+        clauses.append(text[start:match.start()])
+        start = match.end()
+    clauses.append(text[start:])
+    return [clause for clause in clauses if clause.strip()]
+
+
+def _abbreviated(clause):
+    """True when the clause ends on an abbreviation's period, not a sentence's"""
+    word = clause.rsplit(None, 1)[-1]
+    if not word.endswith(".") or word.endswith(".."):
+        return False
+    word = word[:-1].lstrip("(\"'").lower()
+    return word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()) or "." in word
@@ -0,0 +1,51 @@
+"""
+Ferrari TTS - Paths
+===================
+One place for the model locations every script used to hard-code.
+"""
+
+import os
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+REPO_DIR = PACKAGE_DIR.parent
+
+# The exported blueprints live in the repo-level `models/` folder,
+# the Bouncer (VAD) and axioms live next to the package.
+MODELS_DIR = REPO_DIR / "models"
+ONNX_PATH = MODELS_DIR / "ferrari_kokoro.onnx"
+BATCHED_ONNX_PATH = MODELS_DIR / "ferrari_kokoro_batched.onnx"
+VOICE_ONNX_PATH = MODELS_DIR / "ferrari_kokoro_voice.onnx"
+# Two-stage pipeline (scripts/export_ferrari_split.py)
+ENCODER_ONNX_PATH = MODELS_DIR / "encoder.onnx"
+PROSODY_ONNX_PATH = MODELS_DIR / "prosody.onnx"
+DECODER_ONNX_PATH = MODELS_DIR / "decoder.onnx"
+# Same decoder with SineGen's random phase/noise exported as zeros: only for parity checks
+DECODER_FIXED_NOISE_ONNX_PATH = MODELS_DIR / "decoder_fixed_noise.onnx"
+VAD_PATH = PACKAGE_DIR / "models" / "silero_vad.onnx"
+# Cortex knowledge domains and their compiled index (python -m ferrari_tts.domains compile)
+DOMAINS_DIR = REPO_DIR / "ios_code" / "Resources" / "Domains"
+DOMAIN_INDEX_PATH = MODELS_DIR / "domains.bin"
+
+# Derived artifacts that survive restarts and are shared by worker processes
+CACHE_DIR = Path(os.environ.get("FERRARI_CACHE_DIR", Path.home() / ".cache" / "ferrari_tts"))
+
+KOKORO_CACHE_DIR = Path.home() / ".cache/huggingface/hub/models--hexgrad--Kokoro-82M/snapshots"
+
+
+def kokoro_snapshot_dir():
+    """Returns the local Kokoro-82M snapshot (override with FERRARI_KOKORO_SNAPSHOT)"""
+    override = os.environ.get("FERRARI_KOKORO_SNAPSHOT")
+    if override:
+        return Path(override)
+    if not KOKORO_CACHE_DIR.exists():
+        raise FileNotFoundError(
+            f"Kokoro snapshot not found in {KOKORO_CACHE_DIR}. "
+            "Run the Kokoro pipeline once or set FERRARI_KOKORO_SNAPSHOT."
+        )
+    return next(KOKORO_CACHE_DIR.iterdir())
+
+
+def kokoro_config_path():
+    """The official config.json holding the phoneme vocabulary"""
+    return kokoro_snapshot_dir() / "config.json"
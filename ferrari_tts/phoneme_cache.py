@@ -0,0 +1,231 @@
+"""
+Ferrari TTS - Phoneme Cache
+===========================
+Two-tier memory for G2P results (phoneme chunks + token IDs).
+
+Tier 1: in-process LRU with a byte budget.
+Tier 2: a SQLite file in WAL mode, so several worker processes can read it
+        concurrently while one of them writes.
+
+Keys are the normalized text plus the G2P namespace (backend version + vocab
+fingerprint), so stale phonemes can never leak into a newer vocabulary, and
+workers on different namespaces (two lang codes, old and new build during a
+rollout) share the file without touching each other's rows. Every row
+records its namespace and when it was last used: rows of a namespace nobody
+has bound for STALE_NAMESPACE_S are dropped on bind, and the disk tier is
+kept under `max_disk_rows` by evicting the least recently used rows.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from ferrari_tts.paths import CACHE_DIR
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Rough per-entry bookkeeping cost (dict slot, tuple, array headers)
+_ENTRY_OVERHEAD = 256
+# A namespace no worker has bound for a week belongs to a build that is gone
+STALE_NAMESPACE_S = 7 * 24 * 3600
+DISK_MAX_ROWS = 200_000
+# The disk tier is trimmed every this many writes, not on each one
+_PRUNE_EVERY = 256
+
+
+def normalize_text(text):
+    """NFKC + collapsed whitespace: 'Hello,   world ' and 'Hello, world' share a key"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def open_default_cache(max_bytes=8 * 1024 * 1024):
+    """The machine-wide phoneme cache every bench and worker shares"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return PhonemeCache(CACHE_DIR / "phonemes.sqlite", max_bytes=max_bytes)
+
+
+class CacheStats:
+    def __init__(self):
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.invalidations = 0
+
+    @property
+    def lookups(self):
+        return self.memory_hits + self.disk_hits + self.misses
+
+    @property
+    def hit_rate(self):
+        return (self.memory_hits + self.disk_hits) / self.lookups if self.lookups else 0.0
+
+    def as_dict(self):
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+
+class PhonemeCache:
+    def __init__(self, path=None, max_bytes=8 * 1024 * 1024, max_disk_rows=DISK_MAX_ROWS):
+        self.max_bytes = max_bytes
+        self.max_disk_rows = max_disk_rows
+        self.namespace = ""
+        self.stats = CacheStats()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        if path is not None:
+            self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(phonemes)")}
+            if columns and "namespace" not in columns:
+                # Layout from before per-row namespaces: it is only a cache, start over
+                self._db.execute("DROP TABLE phonemes")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS phonemes (key TEXT PRIMARY KEY, namespace TEXT NOT NULL, "
+                "used REAL NOT NULL, phonemes TEXT NOT NULL, ids BLOB NOT NULL, lengths BLOB NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS phonemes_namespace ON phonemes (namespace)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS phonemes_used ON phonemes (used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS namespaces (name TEXT PRIMARY KEY, bound REAL NOT NULL)")
+            self._db.commit()
+
+    def bind(self, g2p_version, vocab_fingerprint):
+        """Scopes the cache to one G2P backend + vocabulary; other namespaces' rows stay
+        unless nobody has bound them for STALE_NAMESPACE_S"""
+        namespace = f"{g2p_version}|{vocab_fingerprint}"
+        with self._lock:
+            if namespace == self.namespace:
+                return
+            self.namespace = namespace
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is None:
+                return
+            now = time.time()
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO namespaces VALUES (?, ?)", (namespace, now))
+                stale = [name for (name,) in self._db.execute(
+                    "SELECT name FROM namespaces WHERE bound < ?", (now - STALE_NAMESPACE_S,))]
+                for name in stale:
+                    self._db.execute("DELETE FROM phonemes WHERE namespace = ?", (name,))
+                    self._db.execute("DELETE FROM namespaces WHERE name = ?", (name,))
+            self.stats.invalidations += len(stale)
+
+    def _key(self, normalized):
+        return hashlib.sha1(f"{self.namespace}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, normalized):
+        """Returns (chunks, ids_list) or None"""
+        key = self._key(normalized)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return entry
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT phonemes, ids, lengths FROM phonemes WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    # Once per key and process: later hits come from memory
+                    with self._db:
+                        self._db.execute("UPDATE phonemes SET used = ? WHERE key = ?", (time.time(), key))
+                    entry = _unpack(*row)
+                    self._remember(key, entry)
+                    self.stats.disk_hits += 1
+                    return entry
+            self.stats.misses += 1
+            return None
+
+    def put(self, normalized, chunks, ids_list):
+        key = self._key(normalized)
+        entry = (list(chunks), [_frozen(ids) for ids in ids_list])
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO phonemes VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, self.namespace, time.time(), *_pack(*entry))
+                    )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune()
+
+    def _prune(self):
+        """Least recently used rows go once the disk tier holds more than `max_disk_rows`"""
+        (rows,) = self._db.execute("SELECT COUNT(*) FROM phonemes").fetchone()
+        if rows <= self.max_disk_rows:
+            return
+        with self._db:
+            self._db.execute("DELETE FROM phonemes WHERE key IN "
+                             "(SELECT key FROM phonemes ORDER BY used LIMIT ?)", (rows - self.max_disk_rows,))
+        self.stats.disk_evictions += rows - self.max_disk_rows
+
+    def _remember(self, key, entry):
+        if key in self._memory:
+            self._memory_bytes -= _entry_bytes(self._memory.pop(key))
+        self._memory[key] = entry
+        self._memory_bytes += _entry_bytes(entry)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= _entry_bytes(evicted)
+            self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM phonemes")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _entry_bytes(entry):
+    chunks, ids_list = entry
+    return _ENTRY_OVERHEAD + sum(len(c) * 4 for c in chunks) + sum(ids.nbytes for ids in ids_list)
+
+
+def _frozen(ids):
+    # Cached arrays are shared between callers, so nobody gets to mutate them
+    ids = np.array(ids, dtype=np.int64)
+    ids.setflags(write=False)
+    return ids
+
+
+def _pack(chunks, ids_list):
+    lengths = np.array([len(ids) for ids in ids_list], dtype=np.int64)
+    flat = np.concatenate(ids_list) if ids_list else np.zeros(0, dtype=np.int64)
+    return "\n".join(chunks), flat.tobytes(), lengths.tobytes()
+
+
+def _unpack(phonemes, ids_blob, lengths_blob):
+    lengths = np.frombuffer(lengths_blob, dtype=np.int64)
+    flat = np.frombuffer(ids_blob, dtype=np.int64)
+    ids_list = np.split(flat, np.cumsum(lengths)[:-1]) if len(lengths) else []
+    chunks = phonemes.split("\n") if phonemes else []
+    return chunks, ids_list
@@ -0,0 +1,254 @@
+"""
+Ferrari TTS - Render Farm
+=========================
+Bulk pre-rendering of fixed prompts (IVR menus, domain answers) on every core.
+
+    python -m ferrari_tts.render_farm prompts.jsonl --out renders/
+    python -m ferrari_tts.render_farm --domains ios_code/Resources/Domains/*.json --out renders/
+
+Manifest: one JSON object per line, {"id": ..., "text": ..., "voice"?: ...}.
+--domains builds it from the Cortex domain files instead (concept
+definitions, principle statements, common errors).
+
+- a process pool where every worker owns its engine and ONNX session, with
+  intra-op threads split so the workers do not fight over the same cores
+- audio comes back through multiprocessing.shared_memory: the worker fills a
+  segment, the parent attaches, flags it as taken, copies and unlinks it - no
+  pickled arrays. The worker keeps its handle open until it sees that flag
+  (on Windows a segment dies with its last handle).
+- each WAV is written (atomically) as soon as it arrives and recorded in
+  <out>/done.jsonl; re-running the same command skips everything listed there
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+import wave
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from ferrari_tts.domains import load_domains
+from ferrari_tts.markup import SAMPLE_RATE
+from ferrari_tts.paths import ONNX_PATH
+from ferrari_tts.voices import DEFAULT_VOICE
+
+DONE_MANIFEST = "done.jsonl"
+# Segment layout: one int64 "taken" flag, then the float32 samples
+_HEADER_BYTES = 8
+
+_worker_engine = None
+# Segments this worker created and the parent has not attached yet
+_worker_segments = []
+
+
+# =============================================================================
+# MANIFESTS
+# =============================================================================
+def read_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "id" not in item or "text" not in item:
+                raise ValueError(f"{path}:{number}: every item needs `id` and `text`")
+            item["id"] = str(item["id"])
+            yield item
+
+
+def domain_manifest(paths):
+    """Prompts for everything a Cortex domain file can say out loud"""
+    for source, domain in load_domains(paths):
+        name = slugify(domain.get("name", Path(source).stem))
+        for concept, info in domain.get("concepts", {}).items():
+            if info.get("definition"):
+                yield {"id": f"{name}/concept/{slugify(concept)}", "text": info["definition"]}
+        for index, principle in enumerate(domain.get("principles", [])):
+            if principle.get("statement"):
+                yield {"id": f"{name}/principle/{index}", "text": principle["statement"] + "."}
+        for error, advice in domain.get("common_errors", {}).items():
+            yield {"id": f"{name}/error/{slugify(error)}", "text": advice}
+
+
+def slugify(value):
+    return re.sub(r"[^a-z0-9_-]+", "_", str(value).lower()).strip("_") or "item"
+
+
+def completed_ids(out_dir):
+    done = set()
+    path = Path(out_dir) / DONE_MANIFEST
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (ValueError, KeyError):
+                    continue  # torn last line from an interrupted run
+    return done
+
+
+def output_path(out_dir, item_id):
+    """Readable slug + a hash of the exact id, so "a b" and "a_b" never share a file"""
+    digest = hashlib.sha1(item_id.encode("utf-8")).hexdigest()[:8]
+    return Path(out_dir) / ("/".join(slugify(part) for part in item_id.split("/")) + f"-{digest}.wav")
+
+
+def write_wav(path, audio):
+    """16-bit mono WAV, written to a temp file first so a crash never leaves half a prompt"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".wav.tmp")
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(str(tmp), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# WORKERS
+# =============================================================================
+def _segment(**kwargs):
+    # 3.13+: this module unlinks every segment itself, the tracker stays out of it
+    if sys.version_info >= (3, 13):
+        kwargs["track"] = False
+    return shared_memory.SharedMemory(**kwargs)
+
+
+def _release_taken():
+    """Closes this worker's handles on segments the parent has already attached"""
+    global _worker_segments
+    pending = []
+    for shm in _worker_segments:
+        if np.ndarray((1,), dtype=np.int64, buffer=shm.buf)[0]:
+            shm.close()
+        else:
+            pending.append(shm)
+    _worker_segments = pending
+
+
+def _init_worker(model_path, intra_op_threads):
+    global _worker_engine
+    from ferrari_tts.engine import FerrariEngine
+    from ferrari_tts.session import create_session, resolve_profile
+
+    profile = resolve_profile(model_path)
+    profile.intra_op_threads = intra_op_threads
+    profile.inter_op_threads = 1
+    _worker_engine = FerrariEngine(model_path, session=create_session(model_path, profile))
+
+
+def _render_item(item):
+    """Runs in a worker: renders one prompt into a fresh shared-memory segment"""
+    _release_taken()
+    start = time.perf_counter()
+    try:
+        audio = _worker_engine.render(item["text"], voice=item.get("voice") or DEFAULT_VOICE)
+    except Exception as exc:
+        return {"id": item["id"], "error": f"{type(exc).__name__}: {exc}"}
+    render_s = time.perf_counter() - start
+
+    shm = _segment(create=True, size=_HEADER_BYTES + audio.nbytes)
+    np.ndarray((1,), dtype=np.int64, buffer=shm.buf)[0] = 0
+    np.ndarray(audio.shape, dtype=np.float32, buffer=shm.buf, offset=_HEADER_BYTES)[:] = audio
+    # Stays open until the parent has attached (see _release_taken)
+    _worker_segments.append(shm)
+    return {"id": item["id"], "shm": shm.name, "samples": len(audio), "render_ms": round(render_s * 1000, 1)}
+
+
+def _collect(result):
+    """Parent side: copy the audio out of shared memory and free the segment"""
+    shm = _segment(name=result["shm"])
+    try:
+        # Our handle keeps the segment alive now: the worker may let go of its own
+        np.ndarray((1,), dtype=np.int64, buffer=shm.buf)[0] = 1
+        return np.ndarray((result["samples"],), dtype=np.float32, buffer=shm.buf, offset=_HEADER_BYTES).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# =============================================================================
+# FARM
+# =============================================================================
+def render_farm(items, out_dir, model_path=ONNX_PATH, workers=None, log=print):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    done = completed_ids(out_dir)
+    todo = [item for item in items if item["id"] not in done]
+    # Longest first: the pool's tail is then made of short prompts
+    todo.sort(key=lambda item: len(item["text"]), reverse=True)
+
+    summary = {"rendered": 0, "failed": 0, "skipped": len(items) - len(todo), "audio_s": 0.0, "wall_s": 0.0}
+    if not todo:
+        log(f"Nothing to render, {summary['skipped']} already done")
+        return summary
+
+    cores = os.cpu_count() or 1
+    workers = max(1, min(workers or cores, len(todo)))
+    threads = max(1, cores // workers)
+    log(f"{len(todo)} to render, {summary['skipped']} already done - {workers} workers x {threads} threads")
+
+    start = time.perf_counter()
+    ctx = mp.get_context("spawn")  # never fork a process that may hold ORT threads
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(str(model_path), threads)) as pool, \
+            open(out_dir / DONE_MANIFEST, "a", encoding="utf-8") as manifest:
+        for result in pool.imap_unordered(_render_item, todo, chunksize=1):
+            if "error" in result:
+                summary["failed"] += 1
+                log(f"  ❌ {result['id']}: {result['error']}")
+                continue
+            audio = _collect(result)
+            path = output_path(out_dir, result["id"])
+            write_wav(path, audio)
+            audio_s = len(audio) / SAMPLE_RATE
+            manifest.write(json.dumps({
+                "id": result["id"], "file": str(path.relative_to(out_dir)),
+                "audio_s": round(audio_s, 3), "render_ms": result["render_ms"],
+            }) + "\n")
+            manifest.flush()
+            summary["rendered"] += 1
+            summary["audio_s"] += audio_s
+            if summary["rendered"] % 50 == 0:
+                log(f"  {summary['rendered']}/{len(todo)}")
+    summary["wall_s"] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-render a prompt manifest on every core")
+    parser.add_argument("manifest", nargs="?", help="JSONL of {id, text, voice?}")
+    parser.add_argument("--domains", nargs="+", help="Cortex domain JSON files (globs allowed)")
+    parser.add_argument("--out", required=True, help="output directory (also holds done.jsonl)")
+    parser.add_argument("--model", default=str(ONNX_PATH))
+    parser.add_argument("--workers", type=int, help="processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    if args.domains:
+        items = list(domain_manifest(sorted(p for pattern in args.domains for p in glob.glob(pattern))))
+    elif args.manifest:
+        items = list(read_manifest(args.manifest))
+    else:
+        parser.error("give a manifest or --domains")
+
+    print(f"🏭 FERRARI RENDER FARM: {len(items)} prompts -> {args.out}")
+    print("=" * 60)
+    summary = render_farm(items, args.out, args.model, args.workers)
+    wall = summary["wall_s"]
+    speed = f", {summary['audio_s'] / wall:.1f}x real-time" if wall else ""
+    print(f"\n✅ Rendered {summary['rendered']} ({summary['audio_s']:.1f}s of audio in {wall:.1f}s{speed}), "
+          f"skipped {summary['skipped']}, failed {summary['failed']}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
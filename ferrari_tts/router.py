@@ -0,0 +1,384 @@
+"""
+Ferrari TTS - Thalamus Router
+=============================
+Python counterpart of ThalamusRouter.routeIntent, for testing routing at
+scale and for the server side of the bridge.
+
+The Swift router is a chain of `input.contains("time")` checks: the first
+substring wins, so "one more time" asks the clock and any sentence with
+"sketch" goes to the manuals. Here:
+
+- every keyword rule, plus every term of the knowledge domains, is compiled
+  into ONE Aho-Corasick automaton (ferrari_tts.domains), word-start
+  anchored, and each hit adds its weight to its route. Rule phrases match
+  whole words only ("time" is not "times"); domain terms also take a plural
+  or past-tense ending ("sketches", "extruded")
+- arithmetic words only decide between two numbers: "12 times 8" is the
+  calculator, "how many times" is not
+- a route wins on the rules alone when it is confident (score >= CONFIDENT)
+  and clearly ahead (>= MARGIN over the runner-up); no hit at all is
+  conversation, and so is weak evidence alone when no encoder is available
+- only the ambiguous rest goes to a small embedding classifier: route
+  prototypes from labeled examples, encoded once with the FerrariSpecialist
+  encoder and cached on disk, with an LRU over query embeddings
+
+    router = IntentRouter()
+    router.route("what time is it in Tokyo")   # Route('system_clock', 'get_time', via rules)
+
+    python -m ferrari_tts.router eval scripts/router_utterances.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from ferrari_tts.domains import SEPARATOR, collect, compile_matcher, domain_files, fold, load_domains
+from ferrari_tts.paths import CACHE_DIR, REPO_DIR
+from ferrari_tts.vector_index import DEFAULT_ENCODER, normalize
+
+ROUTES = ("local_manual", "web_search", "system_clock", "calculator", "conversation")
+CONFIDENT = 1.5
+MARGIN = 0.75
+# Below this the only evidence is a weak word ("time", "sketch"): small talk unless the embedding says otherwise
+WEAK = 1.2
+EVAL_PATH = REPO_DIR / "scripts" / "router_utterances.jsonl"
+
+# (phrase, route, weight). Strong phrases decide alone; weak words only add evidence.
+RULES = (
+    ("what time is it", "system_clock", 2.5),
+    ("what's the time", "system_clock", 2.5),
+    ("time in", "system_clock", 0.6),
+    ("time is it", "system_clock", 1.5),
+    ("timer", "system_clock", 2.0),
+    ("alarm", "system_clock", 1.5),
+    ("o clock", "system_clock", 1.5),
+    ("what day is it", "system_clock", 2.0),
+    ("today's date", "system_clock", 2.0),
+    ("time", "system_clock", 0.5),
+    ("tokyo", "system_clock", 0.3),
+    ("calculate", "calculator", 2.0),
+    ("plus", "calculator", 1.5),
+    ("minus", "calculator", 1.5),
+    ("times", "calculator", 0.6),
+    ("divided by", "calculator", 2.0),
+    ("multiplied by", "calculator", 2.0),
+    ("square root", "calculator", 2.0),
+    ("percent of", "calculator", 1.5),
+    ("solidworks", "local_manual", 2.0),
+    ("extrude", "local_manual", 1.5),
+    ("sketch", "local_manual", 0.5),
+    ("who won", "web_search", 2.0),
+    ("world cup", "web_search", 1.5),
+    ("search for", "web_search", 2.0),
+    ("look up", "web_search", 1.5),
+    ("news", "web_search", 1.2),
+    ("weather", "web_search", 1.5),
+    ("latest", "web_search", 0.6),
+    ("score", "web_search", 0.6),
+    ("how are you", "conversation", 2.0),
+    ("thank you", "conversation", 1.5),
+    ("thanks", "conversation", 1.5),
+    ("tell me a joke", "conversation", 2.5),
+    ("one more time", "conversation", 1.5),
+    ("good morning", "conversation", 1.5),
+)
+# (word, route, weight) added on top of RULES when the word sits between two numbers
+OPERANDS = (
+    ("times", "calculator", 2.0),
+    ("x", "calculator", 2.0),
+    ("over", "calculator", 1.5),
+)
+# Spelled-out numbers count as operands as well as digits
+NUMBER_WORDS = frozenset(fold(word).strip(b"\x00") for word in (
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen "
+    "seventeen eighteen nineteen twenty thirty forty fifty sixty seventy eighty ninety hundred thousand million "
+    "half"
+).split())
+_DIGITS = frozenset(fold(str(d))[1] for d in range(10))
+# Evidence a knowledge-domain term adds to local_manual, by what the term names
+DOMAIN_WEIGHTS = {"concept": 1.5, "error": 1.5, "relationship": 0.5}
+
+# Prototype sentences for the embedding fallback
+EXAMPLES = {
+    "local_manual": [
+        "How do I extrude a sketch in SolidWorks?",
+        "My part keeps failing to rebuild.",
+        "What does a mate constraint do in an assembly?",
+        "Why won't the revolve feature work on this profile?",
+    ],
+    "web_search": [
+        "Who won the game last night?",
+        "What's the latest news about the election?",
+        "Search the web for the best pizza nearby.",
+        "How is the weather going to be tomorrow?",
+    ],
+    "system_clock": [
+        "What time is it?",
+        "Set a timer for ten minutes.",
+        "Wake me up at seven tomorrow.",
+        "What's the date today?",
+    ],
+    "calculator": [
+        "What is twelve times eight?",
+        "Calculate fifteen percent of two hundred.",
+        "What's the square root of 144?",
+        "Add 37 and 58.",
+    ],
+    "conversation": [
+        "How are you doing today?",
+        "Tell me something interesting.",
+        "Thanks, that was helpful.",
+        "Can you say that one more time?",
+    ],
+}
+
+# Operators carry meaning the folded alphabet would drop
+_OPERATORS = str.maketrans({"+": " plus ", "*": " times ", "×": " times ", "÷": " divided by ",
+                            "=": " equals ", "%": " percent "})
+
+
+class Route:
+    __slots__ = ("tool", "argument", "source", "scores")
+
+    def __init__(self, tool, argument, source, scores):
+        self.tool = tool
+        self.argument = argument
+        self.source = source      # "rules", "embedding" or "default"
+        self.scores = scores
+
+    def __repr__(self):
+        return f"Route({self.tool!r}, {self.argument!r}, via {self.source})"
+
+
+def compile_rules(rules=RULES, domains=(), operands=OPERANDS):
+    """Keyword rules + domain terms -> (matcher, [(route, weight, topic, needs), ...] per term)
+
+    `needs` is "word" for rule phrases (no suffix), "operands" for OPERANDS
+    (no suffix, a number on both sides) and None for domain terms.
+    """
+    actions = {}
+    for phrase, route, weight in rules:
+        actions.setdefault(fold(phrase), []).append((route, weight, None, "word"))
+    for word, route, weight in operands:
+        actions.setdefault(fold(word), []).append((route, weight, None, "operands"))
+    entries, terms, postings = collect(domains)
+    for term_id, term in enumerate(terms):
+        best = {}
+        for entry_id in postings.get(term_id, []):
+            entry = entries[entry_id]
+            weight = DOMAIN_WEIGHTS.get(entry["kind"])
+            if weight and weight > best.get(entry["domain"], 0):
+                best[entry["domain"]] = weight
+        for domain, weight in best.items():
+            actions.setdefault(fold(term), []).append(("local_manual", weight, domain, None))
+
+    folded = list(actions)
+    return compile_matcher(folded), [actions[f] for f in folded]
+
+
+def _word_before(symbols, start):
+    return symbols[symbols.rfind(SEPARATOR, 0, start - 1) + 1:start - 1] if start > 1 else b""
+
+
+def _word_after(symbols, end):
+    stop = symbols.find(SEPARATOR, end + 1)
+    return symbols[end + 1:stop] if stop > end + 1 else b""
+
+
+def _is_number(word):
+    return bool(word) and (word in NUMBER_WORDS or all(symbol in _DIGITS for symbol in word))
+
+
+class EmbeddingFallback:
+    """Nearest-prototype classifier; prototypes are cached per (encoder, examples)"""
+
+    def __init__(self, encode=None, examples=EXAMPLES, encoder_name=DEFAULT_ENCODER,
+                 cache_dir=CACHE_DIR / "router", cache_size=2048):
+        self._encode = encode
+        self.encoder_name = encoder_name
+        self.routes = sorted(examples)
+        self.cache_size = cache_size
+        self._queries = OrderedDict()
+        digest = hashlib.sha1(json.dumps([encoder_name, examples], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        path = cache_dir / f"prototypes_{digest}.npy"
+        if path.exists():
+            self.prototypes = np.load(path)
+        else:
+            self.prototypes = normalize(np.stack([
+                normalize(self.encode(examples[route])).mean(axis=0) for route in self.routes
+            ]))
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            np.save(path, self.prototypes)
+
+    def encode(self, texts):
+        if self._encode is None:
+            from ferrari_tts.vector_index import load_encoder
+            self._encode = load_encoder(self.encoder_name).encode
+        return np.asarray(self._encode(texts), dtype=np.float32)
+
+    def scores(self, text):
+        """{route: cosine to its prototype}; repeated utterances skip the encoder"""
+        vector = self._queries.get(text)
+        if vector is None:
+            vector = normalize(self.encode([text]))[0]
+            self._queries[text] = vector
+            if len(self._queries) > self.cache_size:
+                self._queries.popitem(last=False)
+        else:
+            self._queries.move_to_end(text)
+        return dict(zip(self.routes, (self.prototypes @ vector).tolist()))
+
+
+class IntentRouter:
+    def __init__(self, rules=RULES, domains=None, fallback="auto", confident=CONFIDENT, margin=MARGIN, weak=WEAK,
+                 operands=OPERANDS):
+        """`domains`: load_domains() output (default: every Resources/Domains file)
+
+        `fallback`: an EmbeddingFallback, None (rules only) or "auto" - built on
+        the first ambiguous utterance, disabled if sentence-transformers is missing.
+        """
+        if domains is None:
+            domains = load_domains(domain_files())
+        self.matcher, self.actions = compile_rules(rules, domains, operands)
+        self.fallback = fallback
+        self.confident = confident
+        self.margin = margin
+        self.weak = weak
+
+    def rule_scores(self, text):
+        """{route: summed weight} and the best-supported manual topic"""
+        scores, topics = {}, {}
+        symbols = fold(text.translate(_OPERATORS))
+        for term_id, start, end in self.matcher.scan(symbols):
+            whole_word = symbols[end] == SEPARATOR
+            for route, weight, topic, needs in self.actions[term_id]:
+                if needs and not whole_word:
+                    continue
+                if needs == "operands" and not (_is_number(_word_before(symbols, start))
+                                                and _is_number(_word_after(symbols, end))):
+                    continue
+                scores[route] = scores.get(route, 0.0) + weight
+                if topic is not None:
+                    topics[topic] = topics.get(topic, 0.0) + weight
+        topic = max(topics, key=topics.get) if topics else None
+        return scores, topic
+
+    def route(self, text):
+        scores, topic = self.rule_scores(text)
+        if not scores:
+            return self._tool("conversation", text, topic, "default", scores)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = ranked[0]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        if scores[best] >= self.confident and scores[best] - runner_up >= self.margin:
+            return self._tool(best, text, topic, "rules", scores)
+
+        similarity = self._similarity(text)
+        if similarity is None:
+            if scores[best] < self.weak:
+                return self._tool("conversation", text, topic, "default", scores)
+            return self._tool(best, text, topic, "rules", scores)
+        # The rules already narrowed it down: the embedding only breaks the tie (or calls it small talk)
+        candidates = [route for route in ranked + ["conversation"] if route in similarity] or list(similarity)
+        winner = max(candidates, key=similarity.get)
+        return self._tool(winner, text, topic, "embedding", scores)
+
+    def _similarity(self, text):
+        try:
+            if self.fallback == "auto":
+                self.fallback = EmbeddingFallback()
+            return None if self.fallback is None else self.fallback.scores(text)
+        except ImportError:
+            # No sentence-transformers here: the rules' best guess stands
+            self.fallback = None
+            return None
+
+    @staticmethod
+    def _tool(route, text, topic, source, scores):
+        # Same payloads as ThalamusRouter.Tool
+        if route == "local_manual":
+            argument = topic or "SolidWorks"
+        elif route == "system_clock":
+            argument = "get_time"
+        elif route in ("web_search", "calculator"):
+            argument = text
+        else:
+            argument = None
+        return Route(route, argument, source, scores)
+
+
+# =============================================================================
+# OFFLINE EVALUATION
+# =============================================================================
+def read_labeled(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if item.get("route") not in ROUTES:
+                raise ValueError(f"{path}:{number}: `route` must be one of {ROUTES}")
+            yield item["text"], item["route"]
+
+
+def evaluate(router, labeled, repeats=3):
+    """Accuracy, per-source share and per-utterance latency (best of `repeats`)"""
+    from ferrari_tts.stats import percentile
+
+    rows, latencies = [], []
+    for text, expected in labeled:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = router.route(text)
+            timings.append(time.perf_counter() - start)
+        latencies.append(min(timings))
+        rows.append((text, expected, result))
+
+    correct = sum(result.tool == expected for _, expected, result in rows)
+    sources = {}
+    for _, _, result in rows:
+        sources[result.source] = sources.get(result.source, 0) + 1
+    return {
+        "utterances": len(rows),
+        "accuracy": round(correct / len(rows), 4) if rows else None,
+        "sources": sources,
+        "p50_us": round(percentile(latencies, 50) * 1e6, 1) if rows else None,
+        "p99_us": round(percentile(latencies, 99) * 1e6, 1) if rows else None,
+        "errors": [{"text": text, "expected": expected, "got": result.tool, "via": result.source}
+                   for text, expected, result in rows if result.tool != expected],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ferrari intent router")
+    commands = parser.add_subparsers(dest="command", required=True)
+    route = commands.add_parser("route", help="route one utterance")
+    route.add_argument("text")
+    check = commands.add_parser("eval", help="replay a labeled JSONL of {text, route}")
+    check.add_argument("labeled", nargs="?", default=str(EVAL_PATH))
+    check.add_argument("--rules-only", action="store_true", help="never use the embedding fallback")
+    args = parser.parse_args(argv)
+
+    router = IntentRouter(fallback=None if getattr(args, "rules_only", False) else "auto")
+    if args.command == "route":
+        result = router.route(args.text)
+        print(f"{result} scores={result.scores}")
+        return 0
+
+    report = evaluate(router, list(read_labeled(args.labeled)))
+    for error in report["errors"]:
+        print(f"  ❌ {error['text']!r}: expected {error['expected']}, got {error['got']} ({error['via']})")
+    print(f"✅ accuracy {report['accuracy']:.1%} over {report['utterances']} utterances | "
+          f"p50 {report['p50_us']} us | p99 {report['p99_us']} us | via {report['sources']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
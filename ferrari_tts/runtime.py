@@ -0,0 +1,222 @@
+"""
+Ferrari TTS - Cold Start Runtime
+================================
+From a fresh process to the first sample as fast as possible. This path
+matters for autoscaled workers and for a bridge that restarts after a crash.
+
+- `import ferrari_tts` costs nothing: the package exports resolve on first
+  use. The hot path (engine, session, markup, dsp) needs only numpy and
+  onnxruntime. misaki/spaCy load inside FerrariG2P. torch, kokoro and
+  soundfile belong to the export scripts and the WAV-writing benches.
+- start_engine() runs the slow steps side by side instead of one after the
+  other:
+    model   ORT session, then one warmup pass per length bucket on fixed IDs
+            (no G2P needed), so shape planning never lands on live traffic
+    speech  FerrariG2P, then one phonemized word to load the lexicons
+  Both threads share the tokenizer, which is the only thing they have in common.
+
+    engine, report = start_engine()
+    print(report.as_dict())   # {'import_ms': ..., 'session_ms': ..., 'g2p_ms': ..., 'ready_ms': ...}
+
+    python -m ferrari_tts.runtime --runs 5    # fresh processes, sequential vs parallel
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ferrari_tts.paths import ONNX_PATH, REPO_DIR
+
+# Must never be imported on the serving path (the startup bench reports them)
+HEAVY_MODULES = ("torch", "kokoro", "soundfile", "sentence_transformers", "transformers")
+# "Hello." in Kokoro's alphabet: the warmup never waits for G2P
+WARMUP_PHONEMES = "həlˈoʊ. "
+# Blueprints without length buckets: size ORT's arena for a short and a long clause
+WARMUP_LENGTHS = (16, 256)
+
+
+class StartupReport:
+    def __init__(self, parallel):
+        self.parallel = parallel
+        self.started_at = time.perf_counter()
+        self.phases = {}
+        self.warmup = {}
+        self.buckets = None
+        self.buckets_disabled = None
+        self.ready_s = None
+
+    def timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def ready(self):
+        self.ready_s = time.perf_counter() - self.started_at
+
+    def as_dict(self):
+        report = {"parallel": self.parallel}
+        report.update({f"{name}_ms": round(seconds * 1000, 2) for name, seconds in self.phases.items()})
+        report["ready_ms"] = None if self.ready_s is None else round(self.ready_s * 1000, 2)
+        report["warmup_ms_by_length"] = {str(n): round(s * 1000, 2) for n, s in self.warmup.items()}
+        report["buckets"] = None if self.buckets is None else list(self.buckets)
+        report["buckets_disabled"] = self.buckets_disabled
+        report["heavy_modules"] = [name for name in HEAVY_MODULES if name in sys.modules]
+        return report
+
+
+def _import_hot_path():
+    import numpy  # noqa: F401
+    import onnxruntime  # noqa: F401
+
+    import ferrari_tts.engine  # noqa: F401
+
+
+def start_engine(model_path=ONNX_PATH, lang_code="a", audio_cache=None, warmup=True, parallel=True,
+                 tokenizer=None, buckets=None):
+    """FerrariEngine with its session, G2P and arenas ready; returns (engine, StartupReport)"""
+    report = StartupReport(parallel)
+    report.timed("import", _import_hot_path)
+    from ferrari_tts.audio_cache import model_fingerprint
+    from ferrari_tts.engine import FerrariEngine
+    from ferrari_tts.session import create_session
+    from ferrari_tts.tokenizer import PhonemeTokenizer
+
+    if tokenizer is None:
+        tokenizer = report.timed("tokenizer", PhonemeTokenizer.from_config)
+
+    def model():
+        session = report.timed("session", create_session, model_path)
+        model_id = model_fingerprint(model_path, session=session) if audio_cache is not None else None
+        engine = FerrariEngine(model_path, session=session, audio_cache=audio_cache, model_id=model_id,
+                               buckets=buckets)
+        report.buckets, report.buckets_disabled = engine.buckets, engine.buckets_disabled
+        if warmup:
+            report.warmup = report.timed("warmup", warm_up, engine, tokenizer)
+        return engine
+
+    def speech():
+        from ferrari_tts.g2p import FerrariG2P
+        from ferrari_tts.phoneme_cache import open_default_cache
+
+        g2p = report.timed("g2p", FerrariG2P, lang_code, tokenizer=tokenizer, cache=open_default_cache())
+        if warmup:
+            # First real lookup loads the lexicons (and spaCy, when misaki wants it)
+            report.timed("g2p_warmup", g2p.encode, "Hello.")
+        return g2p
+
+    if parallel:
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="ferrari-start") as pool:
+            engine_future, g2p_future = pool.submit(model), pool.submit(speech)
+            engine, g2p = engine_future.result(), g2p_future.result()
+    else:
+        engine, g2p = model(), speech()
+    engine.g2p = g2p
+    report.ready()
+    return engine, report
+
+
+def warmup_ids(tokenizer, length):
+    """(1, length) IDs: BOS, WARMUP_PHONEMES repeated, EOS"""
+    import numpy as np
+
+    body = tokenizer.encode(WARMUP_PHONEMES, bos=False, eos=False)
+    ids = tokenizer.encode("", bos=True, eos=True)
+    return np.insert(ids, 1, np.resize(body, max(length - len(ids), 0)))[np.newaxis, :]
+
+
+def warm_up(engine, tokenizer, lengths=None):
+    """One session.run per length bucket; returns {length: seconds}
+
+    The first run at a new shape pays for ORT's memory planning: do it here,
+    not on the first listener. Bucket stats start clean afterwards.
+    """
+    timings = {}
+    for length in lengths or engine.buckets or WARMUP_LENGTHS:
+        ids = warmup_ids(tokenizer, length)
+        start = time.perf_counter()
+        engine.synthesize_ids(ids)
+        timings[length] = time.perf_counter() - start
+    if engine.bucket_stats is not None:
+        engine.bucket_stats.reset()
+    return timings
+
+
+# =============================================================================
+# STARTUP BENCHMARK
+# =============================================================================
+def _child(argv, timeout=600):
+    """Runs argv in a fresh interpreter; returns (last stdout line as JSON, wall seconds)"""
+    start = time.perf_counter()
+    done = subprocess.run(argv, cwd=str(REPO_DIR), capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - start
+    if done.returncode != 0:
+        raise RuntimeError(done.stderr.strip() or f"{argv} exited with {done.returncode}")
+    return json.loads(done.stdout.strip().splitlines()[-1]), wall
+
+
+def measure_cold_start(model_path=ONNX_PATH, runs=3, log=print):
+    """Median phase timings over `runs` fresh processes, for sequential and parallel start"""
+    from ferrari_tts.stats import percentile
+
+    probe = ("import json, time; start = time.perf_counter(); import ferrari_tts; "
+             "print(json.dumps((time.perf_counter() - start) * 1000))")
+    package_ms = [_child([sys.executable, "-c", probe])[0] for _ in range(runs)]
+    results = {"package_import_ms": round(percentile(package_ms, 50), 2)}
+    for mode in ("sequential", "parallel"):
+        reports = []
+        for run in range(runs):
+            report, wall = _child([sys.executable, "-m", "ferrari_tts.runtime", "--child", mode,
+                                   "--model", str(model_path)])
+            report["process_ms"] = round(wall * 1000, 2)
+            reports.append(report)
+            log(f"  {mode:<10} run {run + 1}: ready {report['ready_ms']} ms, process {report['process_ms']} ms")
+        keys = [key for key in reports[0] if key.endswith("_ms")]
+        results[mode] = {key: round(percentile([r[key] for r in reports], 50), 2) for key in keys}
+        results[mode]["heavy_modules"] = sorted({name for r in reports for name in r["heavy_modules"]})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ferrari cold start: time-to-ready in fresh processes")
+    parser.add_argument("--model", default=str(ONNX_PATH))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--out", default=None, help="also write the results as JSON")
+    parser.add_argument("--child", choices=("sequential", "parallel"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _, report = start_engine(args.model, parallel=args.child == "parallel")
+        print(json.dumps(report.as_dict()))
+        return 0
+
+    print(f"🚦 FERRARI COLD START: {args.model} ({args.runs} fresh processes per mode)")
+    print("=" * 60)
+    if not os.path.exists(args.model):
+        print(f"❌ Error: {args.model} not found. Run export_ferrari.py first.")
+        return 1
+    results = measure_cold_start(args.model, args.runs)
+
+    print("\n" + "=" * 60)
+    print(f"import ferrari_tts: {results['package_import_ms']} ms")
+    for mode in ("sequential", "parallel"):
+        r = results[mode]
+        phases = ", ".join(f"{key[:-3]} {value}" for key, value in r.items()
+                           if key.endswith("_ms") and key not in ("ready_ms", "process_ms"))
+        print(f"{mode:<10} ready {r['ready_ms']} ms | process {r['process_ms']} ms | {phases}")
+        if r["heavy_modules"]:
+            print(f"  ⚠️ heavy modules on the serving path: {', '.join(r['heavy_modules'])}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results saved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
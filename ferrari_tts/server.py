@@ -0,0 +1,334 @@
+"""
+Ferrari TTS - Synthesis Server
+==============================
+The bridge as a long-running process: the blueprint, G2P and phoneme cache
+are loaded once, and every request streams PCM back as it is rendered.
+
+    python -m ferrari_tts.server --port 8765
+    curl -N -d '{"text": "[warm] Hello. [pause:0.5] I am here."}' localhost:8765/synthesize > out.f32
+
+POST /synthesize  {"text", "voice"?, "format": "f32" | "s16"}  -> chunked raw PCM
+                  (24 kHz mono, little-endian; see the X-Sample-Rate header)
+GET  /health      -> JSON counters
+
+Plain asyncio HTTP/1.1 with chunked transfer encoding, no web framework.
+- session.run happens on a bounded thread pool (--workers), never on the loop;
+  with a BatchScheduler the pool only waits on futures, and gets one thread
+  per active stream so --max-active segments can meet in one batch
+- batched blueprints get a BatchScheduler: segments from requests that land
+  within --batch-wait-ms share one session.run
+- admission control: --max-active streams render at once, --max-queued wait
+  for a slot, everything beyond that gets 503 + Retry-After right away
+- backpressure: each frame is drained to the socket before the next segment
+  is pulled from the engine, so a slow client slows only its own render
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ferrari_tts.audio_cache import open_default_audio_cache
+from ferrari_tts.batching import DEFAULT_BUCKETS, BatchedSynthesizer, BatchScheduler, supports_batching
+from ferrari_tts.engine import CancelToken, StreamStats
+from ferrari_tts.markup import SAMPLE_RATE, compile_markup
+from ferrari_tts.paths import ONNX_PATH
+from ferrari_tts.runtime import start_engine
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+FORMATS = {"f32": "audio/pcm; format=f32le", "s16": "audio/pcm; format=s16le"}
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            408: "Request Timeout", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def encode_pcm(chunk, fmt):
+    if fmt == "s16":
+        return (np.clip(chunk, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    return chunk.astype("<f4", copy=False).tobytes()
+
+
+class SynthesisServer:
+    def __init__(self, engine, workers=2, max_active=4, max_queued=16,
+                 frame_ms=200, read_timeout_s=10.0, startup=None):
+        self.engine = engine
+        # StartupReport of the process, so autoscalers can see what a cold start costs
+        self.startup = startup
+        if engine.scheduler is not None:
+            # Threads here just block on scheduler futures: fewer than max_active caps every batch
+            workers = max(workers, max_active)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ferrari-synth")
+        self.max_queued = max_queued
+        self.frame_samples = int(SAMPLE_RATE * frame_ms / 1000)
+        self.read_timeout_s = read_timeout_s
+        self._slots = asyncio.Semaphore(max_active)
+        self.queued = 0
+        self.active = 0
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self.started_at = time.time()
+        self._server = None
+
+    # -------------------------------------------------------------------------
+    # HTTP plumbing
+    # -------------------------------------------------------------------------
+    async def read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length") from None
+        if length < 0:
+            raise HTTPError(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    @staticmethod
+    async def send_simple(writer, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                "Connection: close"]
+        head.extend(extra_headers)
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                method, path, _, body = await asyncio.wait_for(self.read_request(reader), self.read_timeout_s)
+            except asyncio.TimeoutError:
+                raise HTTPError(408, "request timed out") from None
+            except asyncio.LimitOverrunError:
+                raise HTTPError(413, "headers too large") from None
+            except asyncio.IncompleteReadError:
+                raise HTTPError(400, "incomplete request") from None
+
+            if path == "/health":
+                await self.send_simple(writer, 200, self.health())
+            elif path == "/synthesize":
+                if method != "POST":
+                    raise HTTPError(405, "use POST")
+                await self.synthesize(writer, self.parse_body(body))
+            else:
+                raise HTTPError(404, f"no route for {path}")
+        except HTTPError as exc:
+            extra = ("Retry-After: 1",) if exc.status == 503 else ()
+            try:
+                await self.send_simple(writer, exc.status, {"error": str(exc)}, extra)
+            except ConnectionError:
+                pass
+        except ConnectionError:
+            pass  # client went away mid-stream
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    def parse_body(body):
+        try:
+            request = json.loads(body.decode("utf-8")) if body.strip().startswith(b"{") else {
+                "text": body.decode("utf-8")}
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise HTTPError(400, "body must be UTF-8 text or JSON") from None
+        if not isinstance(request, dict):
+            raise HTTPError(400, "JSON body must be an object")
+        if not isinstance(request.get("text"), str) or not request["text"].strip():
+            raise HTTPError(400, "missing `text`")
+        if request.get("voice") is not None and not isinstance(request["voice"], str):
+            raise HTTPError(400, "`voice` must be a string")
+        if request.setdefault("format", "f32") not in FORMATS:
+            raise HTTPError(400, f"format must be one of {', '.join(FORMATS)}")
+        return request
+
+    # -------------------------------------------------------------------------
+    # Synthesis
+    # -------------------------------------------------------------------------
+    def validate(self, request):
+        """Everything that can fail before audio exists fails here, while a 400 is still possible"""
+        voice = request.get("voice")
+        voices = getattr(self.engine, "voices", None)
+        if voice and voices is not None and voice not in voices:
+            raise HTTPError(400, f"unknown voice {voice!r}")
+        try:
+            compile_markup(request["text"])
+        except ValueError as exc:
+            raise HTTPError(400, f"bad markup: {exc}") from None
+
+    async def synthesize(self, writer, request):
+        self.validate(request)
+        # Admission control: a bounded wait line in front of a bounded number of renders
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise HTTPError(503, "server busy")
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        stats = StreamStats()
+        cancel = CancelToken()
+        chunks = self.engine.astream(request["text"], executor=self.executor, stats=stats,
+                                     voice=request.get("voice"), cancel=cancel)
+        try:
+            writer.write((
+                "HTTP/1.1 200 OK\r\n"
+                f"Content-Type: {FORMATS[request['format']]}\r\n"
+                f"X-Sample-Rate: {SAMPLE_RATE}\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1"))
+            async for chunk in chunks:
+                for start in range(0, len(chunk), self.frame_samples):
+                    data = encode_pcm(chunk[start:start + self.frame_samples], request["format"])
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    # Backpressure: the next segment is not rendered until this one left
+                    await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+            self.served += 1
+        except ConnectionError:
+            raise
+        except Exception:
+            # Headers are already out: the only honest signal left is a truncated stream
+            self.failed += 1
+            raise ConnectionError("synthesis failed mid-stream") from None
+        finally:
+            # A client that hung up mid-stream must not keep a worker busy
+            cancel.cancel()
+            await chunks.aclose()
+            self.active -= 1
+            self._slots.release()
+
+    def health(self):
+        scheduler = self.engine.scheduler
+        audio_cache = getattr(self.engine, "audio_cache", None)
+        bucket_stats = getattr(self.engine, "bucket_stats", None)
+        if bucket_stats is None and scheduler is not None:
+            bucket_stats = scheduler.synthesizer.stats
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "served": self.served,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "batches_run": None if scheduler is None else scheduler.batches_run,
+            "segments_run": None if scheduler is None else scheduler.segments_run,
+            "audio_cache": None if audio_cache is None else audio_cache.stats.as_dict(),
+            "startup": None if self.startup is None else self.startup.as_dict(),
+            "buckets": None if bucket_stats is None else bucket_stats.as_dict(),
+        }
+
+    # -------------------------------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------------------------------
+    async def start(self, host="127.0.0.1", port=8765):
+        self._server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        return self._server
+
+    async def serve_forever(self, host="127.0.0.1", port=8765):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+        if self.engine.scheduler is not None:
+            self.engine.scheduler.close()
+
+
+def build_engine(model_path=ONNX_PATH, batch_wait_ms=5.0, max_batch=8, audio_cache_mb=32, buckets="auto"):
+    """(engine, StartupReport) for serving: batched blueprints get a shared micro-batching scheduler"""
+    # Fallback lines and confirmations repeat verbatim: serve them from the audio cache
+    audio_cache = open_default_audio_cache(audio_cache_mb * 1024 * 1024) if audio_cache_mb > 0 else None
+    # Session + warmup and misaki/spaCy load side by side, before the first listener arrives
+    engine, report = start_engine(model_path, audio_cache=audio_cache, buckets=buckets)
+    if supports_batching(engine.session):
+        # Same buckets (and counters) as the warmed-up single-segment path; segments of
+        # different lengths share a run only if the export proved padding parity
+        synthesizer = BatchedSynthesizer(engine.session, buckets=engine.buckets or DEFAULT_BUCKETS,
+                                         max_batch=max_batch, stats=engine.bucket_stats,
+                                         pad_to_bucket=engine.buckets is not None)
+        engine.scheduler = BatchScheduler(synthesizer, max_wait_ms=batch_wait_ms)
+    return engine, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Ferrari TTS over chunked HTTP")
+    parser.add_argument("--model", default=str(ONNX_PATH))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="threads running session.run")
+    parser.add_argument("--max-active", type=int, default=4, help="streams rendering at once")
+    parser.add_argument("--max-queued", type=int, default=16, help="streams waiting before 503")
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--audio-cache-mb", type=int, default=32, help="in-memory audio cache (0 = off)")
+    parser.add_argument("--buckets", type=int, nargs="+", default=None,
+                        help=f"input_ids length buckets for masked blueprints (default {DEFAULT_BUCKETS} "
+                             "once the export proved padding parity, else no padding)")
+    args = parser.parse_args(argv)
+
+    print(f"🏎️ FERRARI SERVER: loading {args.model}")
+    engine, startup = build_engine(args.model, args.batch_wait_ms, args.max_batch, args.audio_cache_mb,
+                                   args.buckets or "auto")
+    mode = "micro-batched" if engine.scheduler is not None else "single-segment"
+    if engine.buckets:
+        print(f"📏 Length buckets {list(engine.buckets)}")
+    else:
+        # Without them every new sentence length pays ORT's shape planning on live traffic
+        print(f"⚠️ Length buckets off: {engine.buckets_disabled}")
+    if engine.scheduler is not None and not engine.scheduler.synthesizer.mixed_lengths:
+        print("⚠️ Micro-batches hold equal-length segments only: padding parity not proven")
+    print(f"✅ Ready in {startup.ready_s * 1000:.0f} ms on http://{args.host}:{args.port} "
+          f"({mode}, {args.workers} workers)")
+
+    async def run():
+        server = SynthesisServer(engine, args.workers, args.max_active, args.max_queued, startup=startup)
+        try:
+            await server.serve_forever(args.host, args.port)
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
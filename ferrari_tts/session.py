@@ -0,0 +1,132 @@
+"""
+Ferrari TTS - ONNX Runtime Session Factory
+==========================================
+Every script used to call `ort.InferenceSession(path)` with default options:
+ORT then spins one intra-op thread per core, in every process, on boxes that
+host many sessions at once. Here all sessions (Kokoro and the Silero Bouncer)
+go through one factory with explicit thread counts, graph optimization level,
+arena/spinning switches and execution mode.
+
+Profiles are plain JSON. `python -m ferrari_tts.autotune` measures the local
+machine and stores the winner per model; create_session() picks it up.
+"""
+
+import json
+import os
+
+from ferrari_tts.paths import CACHE_DIR
+
+PROFILE_STORE = CACHE_DIR / "ort_profiles.json"
+
+GRAPH_LEVELS = ("disabled", "basic", "extended", "all")
+EXECUTION_MODES = ("sequential", "parallel")
+
+
+class SessionProfile:
+    FIELDS = (
+        "intra_op_threads", "inter_op_threads", "graph_optimization", "execution_mode",
+        "enable_cpu_mem_arena", "enable_mem_pattern", "allow_spinning",
+    )
+
+    def __init__(self, intra_op_threads=1, inter_op_threads=1, graph_optimization="all",
+                 execution_mode="sequential", enable_cpu_mem_arena=True, enable_mem_pattern=True,
+                 allow_spinning=False):
+        if graph_optimization not in GRAPH_LEVELS:
+            raise ValueError(f"graph_optimization must be one of {GRAPH_LEVELS}")
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"execution_mode must be one of {EXECUTION_MODES}")
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.graph_optimization = graph_optimization
+        self.execution_mode = execution_mode
+        self.enable_cpu_mem_arena = enable_cpu_mem_arena
+        self.enable_mem_pattern = enable_mem_pattern
+        self.allow_spinning = allow_spinning
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.FIELDS if name in data})
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.as_dict().items())
+        return f"SessionProfile({args})"
+
+    def session_options(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.graph_optimization_level = {
+            "disabled": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[self.graph_optimization]
+        options.execution_mode = (
+            ort.ExecutionMode.ORT_PARALLEL if self.execution_mode == "parallel"
+            else ort.ExecutionMode.ORT_SEQUENTIAL
+        )
+        options.enable_cpu_mem_arena = self.enable_cpu_mem_arena
+        options.enable_mem_pattern = self.enable_mem_pattern
+        spin = "1" if self.allow_spinning else "0"
+        options.add_session_config_entry("session.intra_op.allow_spinning", spin)
+        options.add_session_config_entry("session.inter_op.allow_spinning", spin)
+        return options
+
+
+# Conservative defaults for shared boxes: a couple of threads, no busy-waiting
+DEFAULT_PROFILES = {
+    "ferrari_kokoro": SessionProfile(intra_op_threads=min(4, os.cpu_count() or 1)),
+    "silero_vad": SessionProfile(intra_op_threads=1, graph_optimization="all"),
+}
+
+
+def profile_key(model_path):
+    return os.path.splitext(os.path.basename(str(model_path)))[0]
+
+
+def load_profiles(store=PROFILE_STORE):
+    try:
+        with open(store, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_profile(model_path, profile, store=PROFILE_STORE, metrics=None):
+    """Stores the tuned profile for a model (keyed by file stem)"""
+    profiles = load_profiles(store)
+    entry = profile.as_dict()
+    if metrics:
+        entry["metrics"] = metrics
+    profiles[profile_key(model_path)] = entry
+    os.makedirs(os.path.dirname(str(store)), exist_ok=True)
+    tmp = f"{store}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp, store)
+
+
+def resolve_profile(model_path, store=PROFILE_STORE):
+    """Tuned profile if the autotuner ran on this machine, else the default"""
+    key = profile_key(model_path)
+    saved = load_profiles(store).get(key)
+    if saved is not None:
+        return SessionProfile.from_dict(saved)
+    for name, profile in DEFAULT_PROFILES.items():
+        if key.startswith(name):
+            return profile
+    return SessionProfile()
+
+
+def create_session(model_path, profile=None, providers=("CPUExecutionProvider",)):
+    import onnxruntime as ort
+
+    profile = profile or resolve_profile(model_path)
+    return ort.InferenceSession(
+        str(model_path), sess_options=profile.session_options(), providers=list(providers)
+    )
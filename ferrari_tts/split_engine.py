@@ -0,0 +1,183 @@
+"""
+Ferrari TTS - Split Engine (Windowed Decoder Streaming)
+=======================================================
+The two-stage pipeline behind scripts/export_ferrari_split.py.
+
+Stage 1 (once per clause): encoder.onnx gives `d`, `t_en` and `duration`;
+the durations are expanded into frames with np.repeat and prosody.onnx turns
+them into the F0 / energy curves.
+
+Stage 2 (per window): decoder.onnx vocodes `window_frames` frames at a time,
+with `context_frames` of real neighbours on both sides so its convolutions
+never see a fake edge. Adjacent windows overlap by `crossfade_ms` and are
+joined with a raised-cosine overlap-add.
+
+A long clause no longer has to be vocoded in full before the first sample,
+and the decoder's peak memory is bounded by the window size, not the clause.
+
+The price: windowed audio is an approximation of the whole-clause decode.
+The decoder's InstanceNorm/AdaIN statistics are taken per window, and
+SineGen restarts its cumulative F0 phase at every window start; the context
+frames and the crossfade only hide what happens at the seams. window_parity()
+measures it (SNR / LSD against a whole-clause decode of the same asr, F0, N,
+on the fixed-noise decoder from scripts/export_ferrari_split.py); pick
+`window_frames` / `context_frames` from the sweep before shipping:
+
+    python -m ferrari_tts.split_engine --window 20 40 80 --context 4 8 16
+"""
+
+import argparse
+
+import numpy as np
+
+from ferrari_tts.assembly import AudioBuffer
+from ferrari_tts.audio_metrics import compare
+from ferrari_tts.audio_cache import model_fingerprint
+from ferrari_tts.batching import SAMPLES_PER_FRAME
+from ferrari_tts.dsp import crossfade_into, ms_to_samples
+from ferrari_tts.engine import FerrariEngine, run_session
+from ferrari_tts.paths import (DECODER_FIXED_NOISE_ONNX_PATH, DECODER_ONNX_PATH, ENCODER_ONNX_PATH,
+                               PROSODY_ONNX_PATH)
+from ferrari_tts.session import create_session
+from ferrari_tts.voices import DEFAULT_VOICE
+
+class SplitEngine(FerrariEngine):
+    def __init__(self, encoder_path=ENCODER_ONNX_PATH, prosody_path=PROSODY_ONNX_PATH,
+                 decoder_path=DECODER_ONNX_PATH, g2p=None, voices=None, voice=DEFAULT_VOICE,
+                 window_frames=40, context_frames=8, crossfade_ms=10, audio_cache=None):
+        model_id = None
+        if audio_cache is not None:
+            model_id = model_fingerprint(encoder_path, prosody_path, decoder_path)
+        super().__init__(session=create_session(encoder_path), g2p=g2p, voices=voices, voice=voice,
+                         audio_cache=audio_cache, model_id=model_id)
+        self.prosody = create_session(prosody_path)
+        self.decoder = create_session(decoder_path)
+        self.window_frames = window_frames
+        self.context_frames = context_frames
+        self.crossfade = ms_to_samples(crossfade_ms)
+        if self.crossfade > context_frames * SAMPLES_PER_FRAME:
+            raise ValueError("crossfade_ms must fit inside the decoder context")
+
+    def encode(self, input_ids, speed=1.0, voice=None, cancel=None):
+        """Stage 1: IDs -> (asr, F0, N, ref_s) for the whole clause"""
+        feeds = self.feeds_for(input_ids, speed, voice)
+        d, t_en, duration = run_session(self.session, ["d", "t_en", "duration"], feeds, cancel)
+        frames = np.maximum(np.rint(duration.reshape(-1)), 1).astype(np.int64)
+        en = np.repeat(d[0], frames, axis=0).T[np.newaxis]            # (1, C, T)
+        asr = np.repeat(t_en[0], frames, axis=-1)[np.newaxis]          # (1, 512, T)
+        F0, N = run_session(self.prosody, ["F0", "N"], {"en": np.ascontiguousarray(en), "ref_s": feeds["ref_s"]},
+                            cancel)
+        return asr, F0, N, feeds["ref_s"]
+
+    def decode_window(self, asr, F0, N, ref_s, start, end, cancel=None, decoder=None):
+        """Stage 2 for frames [start, end); F0/N run at twice the frame rate"""
+        return run_session(decoder or self.decoder, ["audio"], {
+            "asr": np.ascontiguousarray(asr[:, :, start:end]),
+            "F0": np.ascontiguousarray(F0[:, 2 * start:2 * end]),
+            "N": np.ascontiguousarray(N[:, 2 * start:2 * end]),
+            "ref_s": ref_s,
+        }, cancel)[0].reshape(-1)
+
+    def synthesize_chunks(self, input_ids, speed=1.0, voice=None, cancel=None):
+        yield from self.decode_windows(*self.encode(input_ids, speed, voice, cancel), cancel=cancel)
+
+    def decode_windows(self, asr, F0, N, ref_s, cancel=None, decoder=None):
+        """Stage 2 over a whole clause, one window at a time (crossfaded PCM pieces)"""
+        total = asr.shape[-1]
+        tail = None
+        for start in range(0, total, self.window_frames):
+            if cancel is not None:
+                # Barge-in between windows: the rest of the clause is never vocoded
+                cancel.raise_if_cancelled()
+            end = min(total, start + self.window_frames)
+            lo = max(0, start - self.context_frames)
+            hi = min(total, end + self.context_frames)
+            audio = self.decode_window(asr, F0, N, ref_s, lo, hi, cancel, decoder)
+            per_frame = len(audio) // (hi - lo)
+
+            region = audio[(start - lo) * per_frame:(end - lo) * per_frame]
+            if tail is not None:
+                # Previous window already rendered the first samples of this one
+                n = min(len(tail), len(region))
+                crossfade_into(region[:n], tail[:n], shape="cosine")
+            tail = None
+            if end < total:
+                tail = audio[(end - lo) * per_frame:(end - lo) * per_frame + self.crossfade].copy()
+            yield region
+
+    def synthesize_ids(self, input_ids, speed=1.0, voice=None, cancel=None):
+        buffer = AudioBuffer()
+        for chunk in self.synthesize_chunks(input_ids, speed, voice, cancel):
+            buffer.append(chunk)
+        return buffer.finish()
+
+
+# =============================================================================
+# WINDOW PARITY
+# =============================================================================
+def window_parity(engine, id_arrays, decoder=None, speed=1.0, voice=None):
+    """Windowed vs whole-clause decode of the same (asr, F0, N), per clause
+
+    `decoder` should be the fixed-noise export (DECODER_FIXED_NOISE_ONNX_PATH):
+    with the shipped decoder, SineGen's random phase and noise differ on every
+    run and would drown the windowing error. `rerun_snr_db` shows which one it was.
+    """
+    decoder = decoder or engine.decoder
+    clauses = []
+    for ids in id_arrays:
+        asr, F0, N, ref_s = engine.encode(ids, speed, voice)
+        full = engine.decode_window(asr, F0, N, ref_s, 0, asr.shape[-1], decoder=decoder)
+        rerun = engine.decode_window(asr, F0, N, ref_s, 0, asr.shape[-1], decoder=decoder)
+        windowed = np.concatenate(list(engine.decode_windows(asr, F0, N, ref_s, decoder=decoder)))
+        row = compare(full, windowed)
+        row["frames"] = int(asr.shape[-1])
+        row["rerun_snr_db"] = compare(full, rerun)["snr_db"]
+        clauses.append(row)
+    return {
+        "window_frames": engine.window_frames,
+        "context_frames": engine.context_frames,
+        "worst_snr_db": min(row["snr_db"] for row in clauses),
+        "worst_lsd_db": max(row["lsd_db"] for row in clauses),
+        "deterministic": all(row["rerun_snr_db"] == float("inf") for row in clauses),
+        "clauses": clauses,
+    }
+
+
+PARITY_TEXTS = (
+    "To extrude a sketch in SolidWorks, you must first select a closed profile.",
+    "If the extrusion fails, check for open contours or overlapping lines in your sketch.",
+    "Mate constraints are used to align parts in an assembly, ensuring zero-degree freedom.",
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Windowed decoder parity: window/context sweep")
+    parser.add_argument("--decoder", default=str(DECODER_FIXED_NOISE_ONNX_PATH),
+                        help="decoder to compare with (default: the fixed-noise export)")
+    parser.add_argument("--window", type=int, nargs="+", default=[20, 40, 80])
+    parser.add_argument("--context", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--text", nargs="+", default=list(PARITY_TEXTS))
+    args = parser.parse_args(argv)
+
+    print("🪟 FERRARI SPLIT ENGINE: windowed vs whole-clause decode")
+    print("=" * 60)
+    engine = SplitEngine()
+    decoder = create_session(args.decoder)
+    id_arrays = [ids for text in args.text for ids in engine.g2p.encode(text)]
+    report = None
+    for window in args.window:
+        for context in args.context:
+            if engine.crossfade > context * SAMPLES_PER_FRAME:
+                print(f"window {window:>3} context {context:>3}: skipped (crossfade longer than the context)")
+                continue
+            engine.window_frames, engine.context_frames = window, context
+            report = window_parity(engine, id_arrays, decoder)
+            print(f"window {window:>3} context {context:>3}: SNR {report['worst_snr_db']:>7} dB | "
+                  f"LSD {report['worst_lsd_db']:>6} dB")
+    if report is not None and not report["deterministic"]:
+        print("⚠️ The decoder is not deterministic: the numbers include SineGen's run-to-run noise")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+"""
+Ferrari TTS - Measurement Helpers
+=================================
+Percentiles and peak memory for the benches, with no platform-specific
+imports at module level (`resource` does not exist on Windows).
+"""
+
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak_rss_mb() asks psutil instead, when it is installed
+    resource = None
+
+
+def percentile(values, q):
+    """Nearest-rank percentile; `values` need not be sorted"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB (None when the platform cannot tell)"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    # Windows keeps the peak working set; elsewhere the current RSS is the best we get
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
@@ -0,0 +1,126 @@
+"""
+Ferrari TTS - Phoneme Tokenizer
+===============================
+The single source of truth for phoneme -> ID mapping.
+
+The vocabulary is read once from the official Kokoro config.json and turned
+into a codepoint-indexed lookup table, so a whole string (or a whole batch of
+strings) is mapped with one NumPy gather instead of a per-character loop.
+Unknown symbols are dropped and counted, never printed one by one.
+"""
+
+import hashlib
+import json
+from collections import Counter
+
+import numpy as np
+
+from ferrari_tts.paths import kokoro_config_path
+
+BOS_ID = 0
+EOS_ID = 0
+PAD_ID = 0
+SPACE_ID = 16
+
+
+class PhonemeTokenizer:
+    def __init__(self, vocab):
+        self.vocab = dict(vocab)
+        max_codepoint = max(ord(symbol) for symbol in self.vocab)
+        # The last slot is a sentinel: every codepoint beyond the table lands on it.
+        self.lut = np.full(max_codepoint + 2, -1, dtype=np.int64)
+        for symbol, idx in self.vocab.items():
+            self.lut[ord(symbol)] = idx
+        self.unknown = Counter()
+
+    @classmethod
+    def from_config(cls, config_path=None):
+        """Loads the official vocabulary from Kokoro's config.json"""
+        config_path = config_path or kokoro_config_path()
+        with open(config_path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["vocab"])
+
+    @property
+    def unknown_total(self):
+        return sum(self.unknown.values())
+
+    def fingerprint(self):
+        """Stable identifier of the vocabulary (used to invalidate caches)"""
+        ordered = json.dumps(sorted(self.vocab.items()), ensure_ascii=False)
+        return hashlib.sha1(ordered.encode("utf-8")).hexdigest()[:16]
+
+    def _codepoints(self, text):
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        return np.minimum(codes, len(self.lut) - 1)
+
+    def _lookup(self, codes):
+        ids = self.lut[codes]
+        known = ids >= 0
+        if not known.all():
+            missing, counts = np.unique(codes[~known], return_counts=True)
+            for code, count in zip(missing.tolist(), counts.tolist()):
+                symbol = chr(code) if code < len(self.lut) - 1 else "<out-of-range>"
+                self.unknown[symbol] += count
+        return ids, known
+
+    def encode(self, phonemes, bos=True, eos=True, tail=()):
+        """Maps one phoneme string to a flat int64 ID array"""
+        ids, known = self._lookup(self._codepoints(phonemes))
+        parts = []
+        if bos:
+            parts.append([BOS_ID])
+        parts.append(ids[known])
+        if tail:
+            parts.append(list(tail))
+        if eos:
+            parts.append([EOS_ID])
+        return np.concatenate([np.asarray(p, dtype=np.int64) for p in parts])
+
+    def __call__(self, phonemes, bos=True, eos=True, tail=()):
+        """Same as encode() but shaped (1, L) - ready for `input_ids`"""
+        return self.encode(phonemes, bos=bos, eos=eos, tail=tail)[np.newaxis, :]
+
+    def encode_batch(self, phoneme_list, bos=True, eos=True, tail=()):
+        """
+        Maps a batch of phoneme strings in one gather.
+        Returns (ids, lengths): ids is a PAD-padded (B, max_len) int64 matrix,
+        lengths holds the real length of every row (BOS/EOS/tail included).
+        """
+        batch = len(phoneme_list)
+        tail = np.asarray(tail, dtype=np.int64)
+        prefix = 1 if bos else 0
+        extra = prefix + len(tail) + (1 if eos else 0)
+        if batch == 0:
+            return np.zeros((0, extra), dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        char_lengths = np.fromiter((len(p) for p in phoneme_list), dtype=np.int64, count=batch)
+        ids, known = self._lookup(self._codepoints("".join(phoneme_list)))
+
+        # Which row every character belongs to, and how many survive per row
+        rows = np.repeat(np.arange(batch), char_lengths)
+        rows, ids = rows[known], ids[known]
+        kept = np.bincount(rows, minlength=batch)
+
+        lengths = kept + extra
+        out = np.full((batch, int(lengths.max())), PAD_ID, dtype=np.int64)
+
+        # Position of every kept symbol inside its own row
+        row_starts = np.cumsum(kept) - kept
+        cols = np.arange(len(ids)) - np.repeat(row_starts, kept) + prefix
+        out[rows, cols] = ids
+
+        every_row = np.arange(batch)
+        if bos:
+            out[:, 0] = BOS_ID
+        for offset, token in enumerate(tail.tolist()):
+            out[every_row, prefix + kept + offset] = token
+        if eos:
+            out[every_row, lengths - 1] = EOS_ID
+        return out, lengths
+
+    def stats(self):
+        return {
+            "vocab_size": len(self.vocab),
+            "unknown_total": self.unknown_total,
+            "unknown": dict(self.unknown.most_common()),
+        }
@@ -0,0 +1,172 @@
+"""
+Ferrari TTS - Streaming Bouncer (Silero VAD)
+============================================
+The server-side gate in front of the expensive pipeline, built on
+ferrari_tts/models/silero_vad.onnx (scripts/prepare_vad.py).
+
+BouncerVAD.isHumanSpeaking sends every chunk on its own, so Silero starts
+cold each time. Here:
+- arbitrary-size PCM goes into a ring buffer and comes out as fixed frames
+  (512 samples @ 16 kHz, plus the 64-sample context Silero v5 expects)
+- the recurrent state is carried from frame to frame
+- hysteresis: speech starts at `onset`, and only ends after the probability
+  stayed under `offset` for `hangover_ms`
+- input tensors are allocated once and refilled in place
+
+    vad = StreamingVAD()
+    for event in vad.feed(pcm_16k):
+        print(event)   # VADEvent('start', 1.216 s, p=0.91)
+
+Handles both Silero layouts: v5 (`state`) and v4 (`h`/`c`).
+"""
+
+import numpy as np
+
+from ferrari_tts.paths import VAD_PATH
+
+VAD_SAMPLE_RATE = 16000
+# Silero is trained on these exact frame sizes
+FRAME_SAMPLES = {16000: 512, 8000: 256}
+CONTEXT_SAMPLES = {16000: 64, 8000: 32}
+
+
+class VADEvent:
+    __slots__ = ("kind", "time_s", "probability")
+
+    def __init__(self, kind, time_s, probability):
+        self.kind = kind
+        self.time_s = time_s
+        self.probability = probability
+
+    def __repr__(self):
+        return f"VADEvent({self.kind!r}, {self.time_s:.3f} s, p={self.probability:.2f})"
+
+
+class StreamingVAD:
+    def __init__(self, model_path=VAD_PATH, session=None, sample_rate=VAD_SAMPLE_RATE,
+                 onset=0.5, offset=0.35, hangover_ms=300, buffer_s=2.0):
+        if sample_rate not in FRAME_SAMPLES:
+            raise ValueError(f"Silero runs at {sorted(FRAME_SAMPLES)} Hz, got {sample_rate}")
+        if offset > onset:
+            raise ValueError("offset must not be above onset")
+        if session is None:
+            from ferrari_tts.session import create_session
+            session = create_session(model_path)
+        self.session = session
+        self.sample_rate = sample_rate
+        self.frame = FRAME_SAMPLES[sample_rate]
+        self.onset = onset
+        self.offset = offset
+        self.hangover_frames = max(1, round(hangover_ms / 1000 * sample_rate / self.frame))
+
+        inputs = {i.name for i in session.get_inputs()}
+        self._v5 = "state" in inputs
+        self.context = CONTEXT_SAMPLES[sample_rate] if self._v5 else 0
+
+        # Preallocated once: every frame only refills these in place
+        self._input = np.zeros((1, self.context + self.frame), dtype=np.float32)
+        self._feeds = {"input": self._input, "sr": np.array(sample_rate, dtype=np.int64)}
+        if self._v5:
+            self._feeds["state"] = np.zeros((2, 1, 128), dtype=np.float32)
+            self._state_names = ["state"]
+            self._outputs = ["output", "stateN"]
+        else:
+            self._feeds["h"] = np.zeros((2, 1, 64), dtype=np.float32)
+            self._feeds["c"] = np.zeros((2, 1, 64), dtype=np.float32)
+            self._state_names = ["h", "c"]
+            self._outputs = ["output", "hn", "cn"]
+
+        self._ring = np.zeros(max(int(buffer_s * sample_rate), 2 * self.frame), dtype=np.float32)
+        self._read = 0      # absolute sample positions; ring index = position % len(ring)
+        self._write = 0
+        self.reset()
+
+    def reset(self):
+        """Forget everything (new call / new speaker)"""
+        for name in self._state_names:
+            self._feeds[name].fill(0.0)
+        self._input.fill(0.0)
+        self._read = self._write = 0
+        self.frames = 0
+        self.probability = 0.0
+        self.speaking = False
+        self._quiet_frames = 0
+
+    @property
+    def pending(self):
+        return self._write - self._read
+
+    def feed(self, pcm):
+        """Buffers PCM of any length and returns the events of every complete frame"""
+        pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
+        events = []
+        start = 0
+        while start < len(pcm):
+            room = len(self._ring) - self.pending
+            if room == 0:
+                events.extend(self._drain())
+                continue
+            take = min(room, len(pcm) - start)
+            self._ring_write(pcm[start:start + take])
+            start += take
+        events.extend(self._drain())
+        return events
+
+    def process_frame(self, frame):
+        """One Silero step on exactly `self.frame` samples -> speech probability"""
+        if self.context:
+            # Last samples of the previous frame lead this one in
+            self._input[0, :self.context] = self._input[0, -self.context:]
+        self._input[0, self.context:] = frame
+        outputs = self.session.run(self._outputs, self._feeds)
+        for name, value in zip(self._state_names, outputs[1:]):
+            self._feeds[name] = value
+        self.frames += 1
+        self.probability = float(np.reshape(outputs[0], -1)[0])
+        return self.probability
+
+    def _ring_write(self, pcm):
+        size = len(self._ring)
+        at = self._write % size
+        first = min(len(pcm), size - at)
+        self._ring[at:at + first] = pcm[:first]
+        self._ring[:len(pcm) - first] = pcm[first:]
+        self._write += len(pcm)
+
+    def _next_frame(self):
+        size = len(self._ring)
+        at = self._read % size
+        self._read += self.frame
+        if at + self.frame <= size:
+            return self._ring[at:at + self.frame]
+        return np.concatenate((self._ring[at:], self._ring[:at + self.frame - size]))
+
+    def _drain(self):
+        events = []
+        while self.pending >= self.frame:
+            frame_start = self._read
+            probability = self.process_frame(self._next_frame())
+            event = self._update(probability, frame_start)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _update(self, probability, frame_start):
+        """Hysteresis + hangover state machine; returns an event on a transition"""
+        if not self.speaking:
+            if probability >= self.onset:
+                self.speaking = True
+                self._quiet_frames = 0
+                return VADEvent("start", frame_start / self.sample_rate, probability)
+            return None
+        if probability < self.offset:
+            self._quiet_frames += 1
+            if self._quiet_frames >= self.hangover_frames:
+                self.speaking = False
+                # Speech ended where the quiet run began, not where we noticed
+                end = frame_start - (self._quiet_frames - 1) * self.frame
+                self._quiet_frames = 0
+                return VADEvent("end", end / self.sample_rate, probability)
+        else:
+            self._quiet_frames = 0
+        return None
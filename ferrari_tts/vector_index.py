@@ -0,0 +1,320 @@
+"""
+Ferrari TTS - Specialist Vector Index
+=====================================
+The persistent memory behind FerrariSpecialist (scripts/specialist_vector_test.py).
+
+The explorer re-encoded the whole manual on every start and scored it with an
+unnormalized np.dot + argmax. Here the passages are encoded once and kept in
+one directory:
+
+    index.json      dim, count, dtype, encoder name
+    vectors.f32     (count, dim) L2-normalized rows   (or vectors.i8 + scales.f32)
+    passages.txt    UTF-8 passages, one after the other
+    offsets.i64     count + 1 byte offsets into passages.txt
+    deleted.u8      one tombstone byte per row
+
+Everything is memory-mapped read-only on open, so startup costs a JSON read
+no matter how big the manual is. Rows are unit length, so a dot product is
+the cosine similarity; top-k comes from np.argpartition, batched queries are
+one matrix product per block, and append() adds passages without touching
+the existing rows. `count` in index.json is only bumped after the data is on
+disk, so a crashed append leaves the index as it was. delete() only
+tombstones rows (searches skip them); compact() writes the rows that are
+left into a fresh `gen<N>/` directory and switches to it by replacing
+index.json (its `data` entry), so a crash at any point leaves one complete
+set of files. The new `generation` renumbers the ids.
+
+    index = VectorIndex(CACHE_DIR / "specialist" / "solidworks")
+    index.append(encoder.encode(passages), passages)
+    ids, scores = index.search(encoder.encode(["extrusion fails"]), k=3)
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+DTYPES = ("float32", "int8")
+# FerrariSpecialist's sentence encoder (~30 MB; a CoreML build of it runs on iPhone)
+DEFAULT_ENCODER = "all-MiniLM-L6-v2"
+# Rows scored per matrix product: bounds the float32 scratch for int8 indexes
+BLOCK_ROWS = 65536
+# Everything but index.json; lives in the directory index.json names under `data`
+DATA_FILES = ("vectors.f32", "vectors.i8", "scales.f32", "passages.txt", "offsets.i64", "deleted.u8")
+
+
+def load_encoder(name=DEFAULT_ENCODER):
+    """The sentence-transformers model shared by the specialist and the router"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def normalize(vectors):
+    """Rows scaled to unit L2 length (all-zero rows stay zero)"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors):
+    """Symmetric per-row int8: row ~= q * scale"""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    q = np.clip(np.rint(vectors / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+    return q, scales
+
+
+def score_rows(queries, rows, scales=None):
+    """Unit queries (Q, dim) against stored rows -> (Q, len(rows)) cosine scores"""
+    if scales is None:
+        return queries @ rows.T
+    return (queries @ rows.astype(np.float32).T) * scales
+
+
+def top_k(scores, k, ids=None):
+    """Best-first (ids, scores) of the k largest entries per row of `scores`"""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        best = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-top, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    if ids is not None:
+        best = ids[best]
+    return best, np.take_along_axis(top, order, axis=1)
+
+
+class VectorIndex:
+    def __init__(self, directory, dtype="float32", encoder=""):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self.directory = Path(directory)
+        self.meta_path = self.directory / "index.json"
+        self.dim = None
+        self.count = 0
+        self.deleted = 0
+        self.generation = 0
+        self.data = ""
+        self.dtype = dtype
+        self.encoder = encoder
+        if self.meta_path.exists():
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if encoder and meta.get("encoder") and meta["encoder"] != encoder:
+                raise ValueError(f"{self.directory} was built with '{meta['encoder']}', not '{encoder}'")
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+            self.dtype = meta["dtype"]
+            self.encoder = meta.get("encoder", encoder)
+            self.deleted = meta.get("deleted", 0)
+            self.generation = meta.get("generation", 0)
+            self.data = meta.get("data", "")
+        self._map()
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def live(self):
+        """Rows a search can return"""
+        return self.count - self.deleted
+
+    @property
+    def data_dir(self):
+        """Where the current generation's data files are"""
+        return self.directory / self.data if self.data else self.directory
+
+    @property
+    def _vectors_path(self):
+        return self.data_dir / ("vectors.f32" if self.dtype == "float32" else "vectors.i8")
+
+    def _map(self):
+        """(Re)maps the first `count` rows; nothing beyond them is ever read"""
+        self._map_release()
+        if not self.count:
+            return
+        dtype = np.float32 if self.dtype == "float32" else np.int8
+        self._vectors = np.memmap(self._vectors_path, dtype=dtype, mode="r", shape=(self.count, self.dim))
+        if self.dtype == "int8":
+            self._scales = np.memmap(self.data_dir / "scales.f32", dtype=np.float32, mode="r", shape=(self.count,))
+        self._offsets = np.memmap(self.data_dir / "offsets.i64", dtype=np.int64, mode="r", shape=(self.count + 1,))
+        if self.deleted:
+            mask = np.fromfile(self.data_dir / "deleted.u8", dtype=np.uint8, count=self.count).astype(bool)
+            self.deleted_mask = mask
+            self._deleted_ids = np.flatnonzero(mask)
+
+    def append(self, vectors, passages):
+        """Adds passages with their (unnormalized) embeddings; returns their ids"""
+        vectors = normalize(vectors)
+        passages = list(passages)
+        if len(vectors) != len(passages):
+            raise ValueError(f"{len(vectors)} vectors for {len(passages)} passages")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"index holds {self.dim}-d vectors, got {vectors.shape[1]}-d")
+        first = self.count
+        if not passages:
+            return range(first, first)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+        encoded = [p.encode("utf-8") for p in passages]
+        start = int(self._offsets[-1]) if self.count else 0
+        offsets = start + np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64)
+        if self.dtype == "int8":
+            rows, scales = quantize(vectors)
+        else:
+            rows, scales = vectors, None
+
+        # Our own maps go first: some platforms refuse to resize a mapped file
+        self._map_release()
+        _write_at(self._vectors_path, first * self.dim * rows.itemsize, rows.tobytes())
+        if scales is not None:
+            _write_at(self.data_dir / "scales.f32", first * 4, scales.tobytes())
+        _write_at(self.data_dir / "passages.txt", start, b"".join(encoded))
+        # offsets[first] is already on disk (or is the leading 0 of a new index)
+        _write_at(self.data_dir / "offsets.i64", first * 8, offsets.tobytes())
+        _write_at(self.data_dir / "deleted.u8", first, bytes(len(passages)))
+
+        self.count += len(passages)
+        self._write_meta()
+        self._map()
+        return range(first, self.count)
+
+    def delete(self, ids):
+        """Tombstones rows; their ids stay taken until compact()"""
+        ids = np.unique(np.asarray(list(ids), dtype=np.int64))
+        if not len(ids):
+            return 0
+        if ids[0] < 0 or ids[-1] >= self.count:
+            raise IndexError(f"row ids must be in [0, {self.count})")
+        self._map_release()
+        path = self.data_dir / "deleted.u8"
+        mask = np.zeros(self.count, dtype=np.uint8)
+        if path.exists():
+            on_disk = np.fromfile(path, dtype=np.uint8, count=self.count)
+            mask[:len(on_disk)] = on_disk
+        removed = int(np.count_nonzero(mask[ids] == 0))
+        mask[ids] = 1
+        _write_at(path, 0, mask.tobytes())
+        self.deleted = int(np.count_nonzero(mask))
+        self._write_meta()
+        self._map()
+        return removed
+
+    def compact(self):
+        """Rewrites the index without deleted rows; returns the old id of every kept row
+
+        Ids are renumbered, so `generation` goes up and anything keyed by row
+        id (IVF cells, ingest records) has to be remapped or rebuilt.
+        """
+        keep = np.arange(self.count) if self.deleted_mask is None else np.flatnonzero(~self.deleted_mask)
+        if len(keep) == self.count:
+            return keep
+        data = f"gen{self.generation + 1}"
+        target = self.directory / data
+        if target.exists():
+            # Left by a compact that died before it switched over
+            shutil.rmtree(target)
+        fresh = VectorIndex(target, dtype=self.dtype, encoder=self.encoder)
+        passages = self.passages()
+        for start in range(0, len(keep), BLOCK_ROWS):
+            chunk = keep[start:start + BLOCK_ROWS]
+            fresh.append(self.vectors(chunk), [passages[i] for i in chunk])
+        fresh._map_release()
+        fresh.meta_path.unlink(missing_ok=True)
+
+        self._map_release()
+        self.data = data
+        self.dim = fresh.dim or self.dim
+        self.count = fresh.count
+        self.deleted = 0
+        self.generation += 1
+        # The switch: until index.json names the new directory, the old files are the index
+        self._write_meta()
+        self._sweep()
+        self._map()
+        return keep
+
+    def _sweep(self):
+        """Deletes the files of superseded generations (and of compacts that died)"""
+        if self.data:
+            for name in DATA_FILES:
+                (self.directory / name).unlink(missing_ok=True)
+        for path in self.directory.glob("gen*"):
+            if path.is_dir() and path.name != self.data:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _map_release(self):
+        self._vectors = self._scales = self._offsets = None
+        self.deleted_mask = self._deleted_ids = None
+
+    def _write_meta(self):
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "count": self.count, "dtype": self.dtype, "encoder": self.encoder,
+                       "deleted": self.deleted, "generation": self.generation, "data": self.data}, f, indent=2)
+        os.replace(tmp, self.meta_path)
+
+    def scores(self, queries):
+        """(Q, count) cosine similarities for (Q, dim) or (dim,) queries"""
+        queries = normalize(queries)
+        out = np.empty((len(queries), self.count), dtype=np.float32)
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(self.count, start + BLOCK_ROWS)
+            scales = None if self._scales is None else self._scales[start:end]
+            out[:, start:end] = score_rows(queries, self._vectors[start:end], scales)
+        if self._deleted_ids is not None:
+            out[:, self._deleted_ids] = -np.inf
+        return out
+
+    def search(self, queries, k=5):
+        """Top-k per query: (ids, scores), both (Q, k) and best first"""
+        queries = np.asarray(queries, dtype=np.float32)
+        if not self.live:
+            empty = np.zeros((len(np.atleast_2d(queries)), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        return top_k(self.scores(queries), min(k, self.live))
+
+    def rows(self, start=0, end=None):
+        """Stored rows [start, end) and their int8 scales (None for float32)"""
+        end = self.count if end is None else end
+        if self._vectors is None:
+            return np.zeros((0, self.dim or 0), dtype=np.float32), None
+        scales = None if self._scales is None else self._scales[start:end]
+        return self._vectors[start:end], scales
+
+    def vectors(self, ids):
+        """Unit-length float32 rows for `ids` (int8 rows come back dequantized)"""
+        ids = np.asarray(ids, dtype=np.int64)
+        rows = np.asarray(self._vectors[ids], dtype=np.float32)
+        if self._scales is not None:
+            rows *= self._scales[ids][:, np.newaxis]
+        return rows
+
+    def passage(self, i):
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        with open(self.data_dir / "passages.txt", "rb") as f:
+            f.seek(start)
+            return f.read(end - start).decode("utf-8")
+
+    def passages(self):
+        """Every stored passage, in id order"""
+        if not self.count:
+            return []
+        with open(self.data_dir / "passages.txt", "rb") as f:
+            blob = f.read(int(self._offsets[-1]))
+        return [blob[s:e].decode("utf-8") for s, e in zip(self._offsets[:-1], self._offsets[1:])]
+
+
+def _write_at(path, offset, data):
+    """Writes `data` at `offset` and cuts off anything a crashed append left behind"""
+    mode = "r+b" if os.path.exists(path) else "wb"
+    with open(path, mode) as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(data)
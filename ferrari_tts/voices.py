@@ -0,0 +1,77 @@
+"""
+Ferrari TTS - Voice Table
+=========================
+Every Kokoro voice is a (510, 1, 256) pack: one style row (`ref_s`) per
+phoneme-count. The first export froze `voice_pack[50]` into the graph, so each
+voice cost another ~300 MB blueprint and every utterance used the row for 51
+phonemes.
+
+scripts/pack_voices.py writes all packs into one float32 file plus a small JSON
+index. Here it is memory-mapped read-only: serving N voices costs one model in
+RAM plus only the pages of the rows actually used, and switching voice is just
+a different row - no session reload.
+"""
+
+import json
+
+import numpy as np
+
+from ferrari_tts.paths import MODELS_DIR
+
+VOICES_PATH = MODELS_DIR / "voices.f32"
+VOICES_INDEX_PATH = MODELS_DIR / "voices.json"
+
+STYLE_DIM = 256
+DEFAULT_VOICE = "af_heart"
+
+
+def style_row(phoneme_count, rows):
+    """Kokoro picks pack[len(phonemes) - 1]; clamp to the pack"""
+    return min(max(int(phoneme_count), 1), rows) - 1
+
+
+class VoiceTable:
+    def __init__(self, path=VOICES_PATH, index_path=VOICES_INDEX_PATH):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.names = list(index["voices"])
+        self.rows = int(index["rows"])
+        self.dim = int(index.get("dim", STYLE_DIM))
+        self.slots = {name: slot for slot, name in enumerate(self.names)}
+        self.table = np.memmap(path, dtype=np.float32, mode="r", shape=(len(self.names), self.rows, self.dim))
+
+    def __contains__(self, voice):
+        return voice in self.slots
+
+    def row_for(self, phoneme_count):
+        return style_row(phoneme_count, self.rows)
+
+    def style(self, voice, phoneme_count):
+        """(1, 256) float32 `ref_s` for one segment"""
+        slot = self.slots.get(voice)
+        if slot is None:
+            raise KeyError(f"Unknown voice '{voice}'. Packed voices: {', '.join(self.names)}")
+        return np.array(self.table[slot, self.row_for(phoneme_count)])[np.newaxis, :]
+
+    def styles(self, voices, phoneme_counts):
+        """(B, 256) `ref_s` for a batch; one fancy-index gather from the map"""
+        slots = np.array([self.slots[v] for v in voices], dtype=np.int64)
+        rows = np.minimum(np.maximum(np.asarray(phoneme_counts, dtype=np.int64), 1), self.rows) - 1
+        return np.ascontiguousarray(self.table[slots, rows])
+
+
+def write_voice_table(packs, path=VOICES_PATH, index_path=VOICES_INDEX_PATH):
+    """packs: {name: array (rows, 1, 256) or (rows, 256)} -> one mmap-able table"""
+    names = sorted(packs)
+    arrays = [np.asarray(packs[name], dtype=np.float32).reshape(-1, STYLE_DIM) for name in names]
+    rows = arrays[0].shape[0]
+    if any(a.shape[0] != rows for a in arrays):
+        raise ValueError("All voice packs must have the same number of rows")
+    table = np.memmap(path, dtype=np.float32, mode="w+", shape=(len(names), rows, STYLE_DIM))
+    for slot, array in enumerate(arrays):
+        table[slot] = array
+    table.flush()
+    del table
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump({"voices": names, "rows": rows, "dim": STYLE_DIM}, f, indent=2)
+    return names
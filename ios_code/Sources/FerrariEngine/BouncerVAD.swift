@@ -24,6 +24,10 @@ class BouncerVAD {
         
         let options = try ORTSessionOptions()
         // Use default CPU execution (CoreML provider requires specific configuration)
+        // A 512-sample frame is tiny: one thread, no spinning keeps the always-on Bouncer cheap.
+        try options.setIntraOpNumThreads(1)
+        try options.setGraphOptimizationLevel(.all)
+        try options.addConfigEntry(withKey: "session.intra_op.allow_spinning", value: "0")
         
         self.session = try ORTSession(env: env, modelPath: modelPath, sessionOptions: options)
     }
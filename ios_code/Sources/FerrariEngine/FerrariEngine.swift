@@ -24,6 +24,11 @@ class FerrariEngine {
         
         let options = try ORTSessionOptions()
         // Use default execution providers (CPU) - CoreML can be added later with proper configuration
+        // Explicit threading (mirrors ferrari_tts/session.py): the default grabs every core and
+        // busy-spins between runs, fighting the audio thread and the Bouncer for CPU.
+        try options.setIntraOpNumThreads(2)
+        try options.setGraphOptimizationLevel(.all)
+        try options.addConfigEntry(withKey: "session.intra_op.allow_spinning", value: "0")
         
         self.session = try ORTSession(env: env, modelPath: modelPath, sessionOptions: options)
         print("🏎️ Ferrari Engine ignited.")
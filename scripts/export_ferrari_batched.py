@@ -0,0 +1,168 @@
+"""
+Ferrari TTS - Phase 2: Batched ONNX Export
+==========================================
+Same Kokoro weights, but with a dynamic batch axis.
+
+The original export builds its text_mask from `input_ids.shape[1]`, so every
+row is assumed to be full length and only one segment fits in a session.run.
+This variant takes explicit `input_lengths`, masks the padding inside the
+graph (attention, durations, alignment) and returns `audio_lengths`, so the
+runtime (ferrari_tts/batching.py) can crop every row back to its own segment.
+`ref_s` is a per-row input as well, so one batch can mix voices and lengths
+(rows come from the voice table, see scripts/pack_voices.py).
+
+Kokoro's own encoders pack their LSTMs by length; the duration LSTM and the
+F0/N `shared` LSTM are run packed here too, otherwise the backward direction
+would start inside the padding and a row's prosody would depend on how much
+padding it got. After the export the graph is checked: every test segment
+padded (in a batch, and alone in its length bucket) must render the same
+audio as the segment alone. SineGen's random phase and noise make even two
+unpadded runs differ, so "the same" means no further off than an unpadded
+rerun (ferrari_tts.batching.padding_parity). Only then is
+`ferrari_padding_parity` written into the model metadata, which is what lets
+the runtime pad to length buckets and batch mixed lengths.
+"""
+
+import sys
+import onnx
+import torch
+from kokoro.model import KModel
+from pathlib import Path
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.batching import PARITY_KEY, SAMPLES_PER_FRAME, padding_parity
+from ferrari_tts.paths import BATCHED_ONNX_PATH, MODELS_DIR, kokoro_snapshot_dir
+from ferrari_tts.session import create_session
+from ferrari_tts.tokenizer import PhonemeTokenizer
+from ferrari_tts.voices import style_row
+
+MODELS_DIR.mkdir(exist_ok=True)
+
+SNAPSHOT_DIR = kokoro_snapshot_dir()
+MODEL_PATH = SNAPSHOT_DIR / "kokoro-v1_0.pth"
+CONFIG_PATH = SNAPSHOT_DIR / "config.json"
+VOICE_PATH = SNAPSHOT_DIR / "voices/af_heart.pt"
+
+print("Loading Model...")
+model = KModel(config=str(CONFIG_PATH), model=str(MODEL_PATH), disable_complex=True)
+model.eval()
+
+print("Loading Voice Pack...")
+voice_pack = torch.load(VOICE_PATH, map_location='cpu')
+
+def align(pred_dur):
+    """(B, L) durations -> (B, L, T) hard alignment; frames past a row's end stay empty"""
+    ends = pred_dur.cumsum(dim=-1)
+    starts = ends - pred_dur
+    # Keep the frame count a tensor, so the exported graph stays dynamic
+    frames = torch.arange(ends[:, -1].max(), device=pred_dur.device)
+    inside = (frames[None, None, :] >= starts[:, :, None]) & (frames[None, None, :] < ends[:, :, None])
+    return inside.float(), ends[:, -1]
+
+def packed_lstm(lstm, x, lengths):
+    """batch_first LSTM over (B, T, C) that stops at every row's length (zeros beyond)"""
+    packed = pack_padded_sequence(x, lengths, batch_first=True, enforce_sorted=False)
+    lstm.flatten_parameters()
+    out, _ = lstm(packed)
+    out, _ = pad_packed_sequence(out, batch_first=True)
+    # Same trick as Kokoro's TextEncoder: back to the full padded width
+    out_pad = torch.zeros([out.shape[0], x.shape[1], out.shape[-1]], device=x.device)
+    out_pad[:, :out.shape[1], :] = out
+    return out_pad
+
+def predict_f0n(predictor, en, s, frames):
+    """ProsodyPredictor.F0Ntrain with the shared LSTM packed by frame count"""
+    x = packed_lstm(predictor.shared, en.transpose(-1, -2), frames).transpose(-1, -2)
+    F0 = x
+    for block in predictor.F0:
+        F0 = block(F0, s)
+    F0 = predictor.F0_proj(F0)
+    N = x
+    for block in predictor.N:
+        N = block(N, s)
+    N = predictor.N_proj(N)
+    return F0.squeeze(1), N.squeeze(1)
+
+class FerrariBatchedModel(torch.nn.Module):
+    def __init__(self, kmodel):
+        super().__init__()
+        self.kmodel = kmodel
+
+    def forward(self, input_ids, input_lengths, ref_s, speed):
+        # input_ids: (B, L) PAD-padded, input_lengths: (B,), ref_s: (B, 256), speed: (1,)
+        seq = input_ids.shape[1]
+        positions = torch.arange(seq, device=input_ids.device)
+        text_mask = positions[None, :] >= input_lengths[:, None]  # True on padding
+        s = ref_s[:, 128:]
+
+        bert_dur = self.kmodel.bert(input_ids, attention_mask=(~text_mask).int())
+        d_en = self.kmodel.bert_encoder(bert_dur).transpose(-1, -2)
+        d = self.kmodel.predictor.text_encoder(d_en, s, input_lengths, text_mask)
+
+        x = packed_lstm(self.kmodel.predictor.lstm, d, input_lengths)
+        duration = torch.sigmoid(self.kmodel.predictor.duration_proj(x)).sum(axis=-1) / speed
+        # Padding gets zero frames, so it never reaches the decoder
+        pred_dur = torch.round(duration).clamp(min=1).long() * (~text_mask).long()
+        pred_aln_trg, frames = align(pred_dur)
+
+        en = d.transpose(-1, -2) @ pred_aln_trg
+        F0_pred, N_pred = predict_f0n(self.kmodel.predictor, en, s, frames)
+        t_en = self.kmodel.text_encoder(input_ids, input_lengths, text_mask)
+        asr = t_en @ pred_aln_trg
+        # Decoder takes the acoustic half of the style, the predictor the prosodic half
+        audio = self.kmodel.decoder(asr, F0_pred, N_pred, ref_s[:, :128]).squeeze(1)
+        return audio, frames * SAMPLES_PER_FRAME
+
+batched = FerrariBatchedModel(model)
+batched.eval()
+
+dummy_ids = torch.tensor([[0, 50, 47, 54, 54, 57, 0], [0, 50, 57, 0, 0, 0, 0]], dtype=torch.long)
+dummy_lengths = torch.tensor([7, 4], dtype=torch.long)
+dummy_ref_s = torch.cat([voice_pack[4], voice_pack[1]])
+dummy_speed = torch.tensor([1.0], dtype=torch.float32)
+
+print("\nExporting batched model to ONNX...")
+with torch.no_grad():
+    torch.onnx.export(
+        batched,
+        (dummy_ids, dummy_lengths, dummy_ref_s, dummy_speed),
+        str(BATCHED_ONNX_PATH),
+        input_names=["input_ids", "input_lengths", "ref_s", "speed"],
+        output_names=["audio", "audio_lengths"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "seq"},
+            "input_lengths": {0: "batch"},
+            "ref_s": {0: "batch"},
+            "audio": {0: "batch", 1: "samples"},
+            "audio_lengths": {0: "batch"}
+        },
+        opset_version=15,
+        do_constant_folding=True
+    )
+print(f"✅ Batched blueprint saved at: {BATCHED_ONNX_PATH}")
+
+# --- PARITY CHECK: padded rows must sound exactly like the row alone ---
+print("\nChecking batched vs single output...")
+tokenizer = PhonemeTokenizer.from_config(CONFIG_PATH)
+parity_phonemes = [
+    "həlˈoʊ.",
+    "ðə ʃˈɔɹtkʌt fɔɹ ði ˈɛkstɹud kəmˈænd ɪz ðə ˈi kˈi.",
+    "mˈeɪt kənstɹˈeɪnts ɑɹ jˈuzd tu əlˈaɪn pˈɑɹts ɪn ən əsˈɛmbli, ɪnʃˈʊɹɪŋ zˈiɹoʊ dɪɡɹˈi fɹˈidəm.",
+]
+parity_ids = [tokenizer.encode(p) for p in parity_phonemes]
+# ref_s row by phoneme count (BOS/EOS are not phonemes), exactly as the voice table picks it at runtime
+parity_styles = torch.cat([voice_pack[style_row(len(ids) - 2, len(voice_pack))] for ids in parity_ids]).numpy()
+report = padding_parity(create_session(BATCHED_ONNX_PATH), parity_ids, parity_styles)
+print(f"Worst row: LSD {report['worst_lsd_db']} dB (rerun floor {report['noise_floor_lsd_db']} dB), "
+      f"SNR {report['worst_snr_db']} dB, length delta {report['max_length_delta']} samples")
+
+blueprint = onnx.load(str(BATCHED_ONNX_PATH))
+del blueprint.metadata_props[:]
+if report["passed"]:
+    onnx.helper.set_model_props(blueprint, {PARITY_KEY: "1"})
+    print("✅ Padding parity proven: the runtime may pad to length buckets")
+else:
+    print("⚠️ Padded rows differ from single renders: the runtime will not pad this blueprint")
+onnx.save(blueprint, str(BATCHED_ONNX_PATH))
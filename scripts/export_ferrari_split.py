@@ -2,11 +2,23 @@
 Ferrari TTS - Phase 2: CoreML Conversion (Split Model V3)
 =========================================================
 Simplifying the graph even further to bypass Torch 2.10 exporter bugs.
+
+Three graphs, run by ferrari_tts/split_engine.py:
+1. encoder.onnx  input_ids, speed, ref_s -> d, t_en, duration   (once per clause)
+2. prosody.onnx  en, ref_s -> F0, N                             (once per clause)
+3. decoder.onnx  asr, F0, N, ref_s -> audio                     (per frame window)
+The duration -> alignment expansion between 1 and 2 is done in NumPy.
+
+decoder_fixed_noise.onnx is the same decoder with SineGen's random harmonic
+phase and noise exported as zeros. It is never served; it makes renders
+repeatable, so `python -m ferrari_tts.split_engine` can measure what the
+windowing itself costs.
 """
 
 import torch
 import numpy as np
 from kokoro.model import KModel
+from contextlib import contextmanager
 from pathlib import Path
 import coremltools as ct
 import onnx
@@ -58,7 +70,7 @@ class FerrariEncoder(torch.nn.Module):
 encoder = FerrariEncoder(model)
 dummy_ids = torch.tensor([[0, 50, 47, 54, 54, 57, 0]], dtype=torch.long)
 dummy_speed = torch.tensor([1.0], dtype=torch.float32)
-dummy_ref_s = voice_pack[50].unsqueeze(0)
+dummy_ref_s = voice_pack[50]  # already (1, 256)
 
 print("Exporting Encoder...")
 # Use the old export path explicitly if possible
@@ -71,3 +83,70 @@ torch.onnx.export(
     opset_version=15
 )
 print("SUCCESS: Encoder exported to ONNX.")
+
+class FerrariProsody(torch.nn.Module):
+    def __init__(self, kmodel):
+        super().__init__()
+        self.kmodel = kmodel
+
+    def forward(self, en, ref_s):
+        # en: (1, C, T) aligned duration features, ref_s: (1, 256)
+        return self.kmodel.predictor.F0Ntrain(en, ref_s[:, 128:])
+
+class FerrariDecoder(torch.nn.Module):
+    def __init__(self, kmodel):
+        super().__init__()
+        self.kmodel = kmodel
+
+    def forward(self, asr, F0, N, ref_s):
+        # asr: (1, 512, W) frame window, F0/N: (1, 2W), ref_s: (1, 256)
+        return self.kmodel.decoder(asr, F0, N, ref_s[:, :128]).squeeze(1)
+
+# Trace shapes with a real alignment of the dummy sentence
+with torch.no_grad():
+    d, t_en, duration = encoder(dummy_ids, dummy_speed, dummy_ref_s)
+    pred_dur = torch.round(duration).clamp(min=1).long().squeeze(0)
+    en = d.transpose(-1, -2).repeat_interleave(pred_dur, dim=-1)
+    asr = t_en.repeat_interleave(pred_dur, dim=-1)
+    F0, N = FerrariProsody(model)(en, dummy_ref_s)
+
+print("Exporting Prosody...")
+torch.onnx.export(
+    FerrariProsody(model), (en, dummy_ref_s), str(MODELS_DIR / "prosody.onnx"),
+    input_names=["en", "ref_s"],
+    output_names=["F0", "N"],
+    dynamic_axes={"en": {2: "frames"}, "F0": {1: "frames2"}, "N": {1: "frames2"}},
+    opset_version=15
+)
+print("SUCCESS: Prosody exported to ONNX.")
+
+print("Exporting Decoder...")
+torch.onnx.export(
+    FerrariDecoder(model), (asr, F0, N, dummy_ref_s), str(MODELS_DIR / "decoder.onnx"),
+    input_names=["asr", "F0", "N", "ref_s"],
+    output_names=["audio"],
+    dynamic_axes={"asr": {2: "frames"}, "F0": {1: "frames2"}, "N": {1: "frames2"}, "audio": {1: "samples"}},
+    opset_version=15
+)
+print("SUCCESS: Decoder exported to ONNX.")
+
+@contextmanager
+def fixed_noise():
+    """SineGen / SourceModuleHnNSF draw with torch.rand and torch.randn_like: trace zeros instead"""
+    rand, randn_like = torch.rand, torch.randn_like
+    torch.rand, torch.randn_like = torch.zeros, torch.zeros_like
+    try:
+        yield
+    finally:
+        torch.rand, torch.randn_like = rand, randn_like
+
+print("Exporting fixed-noise Decoder (parity checks only)...")
+with torch.no_grad(), fixed_noise():
+    torch.onnx.export(
+        FerrariDecoder(model), (asr, F0, N, dummy_ref_s), str(MODELS_DIR / "decoder_fixed_noise.onnx"),
+        input_names=["asr", "F0", "N", "ref_s"],
+        output_names=["audio"],
+        dynamic_axes={"asr": {2: "frames"}, "F0": {1: "frames2"}, "N": {1: "frames2"}, "audio": {1: "samples"}},
+        opset_version=15
+    )
+print("SUCCESS: Fixed-noise Decoder exported to ONNX.")
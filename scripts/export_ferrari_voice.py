@@ -0,0 +1,65 @@
+"""
+Ferrari TTS - Phase 2: Voice-as-Input Export
+============================================
+Same graph as export_ferrari.py, but `ref_s` is an INPUT instead of a frozen
+`voice_pack[50]` buffer. One blueprint serves every voice and every
+utterance length; the runtime picks the style row from models/voices.f32
+(see scripts/pack_voices.py).
+"""
+
+import sys
+import torch
+from kokoro.model import KModel
+from pathlib import Path
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.paths import MODELS_DIR, VOICE_ONNX_PATH, kokoro_snapshot_dir
+
+MODELS_DIR.mkdir(exist_ok=True)
+
+SNAPSHOT_DIR = kokoro_snapshot_dir()
+MODEL_PATH = SNAPSHOT_DIR / "kokoro-v1_0.pth"
+CONFIG_PATH = SNAPSHOT_DIR / "config.json"
+VOICE_PATH = SNAPSHOT_DIR / "voices/af_heart.pt"
+
+print("Loading Model...")
+model = KModel(config=str(CONFIG_PATH), model=str(MODEL_PATH), disable_complex=True)
+model.eval()
+
+class FerrariVoiceModel(torch.nn.Module):
+    def __init__(self, kmodel):
+        super().__init__()
+        self.kmodel = kmodel
+
+    def forward(self, input_ids, ref_s, speed):
+        # input_ids: (1, L), ref_s: (1, 256) row picked by phoneme count, speed: (1,)
+        audio, _ = self.kmodel.forward_with_tokens(input_ids, ref_s, speed)
+        return audio
+
+ferrari = FerrariVoiceModel(model)
+ferrari.eval()
+
+# Only used to trace shapes; the real rows come from the voice table at runtime
+voice_pack = torch.load(VOICE_PATH, map_location='cpu')
+dummy_ids = torch.tensor([[0, 50, 47, 54, 54, 57, 0]], dtype=torch.long)
+dummy_ref_s = voice_pack[4]
+dummy_speed = torch.tensor([1.0], dtype=torch.float32)
+
+print("\nExporting voice-as-input model to ONNX...")
+with torch.no_grad():
+    torch.onnx.export(
+        ferrari,
+        (dummy_ids, dummy_ref_s, dummy_speed),
+        str(VOICE_ONNX_PATH),
+        input_names=["input_ids", "ref_s", "speed"],
+        output_names=["audio"],
+        dynamic_axes={
+            "input_ids": {1: "seq"},
+            "audio": {0: "samples"}
+        },
+        opset_version=15,
+        do_constant_folding=True
+    )
+print(f"✅ Voice-agnostic blueprint saved at: {VOICE_ONNX_PATH}")
+print("Next: run scripts/pack_voices.py to build the shared voice table.")
@@ -1,57 +1,250 @@
 """
-Ferrari TTS - The "Surgery" (Model Pruning)
-===========================================
-This script demonstrates the 'Hacker' moveset:
-1. Stripping the Vocabulary (Removing unused 'Tokens')
-2. Pruning the 'Brains' (Removing unused Neural Layers)
+Ferrari TTS - The "Surgery" (Model Compression)
+===============================================
+Real compression of models/ferrari_kokoro.onnx - no more simulated numbers.
 
-This turns a heavy 4GB Gemma/Llama model into a 1GB Ferrari Engine.
+Variants:
+1. dynamic-INT8  weights quantized ahead of time, activations on the fly
+2. static-INT8   weights + activations, calibrated on a local text corpus
+3. FP16          half-precision weights (I/O stays float32)
+
+For every variant (and the FP32 baseline) we measure file size, load time,
+RTF, peak RSS and the objective distance of its audio to the FP32 render.
+Each measurement runs in a fresh process so peak RSS means something.
+
+The corpus is split by line: static-INT8 calibrates on one part, every
+variant is scored on the held-out rest. Kokoro's SineGen draws fresh phase
+and noise on every run, so the FP32 baseline is rendered twice and its
+FP32-vs-FP32 distance is the floor: only what a variant adds on top of it is
+quantization loss.
+
+    python scripts/model_surgery.py [--corpus lines.txt] [--variants dynamic-int8,fp16]
 """
 
+import argparse
 import json
-import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
 from pathlib import Path
 
-print("🪚 FERRARI SURGERY: OPENING THE BRAIN")
-print("=" * 50)
-
-def strip_vocabulary(vocab_path, target_vocab_path):
-    """
-    Simulates stripping a 50k token vocabulary down to 
-    the 2k tokens needed for conversational English.
-    """
-    print("Step 1: Stripping Vocabulary...")
-    # In a real surgery, we would iterate through the embedding matrix
-    # and remove rows for 'Python', 'C++', 'Icelandic', etc.
-    original_size = 50000
-    stripped_size = 2000 # Just the 'Axioms' and common words
-    
-    reduction = (1 - (stripped_size / original_size)) * 100
-    print(f"✅ Removed 48,000 unused tokens. Size reduced by {reduction:.2f}%")
-    return stripped_size
-
-def prune_layers(total_layers, keep_layers):
-    """
-    Simulates removing the 'Lazy Layers' of the model 
-    as described in Meta's MobileLLM research.
-    """
-    print("\nStep 2: Pruning Neural Layers...")
-    removed = total_layers - len(keep_layers)
-    
-    # We keep the layers responsible for 'Prosody' and 'Logic'
-    print(f"Keeping Layers: {keep_layers}")
-    print(f"✅ Excised {removed} redundant layers of 'Reasoning' we don't need.")
-    return len(keep_layers)
-
-# Execution of the Surgery
-v_size = strip_vocabulary("dummy_vocab.json", "ferrari_vocab.json")
-l_count = prune_layers(24, [0, 1, 2, 8, 12, 18, 23])
-
-# Final Report
-print("\n" + "=" * 50)
-print("🚀 SURGERY COMPLETE: THE FERRARI IS LIGHT")
-print(f"Target Size: ~1.1 GB (Originally 4.0 GB)")
-print("Hardware Target: iPhone 12 ANE (Apple Neural Engine)")
-print("Expected Latency: <150ms First-Phrase response")
-print("=" * 50)
-print("\nNext: We map these 'Stripped' neurons to the Thalamus Logic.")
+import numpy as np
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.audio_metrics import compare
+from ferrari_tts.stats import peak_rss_mb
+from ferrari_tts.markup import SAMPLE_RATE
+from ferrari_tts.paths import MODELS_DIR, ONNX_PATH
+
+VARIANTS = ("dynamic-int8", "static-int8", "fp16")
+REPORT_PATH = MODELS_DIR / "compression_report.json"
+
+# Used when no --corpus is given: short, medium and long clauses
+DEFAULT_CORPUS = [
+    "Hello.",
+    "I am the Ferrari engine.",
+    "I am so glad we are doing this.",
+    "To extrude a sketch in SolidWorks, you must first select a closed profile.",
+    "If the extrusion fails, check for open contours or overlapping lines in your sketch.",
+    "I found something, but I don't trust the source, so let me double check it before I answer.",
+    "Mate constraints are used to align parts in an assembly, ensuring zero-degree freedom, and they keep every component where you expect it.",
+]
+
+def load_corpus(path):
+    if path is None:
+        return DEFAULT_CORPUS
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def split_corpus(lines, eval_fraction, seed=0):
+    """(calibration lines, held-out evaluation lines); both get at least one line"""
+    if len(lines) < 2:
+        raise ValueError("the corpus needs at least two lines (calibration + evaluation)")
+    order = list(range(len(lines)))
+    random.Random(seed).shuffle(order)
+    held_out = min(max(1, round(len(lines) * eval_fraction)), len(lines) - 1)
+    evaluation = sorted(order[:held_out])
+    return [lines[i] for i in sorted(order[held_out:])], [lines[i] for i in evaluation]
+
+def corpus_ids(*line_sets):
+    """G2P once in the parent; the measuring children only see token IDs (one list per line set)"""
+    from ferrari_tts.g2p import FerrariG2P
+    from ferrari_tts.phoneme_cache import open_default_cache
+    g2p = FerrariG2P(lang_code='a', cache=open_default_cache())
+    return [[ids for line in lines for ids in g2p.encode(line)] for lines in line_sets]
+
+# =============================================================================
+# VARIANTS
+# =============================================================================
+def make_dynamic_int8(src, dst, op_types):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(str(src), str(dst), weight_type=QuantType.QInt8, op_types_to_quantize=op_types)
+
+def make_static_int8(src, dst, calibration_ids):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from ferrari_tts.engine import FerrariEngine
+
+    engine = FerrariEngine(src)
+
+    class CorpusReader(CalibrationDataReader):
+        def __init__(self):
+            self.feeds = iter([engine.feeds_for(ids) for ids in calibration_ids])
+
+        def get_next(self):
+            return next(self.feeds, None)
+
+    quantize_static(
+        str(src), str(dst), CorpusReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+
+def make_fp16(src, dst):
+    import onnx
+    try:
+        from onnxconverter_common import float16
+    except ImportError:
+        raise RuntimeError("FP16 needs onnxconverter-common (pip install onnxconverter-common)") from None
+    model = float16.convert_float_to_float16(onnx.load(str(src)), keep_io_types=True)
+    onnx.save(model, str(dst))
+
+# =============================================================================
+# MEASUREMENT (runs in a child process)
+# =============================================================================
+def measure_child(model_path, ids_path, audio_path):
+    from ferrari_tts.engine import FerrariEngine
+
+    with np.load(ids_path) as data:
+        id_arrays = [data[key] for key in sorted(data.files, key=int)]
+    start = time.perf_counter()
+    engine = FerrariEngine(model_path)
+    load_s = time.perf_counter() - start
+
+    engine.synthesize_ids(id_arrays[0])  # warmup: first run plans memory
+    renders, synth_s = [], 0.0
+    for ids in id_arrays:
+        t0 = time.perf_counter()
+        renders.append(engine.synthesize_ids(ids))
+        synth_s += time.perf_counter() - t0
+    np.savez(audio_path, *renders)
+    audio_s = sum(len(r) for r in renders) / SAMPLE_RATE
+    peak = peak_rss_mb()
+    print(json.dumps({
+        "load_ms": round(load_s * 1000, 1),
+        "rtf": round(synth_s / audio_s, 4) if audio_s else None,
+        "peak_rss_mb": None if peak is None else round(peak, 1),
+    }))
+
+def measure(model_path, ids_path, workdir, label=None):
+    audio_path = Path(workdir) / f"{label or Path(model_path).stem}.npz"
+    out = subprocess.run(
+        [sys.executable, __file__, "--measure", str(model_path), str(ids_path), str(audio_path)],
+        check=True, capture_output=True, text=True,
+    )
+    metrics = json.loads(out.stdout.strip().splitlines()[-1])
+    metrics["size_mb"] = round(Path(model_path).stat().st_size / 1e6, 1)
+    with np.load(audio_path) as data:
+        renders = [data[f"arr_{i}"] for i in range(len(data.files))]
+    return metrics, renders
+
+def score(metrics, reference, renders):
+    """Adds the mean distance of `renders` to the FP32 `reference` to `metrics`"""
+    scores = [compare(ref, out) for ref, out in zip(reference, renders)]
+    metrics["lsd_db"] = round(float(np.mean([s["lsd_db"] for s in scores])), 3)
+    metrics["snr_db"] = round(float(np.mean([s["snr_db"] for s in scores])), 2)
+    metrics["max_length_delta_ms"] = max(abs(s["length_delta_ms"]) for s in scores)
+    return metrics
+
+# =============================================================================
+# MAIN
+# =============================================================================
+def run_surgery(args):
+    print("🪚 FERRARI SURGERY: COMPRESSING THE BLUEPRINT")
+    print("=" * 60)
+    source = Path(args.model)
+    if not source.exists():
+        print(f"❌ Error: {source} not found. Run export_ferrari.py first.")
+        return 1
+
+    lines = load_corpus(args.corpus)
+    calibration_lines, eval_lines = split_corpus(lines, args.eval_fraction)
+    calibration_ids, id_arrays = corpus_ids(calibration_lines, eval_lines)
+    print(f"Corpus: {len(lines)} lines -> calibration {len(calibration_lines)} lines "
+          f"({len(calibration_ids)} segments), evaluation {len(eval_lines)} held-out lines "
+          f"({len(id_arrays)} segments)")
+
+    report = {"source": str(source), "corpus_lines": len(lines), "calibration_lines": len(calibration_lines),
+              "eval_lines": len(eval_lines), "variants": {}}
+    with tempfile.TemporaryDirectory() as workdir:
+        ids_path = Path(workdir) / "ids.npz"
+        np.savez(ids_path, **{str(i): ids for i, ids in enumerate(id_arrays)})
+
+        print("\nMeasuring FP32 baseline (twice: the second run is the noise floor)...")
+        baseline, reference = measure(source, ids_path, workdir)
+        _, rerun = measure(source, ids_path, workdir, label="fp32-rerun")
+        report["variants"]["fp32"] = score(baseline, reference, rerun)
+
+        for variant in args.variants:
+            target = MODELS_DIR / f"{source.stem}.{variant}.onnx"
+            print(f"\nBuilding {variant} -> {target}")
+            try:
+                if variant == "dynamic-int8":
+                    make_dynamic_int8(source, target, args.dynamic_ops)
+                elif variant == "static-int8":
+                    make_static_int8(source, target, calibration_ids[:args.calibration_size])
+                elif variant == "fp16":
+                    make_fp16(source, target)
+                metrics, renders = measure(target, ids_path, workdir)
+            except Exception as e:
+                print(f"❌ {variant} failed: {e}")
+                report["variants"][variant] = {"error": str(e)}
+                continue
+            report["variants"][variant] = score(metrics, reference, renders)
+
+    print("\n" + "=" * 60)
+    print(f"{'variant':<14}{'size MB':>9}{'load ms':>9}{'RTF':>8}{'RSS MB':>9}{'LSD dB':>8}{'SNR dB':>8}")
+    for name, m in report["variants"].items():
+        if "error" in m:
+            print(f"{name:<14}  failed: {m['error']}")
+            continue
+        print(f"{name:<14}{m['size_mb']:>9}{m['load_ms']:>9}{m['rtf']:>8}{m['peak_rss_mb']!s:>9}"
+              f"{m.get('lsd_db', 0.0):>8}{m.get('snr_db', float('inf')):>8}")
+
+    floor = report["variants"]["fp32"]
+    print(f"\nfp32 row = FP32 vs FP32 rerun: a variant's LSD/SNR only means quantization loss "
+          f"beyond LSD {floor['lsd_db']} dB / SNR {floor['snr_db']} dB")
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report saved to {args.report}")
+    return 0
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == "--measure":
+        measure_child(*sys.argv[2:])
+        return 0
+    parser = argparse.ArgumentParser(description="Compress the Ferrari blueprint and measure the cost")
+    parser.add_argument("--model", default=str(ONNX_PATH))
+    parser.add_argument("--corpus", help="text file, one sentence per line (split into calibration + evaluation)")
+    parser.add_argument("--variants", default=",".join(VARIANTS),
+                        type=lambda s: [v for v in s.split(",") if v])
+    parser.add_argument("--calibration-size", type=int, default=64)
+    parser.add_argument("--eval-fraction", type=float, default=0.3,
+                        help="share of corpus lines held out of calibration for scoring")
+    parser.add_argument("--dynamic-ops", default="MatMul,Gemm,LSTM",
+                        type=lambda s: [v for v in s.split(",") if v],
+                        help="op types for dynamic INT8 (ConvInteger is slow on most CPUs)")
+    parser.add_argument("--report", default=str(REPORT_PATH))
+    args = parser.parse_args()
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    return run_surgery(args)
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+"""
+Ferrari TTS - Voice Packer
+==========================
+Offline step: packs EVERY Kokoro voice (all 510 length rows) into one
+memory-mapped float32 table for the voice-as-input blueprint.
+
+Output: models/voices.f32 + models/voices.json
+"""
+
+import sys
+import torch
+from pathlib import Path
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.paths import MODELS_DIR, kokoro_snapshot_dir
+from ferrari_tts.voices import VOICES_INDEX_PATH, VOICES_PATH, write_voice_table
+
+VOICES_DIR = kokoro_snapshot_dir() / "voices"
+
+print("🎙️ FERRARI VOICE PACKER")
+print("=" * 50)
+
+packs = {}
+for voice_path in sorted(VOICES_DIR.glob("*.pt")):
+    pack = torch.load(voice_path, map_location='cpu', weights_only=True)
+    packs[voice_path.stem] = pack.float().numpy()
+    print(f"  {voice_path.stem}: {tuple(pack.shape)}")
+
+if not packs:
+    print(f"❌ No voices found in {VOICES_DIR}")
+    sys.exit(1)
+
+MODELS_DIR.mkdir(exist_ok=True)
+names = write_voice_table(packs)
+print(f"\n✅ Packed {len(names)} voices into {VOICES_PATH} ({VOICES_PATH.stat().st_size / 1e6:.1f} MB on disk)")
+print(f"   Index: {VOICES_INDEX_PATH}")
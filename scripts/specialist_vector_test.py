@@ -3,44 +3,63 @@ Ferrari TTS - Specialist Vector Explorer
 ========================================
 This script demonstrates 'Local Vector Search'.
 1. It takes a 'Specialist Basis' (e.g., SolidWorks Manual text).
-2. It converts it into 'Machine-Friendly' Math (Embeddings).
-3. It performs a 'Semantic Search' to find the answer.
+2. It converts it into 'Machine-Friendly' Math (Embeddings) - once. The
+   vectors live in a memory-mapped index (ferrari_tts.vector_index) and
+   ferrari_tts.ingest only encodes passages that are new or changed since
+   the last run (and deletes the ones that are gone).
+3. It performs a 'Semantic Search' to find the answer (top-k, cosine).
 """
 
-import numpy as np
-from sentence_transformers import SentenceTransformer
-import json
+import sys
+import time
+from pathlib import Path
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.ann import open_backend
+from ferrari_tts.ingest import Chunker, ManualIngestor
+from ferrari_tts.paths import CACHE_DIR
+from ferrari_tts.vector_index import DEFAULT_ENCODER, VectorIndex, load_encoder
+
 
 class FerrariSpecialist:
-    def __init__(self):
-        # This is a small 30MB model that turns text into 'Math Neighbors'
-        # On iPhone, we use a CoreML version of this.
-        print("🔧 Loading Vector Mapping Engine...")
-        self.encoder = SentenceTransformer('all-MiniLM-L6-v2') 
-        self.knowledge_base = []
-        self.vectors = None
+    def __init__(self, index_dir=CACHE_DIR / "specialist" / "solidworks", dtype="float32", backend="exact",
+                 chunker=None, batch_size=64):
+        # Opening the index only maps files: no manual is re-encoded here
+        self.index = VectorIndex(index_dir, dtype=dtype, encoder=DEFAULT_ENCODER)
+        # "ivf" for full product manuals (ferrari_tts.ann); "exact" is plenty for a few pages
+        self.backend_name = backend
+        self.backend = open_backend(self.index, backend)
+        # One sentence per passage by default, like the manual's 'Logical Principles'
+        self.ingestor = ManualIngestor(self.index, lambda passages: self.encoder.encode(passages),
+                                       chunker or Chunker("sentence", size=1), batch_size)
+        self._encoder = None
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            # This is a small 30MB model that turns text into 'Math Neighbors'
+            # On iPhone, we use a CoreML version of this.
+            print("🔧 Loading Vector Mapping Engine...")
+            self._encoder = load_encoder()
+        return self._encoder
 
-    def learn_manual(self, text_content):
-        """Processes the manual into machine-friendly vectors"""
-        print("📖 Reading Manual and Converting to Math...")
-        # Split manual into 'Logical Principles'
-        self.knowledge_base = text_content.split('\n')
-        # This is the 'Machine Format'. It's just a matrix of numbers.
-        self.vectors = self.encoder.encode(self.knowledge_base)
-        print(f"✅ Specialist DNA Created. Matrix Shape: {self.vectors.shape}")
+    def learn_manual(self, text_content, doc="manual"):
+        """Syncs one manual: only new or edited 'Logical Principles' are converted to Math"""
+        report = self.ingestor.ingest(doc, text_content)
+        if report.encoded or report.reused or report.deleted:
+            print(f"📖 {doc}: {report.encoded} passages converted to Math, {report.reused} reused, "
+                  f"{report.kept} unchanged, {report.deleted} deleted")
+            self.backend = open_backend(self.index, self.backend_name)
+        print(f"✅ Specialist DNA: {self.index.live} passages x {self.index.dim} dims ({self.index.dtype})")
 
-    def ask(self, user_query):
-        """The 'Local Vector Search' logic"""
+    def ask(self, user_query, k=1):
+        """The 'Local Vector Search' logic: best k passages with their cosine scores"""
         print(f"\nSearching for: '{user_query}'...")
-        # 1. Turn the query into math
-        query_vector = self.encoder.encode([user_query])
-        
-        # 2. 'Mathematical Proximity' (Find the closest logic in the manual)
-        # Instead of searching words, we calculate the 'Distance' between ideas
-        scores = np.dot(self.vectors, query_vector.T).flatten()
-        best_index = np.argmax(scores)
-        
-        return self.knowledge_base[best_index]
+        ids, scores = self.backend.search(self.encoder.encode([user_query]), k=k)
+        # The IVF backend pads with id -1 when its cells hold fewer than k passages
+        return [(self.index.passage(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+
 
 # --- THE TEST ---
 manual_txt = """
@@ -50,16 +69,18 @@ If the extrusion fails, check for open contours or overlapping lines in your ske
 Mate constraints are used to align parts in an assembly, ensuring zero-degree freedom.
 """
 
-specialist = FerrariSpecialist()
-specialist.learn_manual(manual_txt)
-
-# Test the independence
-answer = specialist.ask("What do I do if my extrusion doesn't work?")
-print(f"🤖 Specialist Answer: {answer}")
+if __name__ == "__main__":
+    start = time.perf_counter()
+    specialist = FerrariSpecialist()
+    print(f"⏱️ Index opened in {(time.perf_counter() - start) * 1000:.2f} ms")
+    specialist.learn_manual(manual_txt, doc="solidworks")
 
-answer2 = specialist.ask("How do I put parts together?")
-print(f"🤖 Specialist Answer: {answer2}")
+    # Test the independence
+    for question in ("What do I do if my extrusion doesn't work?", "How do I put parts together?"):
+        start = time.perf_counter()
+        (answer, score), = specialist.ask(question)
+        print(f"🤖 Specialist Answer ({score:.2f}, {(time.perf_counter() - start) * 1000:.1f} ms): {answer}")
 
-print("\n" + "=" * 50)
-print("This logic is 100% OFFLINE. It doesn't need Gemini.")
-print("The 'Answer' is then fed into our 'Solid' Vocal Engine.")
+    print("\n" + "=" * 50)
+    print("This logic is 100% OFFLINE. It doesn't need Gemini.")
+    print("The 'Answer' is then fed into our 'Solid' Vocal Engine.")
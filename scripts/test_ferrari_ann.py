@@ -0,0 +1,102 @@
+"""
+Ferrari TTS - Specialist ANN Test Bench
+=======================================
+Exact vs IVF retrieval on a generated corpus shaped like real manuals
+(passages clustered around topics, questions near one passage). Reports
+recall@k against exact search, QPS, p50/p99 latency and index memory for
+every --nprobe setting.
+
+    python scripts/test_ferrari_ann.py --passages 100000 --nprobe 1 4 8 16 32
+    python scripts/test_ferrari_ann.py --dtype int8
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.ann import IVFIndex
+from ferrari_tts.stats import peak_rss_mb, percentile
+from ferrari_tts.vector_index import VectorIndex, normalize
+
+def generate_corpus(passages, dim, topics, seed=0):
+    """Unit vectors around `topics` random centres (MiniLM is 384-d)"""
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((topics, dim)))
+    vectors = np.empty((passages, dim), dtype=np.float32)
+    for start in range(0, passages, 65536):
+        end = min(passages, start + 65536)
+        topic = rng.integers(0, topics, end - start)
+        vectors[start:end] = centres[topic] + 0.6 / np.sqrt(dim) * rng.standard_normal((end - start, dim))
+    return normalize(vectors)
+
+def generate_queries(corpus, count, seed=1):
+    """Paraphrase-like questions: a stored passage plus noise"""
+    rng = np.random.default_rng(seed)
+    picks = corpus[rng.integers(0, len(corpus), count)]
+    return normalize(picks + 0.4 / np.sqrt(corpus.shape[1]) * rng.standard_normal(picks.shape))
+
+def time_queries(search, queries, k):
+    """One query at a time, like the voice bridge asks; returns (ids, per-query seconds)"""
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        found, _ = search(query[np.newaxis], k)
+        latencies.append(time.perf_counter() - start)
+        ids.append(found[0])
+    return ids, latencies
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+def report(label, latencies, recall, nbytes):
+    total = sum(latencies)
+    print(f"{label:<14} recall {recall:6.3f} | QPS {len(latencies) / total:8.0f} | "
+          f"p50 {percentile(latencies, 50) * 1000:6.3f} ms | p99 {percentile(latencies, 99) * 1000:6.3f} ms | "
+          f"{nbytes / 1024 / 1024:7.1f} MB")
+
+def run_test():
+    parser = argparse.ArgumentParser(description="Recall / QPS / memory of the specialist ANN backend")
+    parser.add_argument("--passages", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=("float32", "int8"))
+    parser.add_argument("--nlist", type=int, default=None, help="IVF cells (default sqrt(passages))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print("🔎 FERRARI SPECIALIST ANN TEST BENCH")
+    print("=" * 60)
+    corpus = generate_corpus(args.passages, args.dim, args.topics)
+    queries = generate_queries(corpus, args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = VectorIndex(tmp, dtype=args.dtype)
+        start = time.perf_counter()
+        index.append(corpus, (f"passage {i}" for i in range(len(corpus))))
+        print(f"📦 {len(index)} passages x {args.dim} ({args.dtype}) indexed in {time.perf_counter() - start:.2f}s")
+        source_bytes = index.rows()[0].nbytes
+
+        start = time.perf_counter()
+        ivf = IVFIndex(index).build(args.nlist)
+        print(f"🧮 IVF with {ivf.nlist} cells built in {time.perf_counter() - start:.2f}s\n")
+
+        truth, latencies = time_queries(index.search, queries, args.k)
+        report("exact", latencies, 1.0, source_bytes)
+        for nprobe in args.nprobe:
+            found, latencies = time_queries(lambda q, k: ivf.search(q, k, nprobe=nprobe), queries, args.k)
+            report(f"ivf nprobe={nprobe}", latencies, recall_at_k(found, truth), ivf.nbytes())
+
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"\n📈 Peak RSS {peak:.0f} MB (IVF MB = cells + reordered copy of the rows)")
+
+if __name__ == "__main__":
+    run_test()
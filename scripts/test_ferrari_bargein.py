@@ -0,0 +1,174 @@
+"""
+Ferrari TTS - Barge-In Test Bench (Full Duplex)
+===============================================
+Ferrari talks, the user interrupts. A mic WAV is replayed in real time
+through the streaming Bouncer (ferrari_tts.vad) while the engine streams a
+long answer into a simulated player that keeps --lookahead seconds queued
+(like AVAudioPlayerNode). On the first speech-start event the player is
+flushed and the CancelToken fires.
+
+Reported per mic file, with and without cancellation:
+- detect:   speech onset in the mic file -> VAD start event
+- output:   speech onset -> player stopped (what the user hears)
+- abandon:  speech onset -> synthesis finished/abandoned (CPU freed)
+- calls / inference time spent after the barge-in
+
+    python scripts/test_ferrari_bargein.py mic_interrupt.wav [more.wav ...] --barge-at 1.5
+"""
+
+import argparse
+import sys
+import threading
+import time
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.engine import CancelToken, FerrariEngine, StreamStats
+from ferrari_tts.markup import SAMPLE_RATE
+from ferrari_tts.paths import ONNX_PATH
+from ferrari_tts.vad import VAD_SAMPLE_RATE, StreamingVAD
+
+ANSWER = (
+    "To extrude a sketch in SolidWorks, you must first select a closed profile. "
+    "If the extrusion fails, check for open contours or overlapping lines in your sketch. "
+    "Mate constraints are used to align parts in an assembly, ensuring zero-degree freedom. "
+    "When a rebuild error shows up, look for broken references in the feature tree. "
+    "Parent sketches that were deleted or edited are the usual suspects."
+)
+MIC_PIECE = VAD_SAMPLE_RATE // 50  # 20 ms microphone callbacks
+
+def load_mic(path):
+    audio, rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if rate != VAD_SAMPLE_RATE:
+        positions = np.arange(0, len(audio), rate / VAD_SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
+
+def speech_onset(audio, threshold_db=-35.0):
+    """Ground truth for the latency numbers: first 10 ms frame louder than threshold_db"""
+    hop = VAD_SAMPLE_RATE // 100
+    frames = audio[:len(audio) // hop * hop].reshape(-1, hop)
+    rms_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+    loud = np.flatnonzero(rms_db > threshold_db)
+    return float(loud[0] * hop / VAD_SAMPLE_RATE) if len(loud) else None
+
+class Player:
+    """Playback clock: pushed audio plays at 24 kHz from the first push on"""
+    def __init__(self):
+        self.started = None
+        self.queued = 0
+        self.stopped_at = None
+        self.dropped_s = 0.0
+
+    def played(self):
+        if self.started is None:
+            return 0
+        end = self.stopped_at or time.perf_counter()
+        return min(self.queued, int((end - self.started) * SAMPLE_RATE))
+
+    def ahead_s(self):
+        return (self.queued - self.played()) / SAMPLE_RATE
+
+    def push(self, samples):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.queued += samples
+
+    def stop(self):
+        self.stopped_at = time.perf_counter()
+        self.dropped_s = (self.queued - self.played()) / SAMPLE_RATE
+
+def sleep_until(deadline):
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+def run_once(engine, text, mic, onset_s, barge_at, lookahead, use_cancel):
+    token = CancelToken()
+    stats = StreamStats()
+    player = Player()
+    done = {}
+
+    def speak():
+        try:
+            for chunk in engine.stream(text, stats=stats, cancel=token if use_cancel else None):
+                if player.stopped_at is not None:
+                    continue  # without cancellation the answer is still rendered, for nobody
+                player.push(len(chunk))
+                while player.stopped_at is None and player.ahead_s() > lookahead:
+                    time.sleep(0.002)
+        except Exception as exc:
+            done["error"] = exc
+        finally:
+            done["at"] = time.perf_counter()
+
+    tts = threading.Thread(target=speak)
+    tts.start()
+    while player.started is None and tts.is_alive():
+        time.sleep(0.001)
+
+    vad = StreamingVAD()
+    mic_start = (player.started or time.perf_counter()) + barge_at
+    detected = None
+    for offset in range(0, len(mic), MIC_PIECE):
+        # A mic callback only has its samples once they were spoken
+        sleep_until(mic_start + (offset + MIC_PIECE) / VAD_SAMPLE_RATE)
+        if any(event.kind == "start" for event in vad.feed(mic[offset:offset + MIC_PIECE])):
+            detected = time.perf_counter()
+            player.stop()
+            if use_cancel:
+                token.cancel()
+            break
+    tts.join()
+
+    if "error" in done:
+        # Surface the engine's failure here, not as a KeyError from the thread
+        raise done["error"]
+    if detected is None:
+        return None
+    onset = mic_start + onset_s
+    return {
+        "detect_ms": (detected - onset) * 1000,
+        "output_ms": (player.stopped_at - onset) * 1000,
+        "abandon_ms": (done["at"] - onset) * 1000,
+        "busy_after_ms": max(0.0, done["at"] - detected) * 1000,
+        "model_calls": stats.model_calls,
+        "dropped_s": player.dropped_s,
+    }
+
+def run_test():
+    parser = argparse.ArgumentParser(description="Barge-in latency and wasted-compute harness")
+    parser.add_argument("mic", nargs="+", help="WAV files with the user's interruption")
+    parser.add_argument("--model", default=str(ONNX_PATH))
+    parser.add_argument("--text", default=ANSWER)
+    parser.add_argument("--barge-at", type=float, default=1.5, help="seconds of answer before the mic starts")
+    parser.add_argument("--lookahead", type=float, default=1.0, help="seconds of audio the player keeps queued")
+    args = parser.parse_args()
+
+    print("🏎️ FERRARI BARGE-IN TEST BENCH (Full Duplex)")
+    print("=" * 60)
+    engine = FerrariEngine(args.model)
+    engine.render("Warm up.")
+
+    for path in args.mic:
+        mic = load_mic(path)
+        onset_s = speech_onset(mic)
+        if onset_s is None:
+            print(f"\n⚠️ {path}: no speech found, skipped")
+            continue
+        print(f"\n🎙️ {path} (speech at {onset_s:.2f}s)")
+        for label, use_cancel in (("no cancel", False), ("cancel", True)):
+            result = run_once(engine, args.text, mic, onset_s, args.barge_at, args.lookahead, use_cancel)
+            if result is None:
+                print(f"  {label:<10} ❌ the Bouncer never fired")
+                continue
+            print(f"  {label:<10} detect {result['detect_ms']:6.0f} ms | output stop {result['output_ms']:6.0f} ms | "
+                  f"abandon {result['abandon_ms']:6.0f} ms | inference after barge-in {result['busy_after_ms']:6.0f} ms "
+                  f"| {result['model_calls']} calls | {result['dropped_s']:.2f}s flushed")
+
+if __name__ == "__main__":
+    run_test()
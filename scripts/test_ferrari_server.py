@@ -0,0 +1,82 @@
+"""
+Ferrari TTS - Server Load Test
+==============================
+Fires N concurrent rich-text requests at a running ferrari_tts.server and
+reports per-request time-to-first-byte, total time and rejections.
+
+    python -m ferrari_tts.server &
+    python scripts/test_ferrari_server.py --clients 8
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+
+TEST_INPUT = "[warm] Hello. [pause:0.5] I mean... [soft] I am so glad we are doing this."
+
+def one_request(host, port, text, results):
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    start = time.perf_counter()
+    conn.request("POST", "/synthesize", body=json.dumps({"text": text}),
+                 headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    if response.status != 200:
+        results.append({"status": response.status})
+        conn.close()
+        return
+    first, received = None, 0
+    while True:
+        data = response.read1(65536)
+        if not data:
+            break
+        if first is None:
+            first = time.perf_counter() - start
+        received += len(data)
+    rate = int(response.getheader("X-Sample-Rate", "24000"))
+    results.append({
+        "status": 200,
+        "ttfb_ms": first * 1000 if first is not None else None,
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "audio_s": received / 4 / rate,
+    })
+    conn.close()
+
+def run_test():
+    parser = argparse.ArgumentParser(description="Load test for ferrari_tts.server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--text", default=TEST_INPUT)
+    args = parser.parse_args()
+
+    print(f"🏎️ FERRARI SERVER LOAD TEST ({args.clients} clients)")
+    print("=" * 50)
+    results = []
+    threads = [threading.Thread(target=one_request, args=(args.host, args.port, args.text, results))
+               for _ in range(args.clients)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+
+    ok = [r for r in results if r["status"] == 200]
+    rejected = len(results) - len(ok)
+    if not ok:
+        print(f"❌ No request succeeded ({rejected} rejected)")
+        return
+    ttfb = sorted(r["ttfb_ms"] for r in ok if r["ttfb_ms"] is not None)
+    print(f"  Served: {len(ok)}   Rejected: {rejected}   Wall: {wall * 1000:.0f} ms")
+    print(f"  TTFB p50: {statistics.median(ttfb):.0f} ms   max: {ttfb[-1]:.0f} ms")
+    print(f"  Audio/s of wall time: {sum(r['audio_s'] for r in ok) / wall:.2f}")
+
+    with http.client.HTTPConnection(args.host, args.port, timeout=10) as conn:
+        conn.request("GET", "/health")
+        print(f"\n✅ Server health: {conn.getresponse().read().decode()}")
+
+if __name__ == "__main__":
+    run_test()
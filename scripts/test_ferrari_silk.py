@@ -6,103 +6,68 @@ Using Cosine Windows and Internal Model Padding.
 """
 
 import os
-import re
-import numpy as np
-import onnxruntime as ort
-from kokoro import KPipeline
+import sys
 import soundfile as sf
 from pathlib import Path
 
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.dsp import fade_in, fade_out, ms_to_samples
+from ferrari_tts.g2p import FerrariG2P
+from ferrari_tts.assembly import AudioBuffer, estimate_samples
+from ferrari_tts.markup import Silence, compile_markup, events
+from ferrari_tts.phoneme_cache import open_default_cache
+from ferrari_tts.session import create_session
+from ferrari_tts.tokenizer import SPACE_ID
+
 # Paths
 ONNX_PATH = Path("models/ferrari_kokoro.onnx")
 OUTPUT_WAV = Path("ferrari_silk_test.wav")
 
-VOCAB = {
-    ";": 1, ":": 2, ",": 3, ".": 4, "!": 5, "?": 6, "—": 9, "…": 10, "\"": 11,
-    "(": 12, ")": 13, "“": 14, "”": 15, " ": 16, "\u0303": 17, "ʣ": 18, 
-    "ʥ": 19, "ʦ": 20, "ʨ": 21, "ᵝ": 22, "\uAB67": 23, "A": 24, "I": 25, 
-    "O": 31, "Q": 33, "S": 35, "T": 36, "W": 39, "Y": 41, "ᵊ": 42, "a": 43, 
-    "b": 44, "c": 45, "d": 46, "e": 47, "f": 48, "h": 50, "i": 51, "j": 52, 
-    "k": 53, "l": 54, "m": 55, "n": 56, "o": 57, "p": 58, "q": 59, "r": 60, 
-    "s": 61, "t": 62, "u": 63, "v": 64, "w": 65, "x": 66, "y": 67, "z": 68, 
-    "ɑ": 69, "ɐ": 70, "ɒ": 71, "æ": 72, "β": 75, "ɔ": 76, "ɕ": 77, "ç": 78, 
-    "ɖ": 80, "ð": 81, "ʤ": 82, "ə": 83, "ɚ": 85, "ɛ": 86, "ɜ": 87, "ɟ": 90, 
-    "ɡ": 92, "ɥ": 99, "ɨ": 101, "ɪ": 102, "ʝ": 103, "ɯ": 110, "ɰ": 111, 
-    "ŋ": 112, "ɳ": 113, "ɲ": 114, "ɴ": 115, "ø": 116, "ɸ": 118, "θ": 119, 
-    "œ": 120, "ɹ": 123, "ɾ": 125, "ɻ": 126, "ʁ": 128, "ɽ": 129, "ʂ": 130, 
-    "ʃ": 131, "ʈ": 132, "ʧ": 133, "ʊ": 135, "ʋ": 136, "ʌ": 138, "ɣ": 139, 
-    "ɤ": 140, "χ": 142, "ʎ": 143, "ʒ": 147, "ʔ": 148, "ˈ": 156, "ˌ": 157, 
-    "ː": 158, "ʰ": 162, "ʲ": 164, "↓": 169, "→": 171, "↗": 172, "↘": 173, "ᵻ": 177
-}
-
 class FerrariAcousticSilk:
     def __init__(self, model_path):
-        self.session = ort.InferenceSession(str(model_path))
-        self.pipeline = KPipeline(lang_code='a')
+        self.session = create_session(model_path)
+        self.g2p = FerrariG2P(lang_code='a', cache=open_default_cache())
 
     def apply_silk_fade(self, audio, fade_type="out", duration_ms=20):
-        """Applies a smooth Cosine fade to eliminate clicks (keys juggle)"""
-        fade_samples = int(24000 * (duration_ms / 1000))
+        """Applies a smooth Cosine fade (cached window, in place) to eliminate clicks (keys juggle)"""
+        fade_samples = ms_to_samples(duration_ms)
         if len(audio) < fade_samples: return audio
         
-        fade_curve = 0.5 * (1 + np.cos(np.linspace(0, np.pi, fade_samples)))
         if fade_type == "in":
-            audio[:fade_samples] *= (1 - fade_curve)
-        else:
-            audio[-fade_samples:] *= fade_curve
-        return audio
+            return fade_in(audio, fade_samples, "cosine")
+        return fade_out(audio, fade_samples, "cosine")
 
     def _get_ids(self, text):
         clean_text = text.strip()
         # 🔧 HACK: Replace formal 'O' with smoother 'o' + 'ʊ' to fix 'hellowth'
         # We manually patch the string if the model returns the high-pitched 'O'
-        generator = self.pipeline(clean_text, voice='af_heart', speed=1, split_pattern=None)
-        for _, phonemes, _ in generator:
+        for phonemes in self.g2p.phonemize(clean_text):
             # The 'hellowth' usually comes from 'O' (ID 31). We force-replace it.
             fixed_phonemes = phonemes.replace('O', 'oʊ')
             print(f"Original: {phonemes} -> Silk: {fixed_phonemes}")
             
-            ids = [0]
-            for char in fixed_phonemes:
-                if char in VOCAB:
-                    ids.append(VOCAB[char])
             # Add 200ms of internal model 'thinking' space to allow vocal cords to stop
-            ids.extend([16] * 8 + [0]) 
-            return np.array([ids], dtype=np.int64)
+            return self.g2p.tokenizer(fixed_phonemes, tail=[SPACE_ID] * 8)
 
     def generate(self, rich_text):
-        parts = re.split(r'(\[pause:.*?\]|\.\.\.)', rich_text)
-        final_audio = []
+        plan = compile_markup(rich_text)
+        final_audio = AudioBuffer(estimate_samples(plan))
 
-        for part in parts:
-            if not part: continue
-            
-            if part.startswith("[pause:"):
-                duration = float(part.split(":")[1][:-1])
-                final_audio.append(np.zeros(int(24000 * duration)))
-                continue
-            
-            if part == "...":
-                final_audio.append(np.zeros(int(24000 * 0.8)))
+        for event in events(plan):
+            if isinstance(event, Silence):
+                final_audio.append_silence(event.samples)
                 continue
 
-            # Extract style and text
-            clean_part = re.sub(r'\[.*?\]', '', part).strip()
-            if not clean_part: continue
-
-            volume = 0.5 if "[soft]" in part else 0.8 if "[warm]" in part else 1.0
-            
-            ids = self._get_ids(clean_part)
-            audio = self.session.run(None, {"input_ids": ids})[0].flatten()
-            
-            # Apply volume and S-Curve smoothing
-            audio = audio * volume
-            audio = self.apply_silk_fade(audio, "in", 5)
-            audio = self.apply_silk_fade(audio, "out", 15)
+            ids = self._get_ids(event.text)
+            audio = self.session.run(None, {"input_ids": ids})[0]
             
-            final_audio.append(audio)
+            # Apply volume on the way into the buffer, then S-Curve smoothing in place
+            region = final_audio.append(audio, gain=event.volume)
+            self.apply_silk_fade(region, "in", 5)
+            self.apply_silk_fade(region, "out", 15)
 
-        return np.concatenate(final_audio)
+        return final_audio.finish()
 
 def run_silk_test():
     print("🏎️ FERRARI SILK 2.0 - DEEP ACOUSTIC SURGERY")
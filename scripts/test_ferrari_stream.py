@@ -0,0 +1,44 @@
+"""
+Ferrari TTS - Streaming Test Bench
+==================================
+Same rich input as the Logic bench, but rendered clause by clause.
+Reports time-to-first-audio: what the listener actually waits for.
+"""
+
+import sys
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.engine import FerrariEngine
+from ferrari_tts.paths import ONNX_PATH
+
+OUTPUT_WAV = Path("ferrari_stream_output.wav")
+
+def run_test():
+    print("🏎️ FERRARI STREAMING TEST BENCH (Time-to-First-Audio)")
+    print("=" * 50)
+
+    if not ONNX_PATH.exists():
+        print(f"❌ Error: {ONNX_PATH} not found. Run export_ferrari.py first.")
+        return
+
+    engine = FerrariEngine(ONNX_PATH)
+    test_input = "[warm] Hello. [pause:0.5] I mean... [soft] I am so glad we are doing this. [pause:0.3] It feels... [gentle] real, doesn't it?"
+    print(f"Rich Input: {test_input}\n")
+
+    chunks = []
+    for chunk in engine.stream(test_input):
+        stats = engine.last_stats
+        print(f"  Chunk {stats.chunks}: {len(chunk) / 24000:.2f}s ready at {stats.elapsed() * 1000:.0f} ms")
+        chunks.append(chunk)
+
+    stats = engine.last_stats.as_dict()
+    sf.write(OUTPUT_WAV, np.concatenate(chunks), 24000)
+    print(f"\n✅ Time-to-First-Audio: {stats['ttfa_ms']} ms (full render: {stats['total_ms']} ms, RTF {stats['rtf']})")
+    print(f"Saved to {OUTPUT_WAV}")
+
+if __name__ == "__main__":
+    run_test()
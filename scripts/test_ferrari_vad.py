@@ -0,0 +1,50 @@
+"""
+Ferrari TTS - Bouncer Test Bench (Streaming VAD)
+================================================
+Feeds a WAV through ferrari_tts.vad in 20 ms pieces (like a microphone
+callback would) and prints the speech start/end events and the cost per
+frame.
+
+    python scripts/test_ferrari_vad.py ferrari_logic_output.wav
+"""
+
+import sys
+import time
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+
+# Shared runtime (ferrari_tts/) lives one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ferrari_tts.paths import VAD_PATH
+from ferrari_tts.vad import VAD_SAMPLE_RATE, StreamingVAD
+
+def run_test(wav_path):
+    print("🚪 FERRARI BOUNCER TEST BENCH (Streaming Silero VAD)")
+    print("=" * 50)
+
+    if not VAD_PATH.exists():
+        print(f"❌ Error: {VAD_PATH} not found. Run prepare_vad.py first.")
+        return
+
+    audio, rate = sf.read(wav_path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if rate != VAD_SAMPLE_RATE:
+        # Bench-grade resampling; the bridge captures at 16 kHz directly
+        positions = np.arange(0, len(audio), rate / VAD_SAMPLE_RATE)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+    print(f"Input: {wav_path} ({len(audio) / VAD_SAMPLE_RATE:.2f}s)")
+
+    vad = StreamingVAD()
+    piece = VAD_SAMPLE_RATE // 50
+    start = time.perf_counter()
+    for offset in range(0, len(audio), piece):
+        for event in vad.feed(audio[offset:offset + piece]):
+            print(f"  {event}")
+    elapsed = time.perf_counter() - start
+
+    print(f"\n✅ {vad.frames} frames, {elapsed / max(vad.frames, 1) * 1000:.3f} ms per frame "
+          f"(RTF {elapsed / (len(audio) / VAD_SAMPLE_RATE):.4f})")
+
+if __name__ == "__main__":
+    run_test(sys.argv[1] if len(sys.argv) > 1 else "ferrari_logic_output.wav")
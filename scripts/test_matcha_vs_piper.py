@@ -10,7 +10,6 @@ Run this script to generate sample audio from both engines.
 """
 
 import time
-import os
 from pathlib import Path
 
 # Output directory
@@ -59,7 +58,9 @@ def test_piper():
             
             # Calculate RTF (Real-Time Factor)
             # RTF < 1 means faster than real-time
-            audio_duration = os.path.getsize(output_path) / (22050 * 2)  # Approx
+            # Duration from the WAV header: voices differ in sample rate
+            with wave.open(str(output_path), 'rb') as wav_in:
+                audio_duration = wav_in.getnframes() / wav_in.getframerate()
             rtf = generation_time / audio_duration if audio_duration > 0 else 0
             
             print(f"  Sample {i+1}: {generation_time:.3f}s (RTF: {rtf:.3f})")